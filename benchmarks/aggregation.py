@@ -0,0 +1,64 @@
+# benchmarks/aggregation.py
+# Comparaison de l'agrégation par lambdas (ancien code) et des noyaux vectorisés.
+# Usage : python -m benchmarks.aggregation [nb_lignes ...]
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregation import aggregate_indicators
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+LEVEL_NAMES = {'province_label': 'province', 'cldh_label': 'cercle', 'grappe': 'grappe'}
+
+
+def make_submissions(n_rows, seed=0):
+    # Soumissions aléatoires réparties sur les cercles de référence
+    rng = np.random.default_rng(seed)
+    circles = pd.read_parquet('data/cercles.parquet')
+    grappes = circles.loc[circles.index.repeat(circles['nb_grappe'])].reset_index(drop=True)
+    picks = rng.integers(0, len(grappes), n_rows)
+    return pd.DataFrame({
+        'grappe': picks,
+        'expra': rng.integers(0, 2, n_rows),
+        'province_label': grappes['province_label'].to_numpy()[picks],
+        'cldh_label': grappes['cldh_label'].to_numpy()[picks],
+    })
+
+
+def lambda_aggregation(df, key):
+    # Reproduction de l'ancien code de display_indicators
+    return df.groupby(key).agg(
+        expra_1=('expra', lambda x: (x == 1).sum()),
+        expra_0=('expra', lambda x: (x == 0).sum()),
+        unique_grappe=('grappe', pd.Series.nunique)
+    ).reset_index()
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes):
+    print(f"{'lignes':>12} {'niveau':>10} {'lambdas (s)':>12} {'vectorisé (s)':>14} {'gain':>7}")
+    for n_rows in sizes:
+        df = make_submissions(n_rows)
+        for key in ['province_label', 'cldh_label', 'grappe']:
+            expected = lambda_aggregation(df, key)
+            result = aggregate_indicators(df, [key])
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+            repeat = 1 if n_rows >= 1_000_000 else 3
+            slow = timed(lambda_aggregation, df, key, repeat=repeat)
+            fast = timed(aggregate_indicators, df, [key], repeat=repeat)
+            print(f"{n_rows:>12,} {LEVEL_NAMES[key]:>10} {slow:>12.4f} {fast:>14.4f} {slow / fast:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
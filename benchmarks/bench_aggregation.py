@@ -0,0 +1,27 @@
+# benchmarks/bench_aggregation.py
+# Cube d'indicateurs complet et agrégation directe par niveau (clés de display_indicators).
+import pytest
+
+from benchmarks.conftest import check_rss_budget
+from utils.aggregation import LEVEL_KEYS, aggregate_indicators, build_cube
+from utils.hierarchy import build_hierarchy
+
+
+def test_build_cube(measure, benchmark, submissions, reference_tables):
+    rows, data = submissions
+    tables = reference_tables
+    cube = measure(build_cube, data, tables['grappes_regions'], tables['provinces_data'], tables['circles_data'])
+    assert cube['national']['expra_1'].iloc[0] + cube['national']['expra_0'].iloc[0] == rows
+    check_rss_budget(benchmark, 'cube', rows)
+
+
+def test_build_hierarchy(measure, submissions, reference_tables):
+    _, data = submissions
+    tables = reference_tables
+    measure(build_hierarchy, data, tables['circles_data'], tables['provinces_data'], tables['grappes_regions'])
+
+
+@pytest.mark.parametrize('level', ['region', 'province', 'cercle', 'grappe'])
+def test_aggregate_level(measure, submissions, level):
+    _, data = submissions
+    measure(aggregate_indicators, data, LEVEL_KEYS[level])
@@ -0,0 +1,11 @@
+# benchmarks/bench_load.py
+# Lecture des soumissions (colonnes des vues seulement) et normalisation des types.
+from benchmarks.conftest import check_rss_budget
+from utils.store import read_submissions, view_columns
+
+
+def test_load_submissions(measure, benchmark, submissions_file):
+    rows, path = submissions_file
+    data = measure(read_submissions, view_columns(), path=path)
+    assert len(data) == rows
+    check_rss_budget(benchmark, 'load', rows)
@@ -0,0 +1,105 @@
+# benchmarks/bench_maps.py
+# Couches préparées, étiquettes et construction des cartes ; taille JSON des figures sous budget.
+import pytest
+
+from benchmarks.conftest import FIGURE_JSON_BUDGET
+from utils.aggregation import build_cube
+from utils.formatting import indicator_column_config, is_percent, map_labels
+from utils.geo import CERCLES_PATH, PROVINCES_PATH, REGIONS_PATH, load_label_points
+from utils.hierarchy import build_hierarchy
+from utils.indicators import IndicatorStore
+from utils.layers import MAP_INDICATORS, build_map_layers
+from utils.maps import generate_fixed_map, generate_grappe_map, generate_province_map
+from utils.points import build_grappe_points
+from utils.projection import add_projections
+from utils.series import build_series
+
+INDICATORS = list(MAP_INDICATORS.values())
+
+
+@pytest.fixture(scope='session')
+def cube(submissions, reference_tables):
+    _, data = submissions
+    tables = reference_tables
+    hierarchy = build_hierarchy(data, tables['circles_data'], tables['provinces_data'], tables['grappes_regions'])
+    cube = build_cube(data, tables['grappes_regions'], tables['provinces_data'], tables['circles_data'], hierarchy=hierarchy)
+    return add_projections(cube, build_series(data, hierarchy))
+
+
+@pytest.fixture(scope='session')
+def label_points():
+    return load_label_points(PROVINCES_PATH), load_label_points(REGIONS_PATH), load_label_points(CERCLES_PATH)
+
+
+@pytest.fixture(scope='session')
+def map_layers(cube, label_points):
+    return build_map_layers(IndicatorStore(cube), label_points)
+
+
+def test_build_map_layers(measure, cube, label_points):
+    # Store neuf à chaque passage : évaluation des indicateurs comprise
+    measure(lambda: build_map_layers(IndicatorStore(cube), label_points))
+
+
+def test_formatting(measure, cube):
+    # Étiquettes des cartes et configuration des colonnes des tableaux, pour tous les indicateurs
+    def format_all():
+        data = IndicatorStore(cube).frame('cercle', list(MAP_INDICATORS)).rename(columns=MAP_INDICATORS)
+        labels = [map_labels(data[column], is_percent(column)) for column in INDICATORS]
+        return labels, indicator_column_config(data)
+    measure(format_all)
+
+
+def _record_json_size(benchmark, fig, budget_key):
+    size = len(fig.to_json())
+    benchmark.extra_info['figure_json_bytes'] = size
+    assert size <= FIGURE_JSON_BUDGET[budget_key]
+
+
+@pytest.mark.parametrize('indicator', ['Enquêtes Ménage', 'Taux de Couverture des Grappes'], ids=['comptage', 'taux'])
+def test_province_map_national(measure, benchmark, map_layers, indicator):
+    fig = measure(generate_province_map, map_layers[('province', 'national')], indicator, indicator)
+    _record_json_size(benchmark, fig, 'province_national')
+
+
+def test_province_map_regional(measure, benchmark, map_layers):
+    # Région la plus étendue en nombre de provinces : pire cas du zoom régional
+    key = max((k for k in map_layers if k[0] == 'province' and k[1] != 'national'), key=lambda k: len(map_layers[k].data))
+    fig = measure(generate_province_map, map_layers[key], INDICATORS[0], INDICATORS[0])
+    _record_json_size(benchmark, fig, 'province_regional')
+
+
+def test_region_map(measure, benchmark, map_layers):
+    fig = measure(generate_fixed_map, map_layers[('region', 'national')], INDICATORS[0], INDICATORS[0])
+    _record_json_size(benchmark, fig, 'region_national')
+
+
+def test_cercle_maps(measure, benchmark, map_layers):
+    # Couche des cercles construite hors ligne : vue nationale (pire cas) puis zoom sur la région la plus découpée
+    fig = measure(generate_province_map, map_layers[('cercle', 'national')], INDICATORS[0], INDICATORS[0])
+    _record_json_size(benchmark, fig, 'cercle_national')
+    key = max((k for k in map_layers if k[0] == 'cercle' and k[1] != 'national'), key=lambda k: len(map_layers[k].data))
+    _record_json_size(benchmark, generate_province_map(map_layers[key], INDICATORS[0], INDICATORS[0]), 'cercle_regional')
+
+
+def test_figure_serialization(measure, benchmark, map_layers):
+    # Sérialisation refaite par st.plotly_chart à chaque affichage
+    fig = generate_province_map(map_layers[('province', 'national')], INDICATORS[0], INDICATORS[0])
+    measure(fig.to_json)
+
+
+def test_build_grappe_points(measure, cube, label_points):
+    measure(build_grappe_points, cube, label_points)
+
+
+@pytest.mark.parametrize('zoom', ['national', 'province'])
+def test_grappe_map(measure, benchmark, cube, label_points, map_layers, zoom):
+    # Carte des grappes : cellules regroupées du pays, ou grappes une à une de la plus grande province
+    points = build_grappe_points(cube, label_points)
+    if zoom == 'national':
+        fig = measure(generate_grappe_map, points, map_layers[('region', 'national')], zoom)
+    else:
+        province = points.points['province_label'].value_counts().index[0]
+        region = points.points.loc[points.points['province_label'] == province, 'region_label'].iloc[0]
+        fig = measure(generate_grappe_map, points, map_layers[('province', region)], zoom, region, province)
+    _record_json_size(benchmark, fig, f"grappe_{zoom}")
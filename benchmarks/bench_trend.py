@@ -0,0 +1,23 @@
+# benchmarks/bench_trend.py
+# Séries journalières (national, régions, provinces) et lecture d'une tendance de la vue nationale.
+from benchmarks.conftest import check_rss_budget
+from utils.hierarchy import build_hierarchy
+from utils.series import build_series
+
+
+def test_daily_series(measure, benchmark, submissions, reference_tables):
+    rows, data = submissions
+    hierarchy = build_hierarchy(data, reference_tables['circles_data'], reference_tables['provinces_data'], reference_tables['grappes_regions'])
+    series = measure(build_series, data, hierarchy)
+    national = series.series('national')
+    assert national['expra_1'].sum() + national['expra_0'].sum() == rows
+    check_rss_budget(benchmark, 'trend', rows)
+
+
+def test_trend_slice(benchmark, submissions, reference_tables):
+    # Coût par réexécution : tranche et cadence, indépendant du nombre de soumissions
+    rows, data = submissions
+    hierarchy = build_hierarchy(data, reference_tables['circles_data'], reference_tables['provinces_data'], reference_tables['grappes_regions'])
+    series = build_series(data, hierarchy)
+    region = series.keys('region')[0]
+    benchmark(lambda: (series.series('region', region)['expra_1_7j'], series.cadence('national')))
@@ -0,0 +1,122 @@
+# benchmarks/conftest.py
+# Suite pytest-benchmark sur des jeux synthétiques de taille croissante (utils/synthetic.py).
+# Collectée par `python -m pytest benchmarks` (pytest.ini : benchmarks/bench_*.py).
+#
+#   pip install -r requirements-bench.txt
+#   make bench-baseline       # référence : python -m pytest benchmarks --benchmark-autosave
+#   make bench                # comparaison, échec si la médiane régresse de plus de 25 % (BENCH_FAIL)
+#
+# Tailles : EDH_BENCH_SIZES=10000,1000000,10000000 (par défaut 10 000, 100 000 et 1 000 000 lignes).
+# En plus des temps, chaque mesure enregistre le pic de RSS et, pour les cartes, la taille JSON de
+# la figure ; les budgets ci-dessous font échouer la suite en cas de régression.
+import os
+import resource
+import sys
+
+import pandas as pd
+import pytest
+
+from utils.store import DATA_FILES
+
+SIZES = [int(size) for size in os.environ.get('EDH_BENCH_SIZES', '10000,100000,1000000').split(',')]
+
+# Budgets : taille JSON maximale des figures (octets) et pic de RSS supplémentaire par million de lignes (Mo)
+# (mesuré : ~65 Ko pour la carte nationale des provinces, ~25 Ko pour les autres)
+FIGURE_JSON_BUDGET = {
+    'province_national': 100_000,
+    'province_regional': 40_000,
+    'region_national': 40_000,
+    'cercle_national': 130_000,
+    'cercle_regional': 50_000,
+    'grappe_national': 60_000,
+    'grappe_province': 80_000,
+}
+# (mesuré : 40 à 60 Mo par million de lignes)
+RSS_MB_PER_MILLION_ROWS = {
+    'load': 120,
+    'cube': 120,
+    'trend': 120,
+}
+# Marge fixe pour les petites tailles (bibliothèques, tampons Arrow, ...)
+RSS_MB_BASE = 50
+
+
+def _proc_status(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def reset_peak_rss():
+    # Linux : remise à zéro du pic de RSS (VmHWM) ; renvoie la RSS courante servant de base
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return _proc_status('VmRSS:')
+    except OSError:
+        # Ailleurs : pic du processus entier, pas de base
+        return None
+
+
+def peak_rss_mb():
+    try:
+        return _proc_status('VmHWM:')
+    except OSError:
+        # ru_maxrss : octets sous macOS, kilo-octets ailleurs
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def rss_budget_mb(stage, rows):
+    return RSS_MB_BASE + RSS_MB_PER_MILLION_ROWS[stage] * rows / 1_000_000
+
+
+def check_rss_budget(benchmark, stage, rows):
+    # Sans base (hors Linux), le pic du processus entier ne mesure pas l'étape : pas de vérification
+    delta = benchmark.extra_info['peak_rss_delta_mb']
+    if delta is not None:
+        assert delta <= rss_budget_mb(stage, rows)
+
+
+@pytest.fixture(scope='session')
+def reference_tables():
+    return {
+        'provinces_data': pd.read_parquet(DATA_FILES['provinces_data']),
+        'grappes_regions': pd.read_parquet(DATA_FILES['grappes_regions']),
+        'circles_data': pd.read_parquet(DATA_FILES['circles_data']).assign(
+            cldh_label=lambda d: d['cldh_label'].astype(str).str.strip()
+        ),
+    }
+
+
+@pytest.fixture(scope='session', params=SIZES, ids=lambda size: f"{size}_lignes")
+def submissions_file(request, tmp_path_factory):
+    from utils.synthetic import write_submissions
+
+    path = str(tmp_path_factory.mktemp('synthetique') / f"soumissions_{request.param}.parquet")
+    write_submissions(path, request.param, seed=0)
+    return request.param, path
+
+
+@pytest.fixture(scope='session')
+def submissions(submissions_file):
+    from utils.store import read_submissions, view_columns
+
+    rows, path = submissions_file
+    return rows, read_submissions(view_columns(), path=path)
+
+
+@pytest.fixture
+def measure(benchmark):
+    # benchmark.pedantic avec pic de RSS enregistré dans extra_info
+    def run(func, *args, rounds=3, **kwargs):
+        baseline = reset_peak_rss()
+        result = benchmark.pedantic(func, args=args, kwargs=kwargs, rounds=rounds, iterations=1, warmup_rounds=0)
+        peak = peak_rss_mb()
+        benchmark.extra_info['peak_rss_mb'] = round(peak, 1)
+        # Mémoire supplémentaire au pic, par rapport à la RSS avant la mesure
+        benchmark.extra_info['peak_rss_delta_mb'] = None if baseline is None else round(peak - baseline, 1)
+        return result
+    return run
@@ -0,0 +1,70 @@
+# benchmarks/file_reads.py
+# Vérifie qu'aucune vue ne lit de fichier de data/ à l'interaction, et que les chargements ponctuels
+# (tables, couches, agrégats, soumissions d'une sélection : une fois par version) ne se répètent pas.
+# Usage : python -m benchmarks.file_reads
+import sys
+
+from streamlit.testing.v1 import AppTest
+
+from utils.warmup import LEVELS, VIEWS
+
+
+def _counts(app):
+    return app.session_state['file_reads'], app.session_state['file_loads']
+
+
+def run_views(app):
+    # Chaque échelle × vue, puis chaque option des listes déroulantes : (affichages, lectures, chargements)
+    results = {}
+    for level in LEVELS:
+        for view in VIEWS:
+            app.sidebar.radio[0].set_value(level)
+            app.sidebar.radio[1].set_value(view)
+            app.run()
+            runs = [_counts(app)]
+            # (options relues après chaque affichage : les filtres en cascade dépendent des précédents)
+            for i in range(len(app.selectbox)):
+                j = 0
+                while i < len(app.selectbox) and j < len(app.selectbox[i].options):
+                    app.selectbox[i].set_value(app.selectbox[i].options[j])
+                    app.run()
+                    runs.append(_counts(app))
+                    j += 1
+            results[(level, view)] = (len(runs), sum(r for r, _ in runs), sum(l for _, l in runs))
+    return results
+
+
+def select_submissions(app, index=1):
+    # Détail des soumissions d'une région (Zoom Cercles / Tableau) : lecture à la demande
+    app.sidebar.radio[0].set_value("Zoom Cercles")
+    app.sidebar.radio[1].set_value("Tableau")
+    app.run()
+    app.radio[0].set_value("Soumissions")
+    app.run()
+    select = app.selectbox(key='soumissions_region')
+    select.set_value(select.options[index])
+    app.run()
+    return select.options[index], _counts(app)
+
+
+def main():
+    app = AppTest.from_file('../main.py', default_timeout=120)
+    app.run()
+    failures = 0
+    # Premier passage : chargements ponctuels attendus, aucune lecture d'affichage
+    # Second passage : ni lecture ni chargement, tout est en cache pour la version
+    for name, loads_allowed in (("Premier passage", True), ("Second passage", False)):
+        print(name)
+        for (level, view), (runs, reads, loads) in run_views(app).items():
+            failures += reads > 0 or (loads > 0 and not loads_allowed)
+            print(f"  {level:22} {view:18} {runs:3} affichages, {reads} lecture(s), {loads} chargement(s)")
+
+    # Sélection de soumissions : chargée une fois (catégorie des chargements), puis réutilisée
+    (region, first), (_, again) = select_submissions(app), select_submissions(app)
+    failures += first[0] > 0 or first[1] == 0 or again != (0, 0)
+    print(f"Soumissions ({region}) : {first[1]} chargement(s), puis {again[1]} ; lectures : {first[0]}, {again[0]}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# benchmarks/load_test.py
+# Test de charge multi-sessions : un vrai serveur Streamlit (préchauffé comme en production) et N clients
+# websocket sans navigateur qui parcourent échelles, vues et listes déroulantes au hasard.
+# Usage : python -m benchmarks.load_test [nb_sessions] [actions_par_session] [graine] [--froid] [--json fichier]
+#
+# AppTest n'est pas utilisable ici : ses instances partagent le Runtime du processus et ne supportent pas
+# d'être exécutées en parallèle. Les clients parlent donc le protocole du navigateur (/_stcore/stream).
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.asyncio.client import connect
+
+from utils.warmup import APP_PATH, LEVELS, VIEWS
+
+DEFAULT_SESSIONS = 8
+DEFAULT_ACTIONS = 20
+# Intervalle d'échantillonnage CPU / mémoire du serveur, en secondes
+SAMPLE_INTERVAL = 0.2
+PERCENTILES = [50, 90, 95, 99]
+# Démarrage du serveur (préchauffage compris) et durée maximale d'une réexécution
+STARTUP_TIMEOUT = 900
+RERUN_TIMEOUT = 600
+
+# Libellés des radios de la barre latérale (main())
+LEVEL_LABEL = "Échelle d'Analyse"
+VIEW_LABEL = "Mode de Visualisation"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = min(int(round(q / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def process_rss_mb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def process_cpu_seconds(pid):
+    # utime + stime (champs 14 et 15 de /proc/<pid>/stat, après le nom entre parenthèses)
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+class ServerSampler(threading.Thread):
+    # RSS du processus serveur, échantillonnée pendant le test
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.samples.append(process_rss_mb(self.pid))
+            self._done.wait(SAMPLE_INTERVAL)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def start_server(port, warm=True):
+    """Serveur Streamlit en sous-processus ; rend la main quand /_stcore/health répond."""
+    options = ['--server.headless', 'true', '--server.port', str(port), '--browser.gatherUsageStats', 'false']
+    if warm:
+        # Même démarrage qu'en production : préchauffage puis écoute
+        command = [sys.executable, '-m', 'utils.warmup', 'serve', *options]
+    else:
+        command = [sys.executable, '-m', 'streamlit', 'run', APP_PATH, *options]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Le serveur s'est arrêté au démarrage (code {server.returncode})")
+        try:
+            with urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=2):
+                return server
+        except OSError:
+            time.sleep(0.5)
+    server.kill()
+    raise RuntimeError("Le serveur n'a pas répondu à temps")
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+class Session:
+    """Client websocket d'une session : envoie des réexécutions, relève radios et listes déroulantes."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        # Widgets de la dernière exécution : id -> (type, libellé, options, valeur par défaut)
+        self.widgets = {}
+        # Valeurs choisies par le client, renvoyées à chaque réexécution comme le ferait le navigateur
+        self.values = {}
+
+    async def rerun(self):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.page_script_hash = ''
+        for widget_id, value in self.values.items():
+            state = WidgetState(id=widget_id, string_value=value)
+            msg.rerun_script.widget_states.widgets.append(state)
+        await self.websocket.send(msg.SerializeToString())
+
+        widgets, error = {}, None
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.websocket.recv())
+            if forward.HasField('script_finished'):
+                break
+            if not forward.HasField('delta') or not forward.delta.HasField('new_element'):
+                continue
+            element = forward.delta.new_element
+            kind = element.WhichOneof('type')
+            if kind in ('radio', 'selectbox'):
+                proto = getattr(element, kind)
+                default = proto.options[proto.default] if proto.HasField('default') and proto.options else None
+                widgets[proto.id] = (kind, proto.label, list(proto.options), default)
+            elif kind == 'exception' and error is None:
+                error = element.exception.message or element.exception.type
+        self.widgets = widgets
+        # Les widgets disparus (changement d'échelle, de vue) ne sont plus renvoyés
+        self.values = {k: v for k, v in self.values.items() if k in widgets}
+        return error
+
+    def value(self, label):
+        for widget_id, (_, widget_label, _, default) in self.widgets.items():
+            if widget_label == label:
+                return self.values.get(widget_id, default)
+        return None
+
+    def set_value(self, label, value):
+        for widget_id, (_, widget_label, _, _) in self.widgets.items():
+            if widget_label == label:
+                self.values[widget_id] = value
+
+    def selectboxes(self):
+        return [(widget_id, options) for widget_id, (kind, _, options, _) in self.widgets.items()
+                if kind == 'selectbox' and options]
+
+
+async def session(port, index, actions, seed, results, start):
+    # Parcours aléatoire mais reproductible : radios de la barre latérale et listes déroulantes
+    rng = random.Random(seed * 1000 + index)
+    async with connect(f'ws://localhost:{port}/_stcore/stream', subprotocols=['streamlit'],
+                       max_size=None, open_timeout=60) as websocket:
+        client = Session(websocket)
+        await start.wait()
+
+        async def timed_run(action):
+            begin = time.perf_counter()
+            error = await asyncio.wait_for(client.rerun(), RERUN_TIMEOUT)
+            seconds = time.perf_counter() - begin
+            results.append({
+                'session': index, 'action': action, 'level': client.value(LEVEL_LABEL),
+                'view': client.value(VIEW_LABEL), 'seconds': seconds, 'error': error,
+            })
+
+        await timed_run('ouverture')
+        for _ in range(actions):
+            choice = rng.random()
+            selectboxes = client.selectboxes()
+            if choice < 0.3:
+                client.set_value(LEVEL_LABEL, rng.choice(LEVELS))
+                action = 'échelle'
+            elif choice < 0.5 or not selectboxes:
+                client.set_value(VIEW_LABEL, rng.choice(VIEWS))
+                action = 'vue'
+            else:
+                widget_id, options = rng.choice(selectboxes)
+                client.values[widget_id] = rng.choice(options)
+                action = 'sélection'
+            await timed_run(action)
+
+
+async def _run_sessions(port, sessions, actions, seed, results, on_start):
+    start = asyncio.Event()
+    tasks = [asyncio.create_task(session(port, i, actions, seed, results, start)) for i in range(sessions)]
+    # Toutes les connexions ouvertes avant le départ commun
+    await asyncio.sleep(1)
+    on_start()
+    start.set()
+    await asyncio.gather(*tasks)
+
+
+def run_load_test(sessions=DEFAULT_SESSIONS, actions=DEFAULT_ACTIONS, seed=0, warm=True):
+    """Latences par réexécution, CPU et mémoire du serveur pour N sessions simultanées."""
+    port = free_port()
+    server = start_server(port, warm)
+    results, measures = [], {}
+    sampler = ServerSampler(server.pid)
+
+    def on_start():
+        measures.update(rss=process_rss_mb(server.pid), cpu=process_cpu_seconds(server.pid),
+                        wall=time.perf_counter())
+        sampler.start()
+
+    try:
+        asyncio.run(_run_sessions(port, sessions, actions, seed, results, on_start))
+        wall = time.perf_counter() - measures['wall']
+        cpu = process_cpu_seconds(server.pid) - measures['cpu']
+        rss_end = process_rss_mb(server.pid)
+        sampler.stop()
+    finally:
+        stop_server(server)
+
+    latencies = [r['seconds'] for r in results]
+    by_view = defaultdict(list)
+    for r in results:
+        by_view[f"{r['level']} / {r['view']}"].append(r['seconds'])
+    return {
+        'sessions': sessions,
+        'actions_per_session': actions,
+        'reruns': len(results),
+        'errors': [r for r in results if r['error']],
+        'wall_seconds': round(wall, 3),
+        'reruns_per_second': round(len(results) / wall, 2),
+        'latency_ms': {f"p{q}": round(percentile(latencies, q) * 1000, 1) for q in PERCENTILES} | {
+            'max': round(max(latencies) * 1000, 1),
+        },
+        'latency_ms_by_view': {
+            view: {'n': len(values), 'p50': round(percentile(values, 50) * 1000, 1), 'p95': round(percentile(values, 95) * 1000, 1)}
+            for view, values in sorted(by_view.items())
+        },
+        # Cœurs occupés en moyenne par le serveur (temps CPU / temps écoulé)
+        'cpu_cores': round(cpu / wall, 2),
+        'rss_mb': {
+            'start': round(measures['rss'], 1),
+            'end': round(rss_end, 1),
+            'peak': round(max(sampler.samples, default=rss_end), 1),
+        },
+    }
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    json_path = sys.argv[sys.argv.index('--json') + 1] if '--json' in sys.argv else None
+    if json_path in args:
+        args.remove(json_path)
+    sessions = int(args[0]) if len(args) > 0 else DEFAULT_SESSIONS
+    actions = int(args[1]) if len(args) > 1 else DEFAULT_ACTIONS
+    seed = int(args[2]) if len(args) > 2 else 0
+
+    report = run_load_test(sessions, actions, seed, warm='--froid' not in sys.argv)
+    print(f"{report['sessions']} sessions × {report['actions_per_session']} actions : "
+          f"{report['reruns']} réexécutions en {report['wall_seconds']:.1f} s ({report['reruns_per_second']}/s)")
+    print("Latence (ms) : " + ", ".join(f"{k} {v}" for k, v in report['latency_ms'].items()))
+    for view, stats in report['latency_ms_by_view'].items():
+        print(f"  {view:42} n={stats['n']:4}  p50 {stats['p50']:8.1f}  p95 {stats['p95']:8.1f}")
+    print(f"Serveur : {report['cpu_cores']} cœur(s) en moyenne ; RSS (Mo) : "
+          f"{report['rss_mb']['start']} -> {report['rss_mb']['end']} (pic {report['rss_mb']['peak']})")
+    if report['errors']:
+        print(f"{len(report['errors'])} réexécution(s) en erreur, ex. : {report['errors'][0]['error']}")
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    sys.exit(1 if report['errors'] else 0)
+
+
+if __name__ == "__main__":
+    main()
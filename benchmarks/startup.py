@@ -0,0 +1,86 @@
+# benchmarks/startup.py
+# Démarrage à froid de main.py : temps d'import des dépendances et temps jusqu'au premier affichage.
+# Chaque mesure est faite dans un nouveau processus Python.
+# Usage : python -m benchmarks.startup [nb_essais] [fichier_resultats.jsonl]
+import ast
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_RUNS = 5
+# Modules lourds dont on suit le chargement au premier affichage
+# (plotly.graph_objects et plotly.io sont déjà importés par streamlit lui-même)
+HEAVY_MODULES = ['geopandas', 'shapely', 'pyogrio', 'plotly.express', 'folium', 'streamlit_folium']
+
+IMPORTS_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+exec(compile(sys.argv[1], 'main.py', 'exec'))
+print(json.dumps({'seconds': time.perf_counter() - start}))
+"""
+
+FIRST_PAINT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file('main.py', default_timeout=300)
+app.run()
+assert not app.exception, app.exception
+heavy = [m for m in sys.argv[1:] if m in sys.modules]
+print(json.dumps({'seconds': time.perf_counter() - start, 'loaded': heavy}))
+"""
+
+
+def main_imports():
+    # Instructions import de premier niveau de main.py, exécutées telles quelles
+    with open('main.py', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return ast.unparse(ast.Module(body=imports, type_ignores=[]))
+
+
+def run(script, *args):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', script, *args], capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    # Temps total vu de l'extérieur, démarrage de l'interpréteur compris
+    result['wall'] = time.perf_counter() - start
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RUNS
+    imports = main_imports()
+    import_times = [run(IMPORTS_SCRIPT, imports) for _ in range(runs)]
+    paint_times = [run(FIRST_PAINT_SCRIPT, *HEAVY_MODULES) for _ in range(runs)]
+
+    result = {
+        'revision': git_revision(),
+        'runs': runs,
+        'import_seconds': statistics.median(r['seconds'] for r in import_times),
+        'first_paint_seconds': statistics.median(r['seconds'] for r in paint_times),
+        'first_paint_wall_seconds': statistics.median(r['wall'] for r in paint_times),
+        'heavy_modules_loaded': paint_times[-1]['loaded'],
+    }
+    print(f"Import des dépendances de main.py : {result['import_seconds']:.2f} s (médiane sur {runs})")
+    print(f"Premier affichage (vue par défaut) : {result['first_paint_seconds']:.2f} s, "
+          f"{result['first_paint_wall_seconds']:.2f} s avec le démarrage de l'interpréteur")
+    print(f"Modules lourds chargés au premier affichage : {', '.join(result['heavy_modules_loaded']) or 'aucun'}")
+
+    if len(sys.argv) > 2:
+        # Historique entre versions : une ligne JSON par exécution
+        with open(sys.argv[2], 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result) + '\n')
+
+
+if __name__ == "__main__":
+    main()
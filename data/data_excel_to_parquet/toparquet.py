@@ -1,10 +1,29 @@
-import pandas as pd
+import json
+import os
+import shutil
 import sys
+import time
 
-def excel_to_parquet(excel_file, parquet_file):
-    # Lire le fichier Excel
-    df = pd.read_excel(excel_file)
-    
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Chemins résolus depuis la racine du dépôt, quel que soit le dossier de lancement
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Fichier unique d'origine, repris dans le jeu partitionné à la première ingestion
+COMBINED_DATA = os.path.join(ROOT, 'data', 'combined_data.parquet')
+# Jeu de soumissions partitionné (Hive) et agrégats courants par grappe
+SUBMISSIONS_DIR = os.path.join(ROOT, 'data', 'submissions')
+GRAPPE_AGGREGATES = os.path.join(ROOT, 'data', 'aggregates', 'grappes.parquet')
+PARTITION_COLUMNS = ['submission_date', 'region_label']
+GRAPPE_KEYS = ['region_label', 'province_label', 'cldh_label', 'grappe']
+SUBMISSION_KEY = 'KEY'
+# Lots comptés dans les agrégats, conservés dans les métadonnées du fichier des agrégats
+LOTS_METADATA = b'lots'
+INITIAL_LOT = 'lot-initial'
+
+
+def normalize_columns(df):
     # Convertir la colonne 'supervisor' en chaîne de caractères
     if 'supervisor' in df.columns:
         df['supervisor'] = df['supervisor'].astype(str)
@@ -12,13 +31,171 @@ def excel_to_parquet(excel_file, parquet_file):
     # Convertir toutes les colonnes de type 'object' en 'string'
     for col in df.select_dtypes(include=['object']):
         df[col] = df[col].astype(str)
-    
+    return df
+
+
+def excel_to_parquet(excel_file, parquet_file):
+    # Lire le fichier Excel
+    df = normalize_columns(pd.read_excel(excel_file))
+
     # Sauvegarder en format Parquet
     df.to_parquet(parquet_file)
     print(f"Fichier converti avec succès : {parquet_file}")
 
+
+def read_submissions(input_file):
+    if input_file.endswith('.parquet'):
+        return normalize_columns(pd.read_parquet(input_file))
+    return normalize_columns(pd.read_excel(input_file))
+
+
+def existing_keys(key):
+    # Lecture de la seule colonne clé du jeu partitionné
+    if not os.path.isdir(SUBMISSIONS_DIR):
+        return pd.Index([])
+    dataset = ds.dataset(SUBMISSIONS_DIR, format='parquet', partitioning='hive')
+    return pd.Index(dataset.to_table(columns=[key]).column(key).to_pandas())
+
+
+def grappe_counts(batch):
+    return batch.assign(
+        expra_1=(batch['expra'] == 1).astype('int64'),
+        expra_0=(batch['expra'] == 0).astype('int64'),
+    ).groupby(GRAPPE_KEYS, observed=True)[['expra_1', 'expra_0']].sum()
+
+
+def file_lot(file):
+    # Lot d'un fichier du jeu partitionné : <lot>-<i>.parquet pour les fichiers écrits par write_lot ;
+    # tout autre fichier (écrit autrement) est son propre lot, jamais compté sans recalcul complet
+    base = os.path.basename(file)
+    if base.startswith('lot-'):
+        return base.rsplit('-', 1)[0]
+    return os.path.relpath(file, SUBMISSIONS_DIR).replace(os.sep, '/')
+
+
+def dataset_lots():
+    # Lots présents dans le jeu partitionné
+    lots = set()
+    for root, _, files in os.walk(SUBMISSIONS_DIR):
+        lots.update(file_lot(os.path.join(root, file)) for file in files)
+    return lots
+
+
+def counted_lots():
+    if not os.path.exists(GRAPPE_AGGREGATES):
+        return set()
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(GRAPPE_AGGREGATES).metadata or {}
+    return set(json.loads(metadata.get(LOTS_METADATA, b'[]')))
+
+
+def write_grappe_aggregates(counts, lots):
+    # Compteurs et liste des lots comptés dans un même fichier, remplacé atomiquement
+    os.makedirs(os.path.dirname(GRAPPE_AGGREGATES), exist_ok=True)
+    table = pa.Table.from_pandas(counts.sort_index().reset_index(), preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), LOTS_METADATA: json.dumps(sorted(lots)).encode()})
+    tmp_file = GRAPPE_AGGREGATES + '.tmp'
+    import pyarrow.parquet as pq
+
+    pq.write_table(table, tmp_file)
+    os.replace(tmp_file, GRAPPE_AGGREGATES)
+
+
+def rebuild_grappe_aggregates():
+    # Recalcul complet depuis le jeu partitionné (agrégats absents ou désynchronisés)
+    dataset = ds.dataset(SUBMISSIONS_DIR, format='parquet', partitioning='hive')
+    submissions = dataset.to_table(columns=GRAPPE_KEYS + ['expra']).to_pandas()
+    submissions['region_label'] = submissions['region_label'].astype(str)
+    write_grappe_aggregates(grappe_counts(submissions), dataset_lots())
+    print(f"Agrégats par grappe recalculés depuis {SUBMISSIONS_DIR}")
+
+
+def update_grappe_aggregates(batch, lot):
+    # Mise à jour incrémentale des compteurs par grappe : ancien total + nouveau lot
+    batch_counts = grappe_counts(batch)
+    if os.path.exists(GRAPPE_AGGREGATES):
+        counts = pd.read_parquet(GRAPPE_AGGREGATES).set_index(GRAPPE_KEYS)
+        counts = counts.add(batch_counts, fill_value=0).astype('int64')
+    else:
+        counts = batch_counts
+    write_grappe_aggregates(counts, counted_lots() | {lot})
+
+
+def prepare_submissions(batch):
+    batch['cldh_label'] = batch['cldh_label'].astype(str).str.strip()
+    batch['submission_date'] = pd.to_datetime(batch['submission_date']).dt.strftime('%Y-%m-%d')
+    return batch
+
+
+def write_lot(batch, lot, directory):
+    # Ajout de nouveaux fichiers uniquement : les partitions existantes ne sont jamais réécrites
+    ds.write_dataset(
+        pa.Table.from_pandas(batch, preserve_index=False),
+        directory,
+        format='parquet',
+        partitioning=PARTITION_COLUMNS,
+        partitioning_flavor='hive',
+        basename_template=f"{lot}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+
+
+def seed_submissions():
+    """Reprise du fichier unique d'origine dans le jeu partitionné, avant le premier lot.
+
+    L'application lit data/submissions dès que le dossier existe : sans cette
+    reprise, les soumissions de combined_data.parquet disparaîtraient. Le jeu
+    est écrit dans un dossier temporaire puis renommé (opération atomique).
+    """
+    if os.path.isdir(SUBMISSIONS_DIR) or not os.path.exists(COMBINED_DATA):
+        return 0
+    submissions = prepare_submissions(normalize_columns(pd.read_parquet(COMBINED_DATA)))
+    tmp_dir = SUBMISSIONS_DIR + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    write_lot(submissions, INITIAL_LOT, tmp_dir)
+    os.replace(tmp_dir, SUBMISSIONS_DIR)
+    rebuild_grappe_aggregates()
+    print(f"{len(submissions)} soumissions reprises de {COMBINED_DATA} dans {SUBMISSIONS_DIR}")
+    return len(submissions)
+
+
+def ingest(input_file, key=SUBMISSION_KEY):
+    batch = read_submissions(input_file)
+    if key not in batch.columns:
+        print(f"Colonne clé '{key}' absente du fichier : {input_file}")
+        return 0
+
+    seed_submissions()
+    # Agrégats absents, ou lot présent mais non compté (arrêt entre les deux écritures,
+    # fichiers ajoutés sans passer par ingest) : recalcul complet avant la mise à jour
+    if os.path.isdir(SUBMISSIONS_DIR) and (not os.path.exists(GRAPPE_AGGREGATES) or dataset_lots() != counted_lots()):
+        rebuild_grappe_aggregates()
+
+    # Dédoublonnage dans le lot puis par rapport aux soumissions déjà intégrées
+    batch = batch.drop_duplicates(subset=key, keep='last')
+    batch = batch[~batch[key].isin(existing_keys(key))]
+    if batch.empty:
+        print("Aucune nouvelle soumission")
+        return 0
+
+    batch = prepare_submissions(batch)
+    # Nom unique même pour deux lots du même processus dans la même seconde (fichiers jamais écrasés)
+    lot = f"lot-{time.strftime('%Y%m%d%H%M%S')}-{time.time_ns() % 1_000_000_000:09d}-{os.getpid()}"
+    write_lot(batch, lot, SUBMISSIONS_DIR)
+    update_grappe_aggregates(batch, lot)
+    print(f"{len(batch)} nouvelles soumissions intégrées dans {SUBMISSIONS_DIR}")
+    return len(batch)
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python toparquet.py fichier_excel.xlsx fichier_sortie.parquet")
+    if len(sys.argv) in (3, 4) and sys.argv[1] == 'ingest':
+        ingest(*sys.argv[2:])
+    elif len(sys.argv) == 2 and sys.argv[1] == 'rebuild':
+        rebuild_grappe_aggregates()
+    elif len(sys.argv) == 3:
+        excel_to_parquet(sys.argv[1], sys.argv[2])
     else:
-        excel_to_parquet(sys.argv[1], sys.argv[2])
\ No newline at end of file
+        print("Usage: python toparquet.py fichier_excel.xlsx fichier_sortie.parquet")
+        print("       python toparquet.py ingest nouvelles_soumissions.(xlsx|parquet) [colonne_clé]")
+        print("       python toparquet.py rebuild   (recalcul des agrégats par grappe)")
\ No newline at end of file
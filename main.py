@@ -1,14 +1,28 @@
 # main.py
+import logging
+import os
+
 import streamlit as st
 from PIL import Image
 import pandas as pd
-import geopandas as gpd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-import folium
-from folium.features import GeoJsonTooltip
-from streamlit_folium import folium_static
+from utils.aggregation import build_cube
+from utils.cache import LRUCache
+from utils.export import LEVEL_COLUMNS, RAW_TABLE, XLSX_MAX_ROWS, available_formats, export_file, export_name, export_rows, export_url
+from utils.formatting import indicator_column_config
+from utils.geo import CERCLES_PATH, PROVINCES_PATH, REGIONS_PATH, load_label_points, select_lod
+from utils.hierarchy import build_hierarchy
+from utils.indicators import INDICATORS, KEY_LABELS, IndicatorStore, column_formats
+from utils.io_audit import one_time_load, track_reads
+from utils.layers import MAP_INDICATORS, build_map_layers
+from utils.maps import generate_fixed_map, generate_grappe_map, generate_province_map
+from utils.points import build_grappe_points
+from utils.profiling import CAPTURE_MODES, profile_run, section, to_csv, to_json_lines
+from utils.projection import add_projections
+from utils.series import build_series
+from utils.store import DatasetStore, read_submissions, view_columns
+from utils.table import paginated_table, sort_positions
+
+logger = logging.getLogger(__name__)
 
 #import bcrypt
 
@@ -53,165 +67,270 @@ st.set_page_config(page_title="Baromètre EDH 2024", layout="wide")
 #     st.session_state["authenticated"] = False
 #     st.session_state["username"] = ""
 
-# Chargement et prétraitement des données
-@st.cache_data
-def load_data():
-    combined_data = pd.read_parquet('data/combined_data.parquet')
-    provinces_data = pd.read_parquet('data/provinces.parquet')
-    geojson_provinces = gpd.read_file('data/updated_provinces.json')
-    geojson_regions = gpd.read_file('data/updated_maroc.geojson')
-    grappes_regions = pd.read_parquet('data/grappes_regions.parquet')
-    circles_data = pd.read_parquet('data/cercles.parquet')  # Ajouter les données des cercles
-    return combined_data, provinces_data, geojson_provinces, geojson_regions, grappes_regions, circles_data
-
-# Chargement des données une seule fois
-combined_data, provinces_data, geojson_provinces, geojson_regions, grappes_regions, circles_data = load_data()
-
-
-def generate_province_map(data, column, title):
-    # Assurez-vous que toutes les provinces du geojson sont présentes dans les données
-    all_provinces = pd.DataFrame({'name': geojson_provinces['name']})
-    data = all_provinces.merge(data, left_on='name', right_on='Province', how='left')
-    
-    data[column] = pd.to_numeric(data[column], errors='coerce')
-    
-    # Créer une colonne d'étiquettes
-    if 'Proportion' in column:
-        data['label'] = data.apply(lambda row: f"{row[column]:.2f}%" if pd.notnull(row[column]) and row[column] != 0 else "Hors enquête", axis=1)
-    else:
-        data['label'] = data.apply(lambda row: f"{row[column]:,.0f}".replace(",", " ") if pd.notnull(row[column]) and row[column] != 0 else "Hors enquête", axis=1)
-    
-    fig = px.choropleth(
-        data,
-        geojson=geojson_provinces,
-        locations='name',
-        featureidkey="properties.name",
-        color=column,
-        hover_name='name',
-        hover_data={'label': True, column: False},  # Afficher 'label' au lieu de la valeur numérique
-        color_continuous_scale=px.colors.sequential.Blues,
-        title=title
+# Chargement et prétraitement des données : une seule copie partagée par toutes les sessions,
+# rechargée en arrière-plan quand les fichiers de data/ changent
+@st.cache_resource
+def get_store():
+    store = DatasetStore()
+    # Dictionnaire partagé des libellés et liens cercle -> province -> région
+    store.register(
+        'hierarchy',
+        lambda d: build_hierarchy(d.combined_data, d.circles_data, d.provinces_data, d.grappes_regions),
+        ['combined_data', 'grappes_regions', 'provinces_data', 'circles_data']
     )
-
-    fig.update_traces(
-        hovertemplate="<b>%{hovertext}</b><br>%{customdata[0]}<extra></extra>"
+    # Cube d'indicateurs calculé une seule fois par version des données, avec la projection des dates de fin
+    store.register(
+        'cube',
+        lambda d: add_projections(
+            build_cube(d.combined_data, d.grappes_regions, d.provinces_data, d.circles_data, d.grappe_aggregates, d.aggregates['hierarchy']),
+            d.aggregates['series']
+        ),
+        ['combined_data', 'grappe_aggregates', 'grappes_regions', 'provinces_data', 'circles_data']
     )
-
-    fig.update_geos(fitbounds="locations", visible=False)
-    fig.update_layout(
-        coloraxis_colorbar=dict(title="Pourcentage (%)" if 'Proportion' in column else "Total"),
-        title={
-            'y': 0.9,
-            'x': 0.5,
-            'xanchor': 'center',
-            'yanchor': 'top'
-        },
-        margin={"r": 0, "t": 40, "l": 0, "b": 0}
+    # Indicateurs du registre (taux, ...) évalués à la demande sur le cube, une fois par niveau et par version
+    store.register(
+        'indicators',
+        lambda d: IndicatorStore(d.aggregates['cube']),
+        ['combined_data', 'grappe_aggregates', 'grappes_regions', 'provinces_data', 'circles_data']
     )
+    # Séries journalières (quotidien, cumul, 7 jours) par date, aux niveaux national, régional et provincial
+    store.register(
+        'series',
+        lambda d: build_series(d.combined_data, d.aggregates['hierarchy']),
+        ['combined_data', 'grappes_regions', 'provinces_data', 'circles_data']
+    )
+    # Points d'ancrage des étiquettes des cartes (fichiers compagnons construits par utils/geo.py)
+    store.register(
+        'label_points',
+        lambda d: (load_label_points(PROVINCES_PATH), load_label_points(REGIONS_PATH), load_label_points(CERCLES_PATH)),
+        ['geojson_provinces', 'geojson_regions', 'geojson_cercles', 'labels_provinces', 'labels_regions', 'labels_cercles']
+    )
+    # Couches cartographiques préparées (géométrie simplifiée, indicateurs, étiquettes)
+    store.register(
+        'map_layers',
+        lambda d: build_map_layers(d.aggregates['indicators'], d.aggregates['label_points']),
+        ['combined_data', 'grappe_aggregates', 'grappes_regions', 'provinces_data', 'circles_data', 'geojson_provinces', 'geojson_regions', 'geojson_cercles',
+         'labels_provinces', 'labels_regions', 'labels_cercles', 'simplified_layers']
+    )
+    # Grappes positionnées et regroupées par niveau de zoom, pour la carte des grappes
+    store.register(
+        'grappe_points',
+        lambda d: build_grappe_points(d.aggregates['cube'], d.aggregates['label_points']),
+        ['combined_data', 'grappe_aggregates', 'grappes_regions', 'provinces_data', 'circles_data', 'geojson_provinces', 'geojson_regions', 'geojson_cercles',
+         'labels_provinces', 'labels_regions', 'labels_cercles']
+    )
+    store.current()
+    return store.start()
 
-    # Ajouter les noms des provinces et les valeurs des indicateurs sur la carte
-    for _, row in data.iterrows():
-        centroid = geojson_provinces[geojson_provinces['name'] == row['name']].geometry.centroid.iloc[0]
-        fig.add_annotation(
-            x=centroid.x, y=centroid.y,
-            text=f"<b>{row['name']}<br>{row['label']}</b>",
-            showarrow=False,
-            font=dict(size=10, color="black"),
-            align="center",
-            bgcolor="rgba(255,255,255,0.8)",
-            xanchor="center",
-            yanchor="middle"
-        )
+# Tables et agrégats chargés au premier accès, selon l'échelle affichée
+dataset = get_store().current()
 
-    return fig
 
+# Figures déjà construites, partagées entre les sessions et indexées par version des données
+@st.cache_resource
+def get_figure_cache():
+    return LRUCache()
 
-def generate_fixed_map(data, column, title):
-    # Assurez-vous que toutes les régions du geojson sont présentes dans les données
-    all_regions = pd.DataFrame({'region': geojson_regions['region']})
-    data = all_regions.merge(data, on='region', how='left')
-    
-    data[column] = pd.to_numeric(data[column], errors='coerce')
-    
-    # Créer une colonne d'étiquettes
-    if "Proportion" in title:
-        data['label'] = data.apply(lambda row: f"{row[column]:.2f}%".replace(',', ' ') if pd.notnull(row[column]) and row[column] != 0 else "Hors enquête", axis=1)
-    else:
-        data['label'] = data.apply(lambda row: f"{int(row[column]):,}".replace(',', ' ') if pd.notnull(row[column]) and row[column] != 0 else "Hors enquête", axis=1)
-    
-    fig = px.choropleth(
-        data,
-        geojson=geojson_regions,
-        locations='region',
-        featureidkey="properties.region",
-        color=column,
-        hover_name='region',
-        hover_data={'label': True, column: False},  # Afficher 'label' au lieu de la valeur numérique
-        color_continuous_scale=px.colors.sequential.Blues,
-        title=title
-    )
 
-    fig.update_traces(
-        hovertemplate="<b>%{hovertext}</b><br>%{customdata[0]}<extra></extra>"
-    )
+def cached_figure(key, build):
+    # build() n'est appelé qu'en l'absence de la figure dans le cache
+    def timed_build():
+        with section('figure_build'):
+            return build()
+    return get_figure_cache().get(key, dataset.version, timed_build)
 
-    fig.update_geos(fitbounds="locations", visible=False)
-    
-    # Définir le titre de la légende en fonction de l'indicateur
-    if "Proportion" in title:
-        colorbar_title = "Pourcentage (%)"
-    else:
-        colorbar_title = "Total"
-    
-    fig.update_layout(
-        coloraxis_colorbar=dict(title=colorbar_title),
-        title={
-            'y': 0.9,
-            'x': 0.5,
-            'xanchor': 'center',
-            'yanchor': 'top'
-        },
-        width=1200,  # Augmenter la taille du plot
-        height=900,  # Augmenter la taille du plot
-        margin={"r": 0, "t": 40, "l": 0, "b": 0}
+
+def show_figure(key, build):
+    fig = cached_figure(key, build)
+    # Sérialisation de la figure et envoi au navigateur : st.plotly_chart reconstruit et
+    # sérialise toujours la figure reçue (figure ou dict), seule la construction est mise en cache
+    with section('plotly_chart'):
+        st.plotly_chart(fig)
+
+
+# Permutations de tri des tableaux paginés (niveau, colonne, sens), partagées entre les sessions
+@st.cache_resource
+def get_table_cache():
+    return LRUCache()
+
+
+def level_table(level):
+    # Niveau du cube avec les indicateurs du tableau (LEVEL_COLUMNS), évalués une fois par version
+    columns = [column for column in LEVEL_COLUMNS[level] if column not in KEY_LABELS]
+    return dataset.aggregates['indicators'].frame(level, columns)
+
+
+def table_sort_order(level):
+    data = level_table(level)
+    return lambda column, descending: get_table_cache().get(
+        (level, column, descending), dataset.version, lambda: sort_positions(data[column], descending)
     )
 
-    # Ajouter les noms des régions et les valeurs des indicateurs sur la carte
-    for _, row in data.iterrows():
-        centroid = geojson_regions[geojson_regions['region'] == row['region']].geometry.centroid.iloc[0]
-        fig.add_annotation(
-            x=centroid.x, y=centroid.y,
-            text=f"<b>{row['region']}<br>{row['label']}</b>",
-            showarrow=False,
-            font=dict(size=10, color="black"),
-            align="center",
-            bgcolor="rgba(255,255,255,0.8)",
-            xanchor="center",
-            yanchor="middle"
-        )
 
-    return fig
+# Soumissions d'une région ou d'une province, lues à la demande (filtres poussés au lecteur Parquet)
+SUBMISSIONS_CACHE_SIZE = 8
+SUBMISSION_LABELS = {
+    'submission_date': 'Date de Soumission',
+    **{column: KEY_LABELS[column] for column in ['region_label', 'province_label', 'cldh_label', 'grappe']},
+    'expra': 'Enquête Ménage (1) / Recensement (0)',
+}
+
+
+@st.cache_resource
+def get_submissions_cache():
+    return LRUCache(maxsize=SUBMISSIONS_CACHE_SIZE)
+
+
+def selection_submissions(region, province=None):
+    # Seules les partitions et row groups de la sélection sont lus, une fois par version
+    def read():
+        with one_time_load():
+            return read_submissions(view_columns('soumissions'), region, province)
+    return get_submissions_cache().get((region, province), dataset.version, read)
+
+
+def show_indicator_table(level):
+    columns = LEVEL_COLUMNS[level]
+    data = level_table(level)[list(columns)].rename(columns=columns)
+    st.dataframe(data, hide_index=True, column_config=indicator_column_config(data, column_formats(columns)))
+
+
+def province_layer(region=None):
+    # Pays entier, ou une seule région avec une géométrie plus fine
+    with section('map_layers'):
+        return dataset.aggregates['map_layers'][('province', region if select_lod(region) == 'regional' else 'national')]
+
+
+def layer_note(layer):
+    # Unités sans géométrie dans le fond de carte : absentes de la carte, signalées sous la carte
+    if layer.missing:
+        st.caption(f"Hors couche (sans géométrie, absents de la carte) : {', '.join(layer.missing)}")
+
+
+def export_controls(level, region=None, province=None):
+    # Fichier généré au clic, hors du script, puis réutilisé pour la même version des données ;
+    # le navigateur le télécharge depuis la route statique, sans copie en mémoire
+    with st.expander("Exporter"):
+        source_col, format_col, button_col = st.columns([2, 1, 1])
+        indicators_label = "Indicateurs nationaux" if level == 'national' else "Indicateurs"
+        source = source_col.radio("Données", [indicators_label, "Soumissions brutes"], horizontal=True, key=f"export_{level}_source")
+        table = level if source == indicators_label else RAW_TABLE
+        formats = available_formats()
+        if 'xlsx' in formats and export_rows(dataset, table, region, province) > XLSX_MAX_ROWS:
+            formats.remove('xlsx')
+            source_col.caption(f"XLSX indisponible : plus de {XLSX_MAX_ROWS:,} lignes".replace(',', ' '))
+        fmt = format_col.selectbox("Format", formats, key=f"export_{level}_format")
+        request = (dataset.version, table, fmt, region, province)
+        name = export_name(table, fmt, region, province)
+
+        if button_col.button("Préparer", key=f"export_{level}_prepare"):
+            try:
+                # Export écrit une fois par version : chargement ponctuel, compté à part
+                with one_time_load():
+                    st.session_state[f"export_{level}_file"] = (request, export_file(dataset, table, fmt, region, province))
+            except ValueError as error:
+                st.warning(str(error))
+        prepared = st.session_state.get(f"export_{level}_file")
+        if prepared is not None and prepared[0] == request:
+            st.markdown(f'<a href="{export_url(prepared[1])}" download="{name}">Télécharger {name}</a>', unsafe_allow_html=True)
+
+
+# Administration : profilage des sections de l'affichage
+ADMIN_TOKEN = os.environ.get('EDH_ADMIN_TOKEN')
+# Nombre d'exécutions profilées conservées par session
+PROFILE_HISTORY = 50
 
 
+def is_admin():
+    # Compte admin (connexion) ou jeton passé dans l'URL : ?admin=<EDH_ADMIN_TOKEN>
+    if st.session_state.get("username") == "admin":
+        return True
+    return ADMIN_TOKEN is not None and st.query_params.get("admin") == ADMIN_TOKEN
 
 
+def profiling_controls():
+    with st.sidebar.expander("Profilage"):
+        enabled = st.checkbox("Mesurer les sections", key="profiling")
+        mode = st.selectbox("Capture complète", CAPTURE_MODES, key="profiling_capture")
+        capture = st.button("Profiler cette exécution")
+    # Le clic relance le script : c'est cette exécution qui est capturée
+    return enabled or capture, mode if capture else None
 
 
+def profiling_panel(run):
+    # Historique borné par exécution : les PROFILE_HISTORY dernières, quel que soit leur nombre de sections
+    runs = st.session_state.setdefault("profiling_runs", [])
+    runs.append(run.records)
+    del runs[:-PROFILE_HISTORY]
+    history = [record for records in runs for record in records]
+
+    with st.sidebar.expander("Profilage : dernière exécution", expanded=True):
+        st.dataframe(pd.DataFrame(run.records).drop(columns=['run_at', 'level', 'view', 'version']), hide_index=True)
+        st.download_button("Historique (JSON lignes)", to_json_lines(history), "profilage.jsonl", "application/x-ndjson")
+        st.download_button("Historique (CSV)", to_csv(history), "profilage.csv", "text/csv")
+        if run.report:
+            st.code(run.report)
+
+
+# Indicateurs et mesures des tendances journalières : colonnes de la série précalculée
+TREND_INDICATORS = {'Enquêtes Ménage': 'expra_1', 'Recensements': 'expra_0', 'Grappes': 'unique_grappe'}
+TREND_MEASURES = {'Quotidien': '', 'Cumul': '_cumul', '7 jours glissants': '_7j'}
+
+
+# Indicateurs proposés dans les graphiques par unité
+CHART_INDICATORS = ['expra_1', 'expra_0', 'unique_grappe', 'nb_grappe', 'ratio_expra', 'percent_unique_grappe']
+# Marge au-dessus de la valeur maximale pour l'axe y
+Y_LIM_MULTIPLIER = 1.1
+
+
+def indicator_label(name):
+    return INDICATORS[name].label
+
+
+def indicator_bar(data, key, name, scope):
+    # Diagramme en barres d'un indicateur du registre : libellé, unité et format viennent de sa définition
+    import plotly.express as px
+
+    indicator = INDICATORS[name]
+    percent = indicator.unit == 'percent'
+    data = data.assign(**{key: data[key].astype(str)})
+    fig = px.bar(data, x=key, y=name, title=f"{indicator.label} {scope}",
+                 labels={key: KEY_LABELS[key], name: indicator.label + (" (%)" if percent else "")})
+    fig.update_traces(texttemplate='%{y:.2f}%' if percent else '%{y:,.0f}', textposition='outside')
+    fig.update_layout(
+        uniformtext_minsize=8,
+        uniformtext_mode='hide',
+        yaxis=dict(range=[0, data[name].max() * Y_LIM_MULTIPLIER]),
+        title={'x': 0.35},
+        separators=', '
+    )
+    return fig
+
 
 # Fonction principale pour afficher les indicateurs
 def display_indicators(level, view):
+    # Le cube n'est construit qu'au premier affichage qui en a besoin
+    with section('cube'):
+        cube = dataset.aggregates['cube']
+        indicators = dataset.aggregates['indicators']
     if level == "Vision Macroscopique":
+        with section('series'):
+            series = dataset.aggregates['series']
         st.title("Chiffres Clés")
 
         if view == "Tableau":
             st.subheader("")
-            num_days = (combined_data['submission_date'].max() - combined_data['submission_date'].min()).days +1
-            total_expra = combined_data['expra'].sum()
-            total_recensement = (combined_data['expra'] == 0).sum()
-            daily_expra = combined_data.groupby('submission_date')['expra'].sum()
-            global_prog_enq = (total_expra/35000)*100
-            total_grap = combined_data['grappe'].nunique()
-            global_prog_grap = (total_grap/10225)*100
+            num_days = len(series.dates)
+            national = cube['national'].iloc[0]
+            total_expra = national['expra_1']
+            total_recensement = national['expra_0']
+            cadence_mean, cadence_std = series.cadence('national')
+            global_prog_enq = indicators.column('national', 'taux_realisation')[0]
+            total_grap = national['unique_grappe']
+            global_prog_grap = indicators.column('national', 'percent_unique_grappe')[0]
+            # Projection à la cadence des 7 derniers jours
+            date_fin = national['date_fin']
+            projection = "Non projetable (aucune activité récente)" if pd.isna(date_fin) else f"{date_fin:%d/%m/%Y} ({national['jours_restants']:.0f} jours restants)"
 
             
             national_indicators = {
@@ -221,66 +340,87 @@ def display_indicators(level, view):
                 "Grappes enquêtées": f"{total_grap} grappes",
                 "Enquêtes ménages": f"{total_expra} enquêtes",
                 "Recensements": f"{total_recensement} enquêtes",
-                "Cadence quotidienne moyenne": f"{daily_expra.mean():.0f} enquêtes ménage par jour",
-                "Variation de la cadence (Écart-type)": f"{daily_expra.std():.2f}"
+                "Cadence quotidienne moyenne": f"{cadence_mean:.0f} enquêtes ménage par jour",
+                "Variation de la cadence (Écart-type)": f"{cadence_std:.2f}",
+                "Date de fin projetée": projection
             }
             
             df = pd.DataFrame(national_indicators.items(), columns=["Indicateur", "Valeur"]).reset_index(drop=True)
             st.table(df)
+            export_controls('national')
 
         elif view == "Datavisualisation":
+            import plotly.express as px
+
             #st.subheader("Focus Visuel")
 
             # Calcul des indicateurs
-            total_enquetes_menage = combined_data['expra'].sum()
-            total_recensement = (combined_data['expra'] == 0).sum()
-            total_grappes = combined_data['grappe'].nunique()
-            progress_global_enquetes_menage = (total_enquetes_menage / 35000) * 100  
-            progress_global_grappes = (total_grappes / 10225) * 100  
+            national = cube['national'].iloc[0]
+            total_enquetes_menage = national['expra_1']
+            total_recensement = national['expra_0']
+            progress_global_enquetes_menage = indicators.column('national', 'taux_realisation')[0]
+            progress_global_grappes = indicators.column('national', 'percent_unique_grappe')[0]
 
             # Barres horizontales pour Progrès Globaux
             #st.write("### Progrès Globaux")
-            progress_df = pd.DataFrame({
-                'Indicateur': ['Taux de réalisation des enquêtes ménage', 'Taux de couverture des grappes'],
-                'Pourcentage': [progress_global_enquetes_menage, progress_global_grappes],
-                'Restant': [100 - progress_global_enquetes_menage, 100 - progress_global_grappes]
-            })
-            fig_progress = px.bar(progress_df, y='Indicateur', x=['Pourcentage', 'Restant'], orientation='h', title="Taux d'Atteinte des Objectifs", barmode='stack')
-            fig_progress.update_traces(texttemplate='%{x:.2f}%', textposition='inside')
-            fig_progress.update_layout(uniformtext_minsize=8, uniformtext_mode='hide', title={'x':0.35})
-            st.plotly_chart(fig_progress)
+            def build_progress():
+                progress_df = pd.DataFrame({
+                    'Indicateur': ['Taux de réalisation des enquêtes ménage', 'Taux de couverture des grappes'],
+                    'Pourcentage': [progress_global_enquetes_menage, progress_global_grappes],
+                    'Restant': [100 - progress_global_enquetes_menage, 100 - progress_global_grappes]
+                })
+                fig_progress = px.bar(progress_df, y='Indicateur', x=['Pourcentage', 'Restant'], orientation='h', title="Taux d'Atteinte des Objectifs", barmode='stack')
+                fig_progress.update_traces(texttemplate='%{x:.2f}%', textposition='inside')
+                fig_progress.update_layout(uniformtext_minsize=8, uniformtext_mode='hide', title={'x':0.35})
+                return fig_progress
+
+            show_figure((level, view, 'progress'), build_progress)
 
             # Barres verticales pour Total Enquêtes Ménage et Total Recensement
             #st.write("### Total Enquêtes Ménage et Recensement")
-            total_df = pd.DataFrame({
-                'Indicateur': ['Enquêtes Ménage', 'Recensements'],
-                'Valeur': [total_enquetes_menage, total_recensement]
-            })
-            fig_total = px.bar(total_df, x='Indicateur', y='Valeur', title="Bilan des Opérations : Enquêtes Ménage et Recensements")
-            fig_total.update_traces(texttemplate='%{y}', textposition='outside')
-            fig_total.update_layout(uniformtext_minsize=8, uniformtext_mode='hide', title={'x':0.35})
-            st.plotly_chart(fig_total)
+            def build_total():
+                total_df = pd.DataFrame({
+                    'Indicateur': ['Enquêtes Ménage', 'Recensements'],
+                    'Valeur': [total_enquetes_menage, total_recensement]
+                })
+                fig_total = px.bar(total_df, x='Indicateur', y='Valeur', title="Bilan des Opérations : Enquêtes Ménage et Recensements")
+                fig_total.update_traces(texttemplate='%{y}', textposition='outside')
+                fig_total.update_layout(uniformtext_minsize=8, uniformtext_mode='hide', title={'x':0.35})
+                return fig_total
+
+            show_figure((level, view, 'total'), build_total)
 
             # Evolution des enquêtes ménages, recensement et grappes par jour
             st.write("### Tendances Journalières")
-            combined_data['submission_date'] = pd.to_datetime(combined_data['submission_date'])
-            daily_data = combined_data.groupby('submission_date').agg({
-                'expra': ['sum', lambda x: (x == 0).sum()],
-                'grappe': 'nunique'
-            }).reset_index()
-            daily_data.columns = ['submission_date', 'Enquêtes Ménage', 'Recensements', 'Grappes']
-
             evolution_type = st.selectbox("Sélectionner l'Indicateur de Suivi", ['Enquêtes Ménage', 'Recensements', 'Grappes'])
-            fig_evolution = px.line(daily_data, x='submission_date', y=evolution_type, title=f"Tendance Journalière : {evolution_type}", labels={'submission_date': 'Date', evolution_type: evolution_type})
+            scope_col, province_col, measure_col = st.columns(3)
+            scope = scope_col.selectbox("Périmètre", ['Ensemble du pays'] + series.keys('region'))
+            provinces = [] if scope == 'Ensemble du pays' else list(cube['province'].loc[cube['province']['region_label'] == scope, 'province_label'])
+            province = province_col.selectbox("Province", ['Toutes les Provinces'] + provinces)
+            measure = measure_col.radio("Mesure", list(TREND_MEASURES), horizontal=True)
+
+            def build_evolution():
+                # Tranche de la série précalculée : aucun parcours des soumissions
+                if province != 'Toutes les Provinces':
+                    trend = series.series('province', province)
+                elif scope != 'Ensemble du pays':
+                    trend = series.series('region', scope)
+                else:
+                    trend = series.series('national')
+                column = TREND_INDICATORS[evolution_type] + TREND_MEASURES[measure]
+                title = f"Tendance Journalière : {evolution_type}" + ("" if measure == 'Quotidien' else f" ({measure.lower()})")
+                fig_evolution = px.line(trend.reset_index(), x='submission_date', y=column, title=title, labels={'submission_date': 'Date', column: evolution_type})
+
+                # Traduire les dates en français
+                fig_evolution.update_layout(
+                    xaxis=dict(
+                        tickformat="%d-%m-%Y"
+                    ),
+                    title={'x':0.35}
+                )
+                return fig_evolution
 
-            # Traduire les dates en français
-            fig_evolution.update_layout(
-                xaxis=dict(
-                    tickformat="%d-%m-%Y"
-                ),
-                title={'x':0.35}
-            )
-            st.plotly_chart(fig_evolution)
+            show_figure((level, view, 'evolution', evolution_type, scope, province, measure), build_evolution)
 
         elif view == "Géo-intelligence":
             st.subheader("Disponible en Zoom Régional et Provincial")
@@ -288,615 +428,181 @@ def display_indicators(level, view):
             #st.plotly_chart(fig)
 
     elif level == "Zoom Régional":
-        #st.title("Indicateurs par Région")
-
-        region_data = combined_data.groupby('region_label').agg(
-            expra_1=('expra', lambda x: (x == 1).sum()),
-            expra_0=('expra', lambda x: (x == 0).sum()),
-            unique_grappe=('grappe', pd.Series.nunique)
-        ).reset_index()
-        region_data = region_data.merge(grappes_regions, left_on='region_label', right_on='region')
-        region_data['ratio_expra'] = (region_data['expra_1'] / region_data['expra_0']) * 100
-        region_data['percent_unique_grappe'] = (region_data['unique_grappe'] / region_data['nb_grappes']) * 100
-        region_data = region_data.replace([np.inf, -np.inf], np.nan).fillna(0)
-
-        # Sélectionner les colonnes à afficher
-        region_data = region_data[['region_label', 'expra_1', 'expra_0', 'unique_grappe', 'nb_grappes', 'ratio_expra', 'percent_unique_grappe']]
-        region_data.columns = ['Région', 'ENQUMENAGE', 'Recensement', 'Nb grappes enquêtées', 'Nb grappes total', 'Proportion ENQUMENAGE/Recensement', 'Proportion de grappes enquêtées']
-
-        # Formatage des colonnes
-        region_data['ENQUMENAGE'] = region_data['ENQUMENAGE'].apply(lambda x: f"{x:,}".replace(",", " "))
-        region_data['Recensement'] = region_data['Recensement'].apply(lambda x: f"{x:,}".replace(",", " "))
-        region_data['Nb grappes enquêtées'] = region_data['Nb grappes enquêtées'].apply(lambda x: f"{x:,}".replace(",", " "))
-        region_data['Nb grappes total'] = region_data['Nb grappes total'].apply(lambda x: f"{x:,}".replace(",", " "))
-        region_data['Proportion ENQUMENAGE/Recensement'] = region_data['Proportion ENQUMENAGE/Recensement'].apply(lambda x: f"{x:.2f}%")
-        region_data['Proportion de grappes enquêtées'] = region_data['Proportion de grappes enquêtées'].apply(lambda x: f"{x:.2f}%")
-
-        region_data1 = region_data.copy(deep=True)
-
-        # Définir les nouveaux noms de colonnes
-        new_columns = [
-            'Région',
-            'Enquêtes Ménage',
-            'Recensements',
-            'Grappes Couvertes',
-            'Taux Enquêtes Ménage/Recensements',
-            'Taux de Couverture des Grappes'
-        ]
-
-        # Créer un dictionnaire de mapping entre anciens et nouveaux noms
-        column_mapping = {
-            'Région': 'Région',
-            'ENQUMENAGE': 'Enquêtes Ménage',
-            'Recensement': 'Recensements',
-            'Nb grappes enquêtées': 'Grappes Couvertes',
-            'Proportion ENQUMENAGE/Recensement': 'Taux Enquêtes Ménage/Recensements',
-            'Proportion de grappes enquêtées': 'Taux de Couverture des Grappes'
-        }
-        # Renommer les colonnes
-        region_data1 = region_data1.rename(columns=column_mapping)
-
-        # Réorganiser les colonnes selon l'ordre spécifié
-        region_data1 = region_data1[new_columns]
-
         if view == "Tableau":
             st.subheader("Matrice Comparative des Indicateurs Régionaux")
-            st.dataframe(region_data1)
+            with section('table'):
+                show_indicator_table('region')
+            export_controls('region')
 
         elif view == "Datavisualisation":
             st.subheader("Aperçu Graphique des Indicateurs Régionaux")
 
-            # Fonction pour nettoyer et convertir les valeurs en float
-            def clean_and_convert(column):
-                return column.str.replace(' ', '').str.replace('%', '').astype(float)
-
-            # Nettoyer et convertir les colonnes en float
-            region_data['ENQUMENAGE'] = clean_and_convert(region_data['ENQUMENAGE'])
-            region_data['Recensement'] = clean_and_convert(region_data['Recensement'])
-            region_data['Nb grappes enquêtées'] = clean_and_convert(region_data['Nb grappes enquêtées'])
-            region_data['Nb grappes total'] = clean_and_convert(region_data['Nb grappes total'])
-            region_data['Proportion ENQUMENAGE/Recensement'] = clean_and_convert(region_data['Proportion ENQUMENAGE/Recensement'])
-            region_data['Proportion de grappes enquêtées'] = clean_and_convert(region_data['Proportion de grappes enquêtées'])
-
-            # Utiliser les valeurs nettoyées et converties pour définir les limites de l'axe y
-            y_lim_multiplier = 1.1
-
             # Filtre pour sélectionner l'indicateur à afficher
-            indicateur = st.selectbox(
-                "Sélectionner l'Indicateur de Suivi", 
-                
-                [
-                    "Enquêtes Ménage",
-                    "Recensements",
-                    "Grappes Couvertes",
-                    "Distribution des Grappes",
-                    "Taux Enquêtes Ménage/Recensements",
-                    "Taux de Couverture des Grappes"
-                ]
-            )
-
-            # Affichage du graphique en fonction de l'indicateur sélectionné
-            if indicateur == "Enquêtes Ménage":
-                fig = px.bar(region_data, x='Région', y='ENQUMENAGE', title="Enquêtes Ménage par Région", labels={'ENQUMENAGE': 'ENQUMENAGE'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, region_data['ENQUMENAGE'].max() * y_lim_multiplier]),
-                    title={'x':0.35},
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Recensements":
-                fig = px.bar(region_data, x='Région', y='Recensement', title="Recensements par Région", labels={'Recensement': 'Recensement'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, region_data['Recensement'].max() * y_lim_multiplier]),
-                    title={'x':0.35},
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Grappes Couvertes":
-                fig = px.bar(region_data, x='Région', y='Nb grappes enquêtées', title="Grappes Couvertes par Région", labels={'Nb grappes enquêtées': 'Nb grappes enquêtées'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, region_data['Nb grappes enquêtées'].max() * y_lim_multiplier]),
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Distribution des Grappes":
-                fig = px.bar(region_data, x='Région', y='Nb grappes total', title="Distribution des Grappes par Région", labels={'Nb grappes total': 'Nb grappes total'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, region_data['Nb grappes total'].max() * y_lim_multiplier]),
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Taux Enquêtes/Recensements":
-                fig = px.bar(region_data, x='Région', y='Proportion ENQUMENAGE/Recensement', title="Taux Enquêtes Ménage/Recensements par Région", labels={'Proportion ENQUMENAGE/Recensement': 'Proportion ENQUMENAGE/Recensement (%)'})
-                fig.update_traces(texttemplate='%{y:.2f}%', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, region_data['Proportion ENQUMENAGE/Recensement'].max() * y_lim_multiplier]),
-                    separators=', '  # Ajouté ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Taux de Couverture des Grappes":
-                fig = px.bar(region_data, x='Région', y='Proportion de grappes enquêtées', title="Taux de Couverture des Grappes par Région", labels={'Proportion de grappes enquêtées': 'Proportion de grappes enquêtées (%)'})
-                fig.update_traces(texttemplate='%{y:.2f}%', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, region_data['Proportion de grappes enquêtées'].max() * y_lim_multiplier]),
-                    separators=', '  # Ajouté ici
-                )
-                st.plotly_chart(fig)
-
+            indicateur = st.selectbox("Sélectionner l'Indicateur de Suivi", CHART_INDICATORS, format_func=indicator_label)
 
+            def build_figure():
+                return indicator_bar(indicators.frame('region', CHART_INDICATORS), 'region_label', indicateur, "par Région")
 
+            show_figure((level, view, indicateur), build_figure)
 
         elif view == "Géo-intelligence":
             st.subheader("Aperçu Cartographique des Indicateurs Régionaux")
 
             # Filtre pour sélectionner l'indicateur
-            indicateur = st.selectbox(
-                "Sélectionner l'Indicateur de Suivi", 
-                [
-                    "Enquêtes Ménage",
-                    "Recensements",
-                    "Grappes Couvertes",
-                    "Taux Enquêtes Ménage/Recensements",
-                    "Taux de Couverture des Grappes"
-                ]
-            )
-
-            # Charger le fichier GeoJSON
-            geojson_path = 'data/updated_maroc.geojson'
-            geo_data = gpd.read_file(geojson_path)
-
-            # Filtrer les données GeoJSON pour ne conserver que les régions du Maroc
-            maroc_regions = geo_data[geo_data['region'].notnull()]
-
-            # Assurer que toutes les régions soient incluses dans la fusion
-            region_data_full = maroc_regions[['region', 'geometry']].merge(region_data, left_on='region', right_on='Région', how='left')
-
-            # Convertir les colonnes en valeurs numériques si nécessaire et remplir les valeurs manquantes avec 0
-            region_data_full['Enquêtes Ménage'] = pd.to_numeric(region_data_full['ENQUMENAGE'].str.replace(' ', ''), errors='coerce').fillna(0)
-            region_data_full['Recensements'] = pd.to_numeric(region_data_full['Recensement'].str.replace(' ', ''), errors='coerce').fillna(0)
-            region_data_full['Grappes Couvertes'] = pd.to_numeric(region_data_full['Nb grappes enquêtées'].str.replace(' ', ''), errors='coerce').fillna(0)
-            region_data_full['Proportion ENQUMENAGE/Recensement'] = pd.to_numeric(region_data_full['Proportion ENQUMENAGE/Recensement'].str.replace('%', ''), errors='coerce').fillna(0)
-            region_data_full['Taux de Couverture des Grappes'] = pd.to_numeric(region_data_full['Proportion de grappes enquêtées'].str.replace('%', ''), errors='coerce').fillna(0)
-
-            # Générer la carte pour l'indicateur sélectionné
-            title_map = {
-                'Enquêtes Ménage': 'Répartition Régionale des Enquêtes Ménage',
-                'Recensements': 'Répartition Régionale des Recensements',
-                'Grappes Couvertes': 'Répartition Régionale des Grappes Enquêtées',
-                'Taux Enquêtes Ménage/Recensements': 'Répartition Régionale du Taux Enquêtes/Recensements',
-                'Taux de Couverture des Grappes': 'Répartition Régionale du Taux de Couverture des Grappes'
-            }
+            indicateur = st.selectbox("Sélectionner l'Indicateur de Suivi", list(MAP_INDICATORS), format_func=indicator_label)
 
-            fig = generate_fixed_map(region_data_full, indicateur, title_map[indicateur])
-            st.plotly_chart(fig)
+            with section('map_layers'):
+                layer = dataset.aggregates['map_layers'][('region', 'national')]
 
+            def build_map():
+                return generate_fixed_map(layer, MAP_INDICATORS[indicateur], f"Répartition Régionale : {MAP_INDICATORS[indicateur]}")
 
+            show_figure((level, view, indicateur), build_map)
+            layer_note(layer)
 
-    elif level == "Zoom Provincial":
-        #st.title("Indicateurs par Province")
-
-        province_data = combined_data.groupby('province_label').agg(
-            expra_1=('expra', lambda x: (x == 1).sum()),
-            expra_0=('expra', lambda x: (x == 0).sum()),
-            unique_grappe=('grappe', pd.Series.nunique)
-        ).reset_index()
-        province_data = province_data.merge(provinces_data, left_on='province_label', right_on='province')
-        province_data = province_data.merge(combined_data[['province_label', 'region_label']].drop_duplicates(), on='province_label', how='left')
-        province_data['ratio_expra'] = (province_data['expra_1'] / province_data['expra_0']) * 100
-        province_data['percent_unique_grappe'] = (province_data['unique_grappe'] / province_data['nb_grappe']) * 100
-        province_data = province_data.replace([np.inf, -np.inf], np.nan).fillna(0)
-
-        # Sélectionner les colonnes à afficher
-        province_data = province_data[['province_label', 'region_label', 'expra_1', 'expra_0', 'unique_grappe', 'nb_grappe', 'ratio_expra', 'percent_unique_grappe']]
-        province_data.columns = ['Province', 'Région', 'ENQUMENAGE', 'Recensement', 'Nb grappes enquêtées', 'Nb grappes total', 'Proportion ENQUMENAGE/Recensement', 'Proportion de grappes enquêtées']
-
-        # Formatage des colonnes
-        province_data['ENQUMENAGE'] = province_data['ENQUMENAGE'].apply(lambda x: f"{x:,}".replace(",", " "))
-        province_data['Recensement'] = province_data['Recensement'].apply(lambda x: f"{x:,}".replace(",", " "))
-        province_data['Nb grappes enquêtées'] = province_data['Nb grappes enquêtées'].apply(lambda x: f"{x:,}".replace(",", " "))
-        province_data['Nb grappes total'] = province_data['Nb grappes total'].apply(lambda x: f"{x:,}".replace(",", " "))
-        province_data['Proportion ENQUMENAGE/Recensement'] = province_data['Proportion ENQUMENAGE/Recensement'].apply(lambda x: f"{x:.2f}%")
-        province_data['Proportion de grappes enquêtées'] = province_data['Proportion de grappes enquêtées'].apply(lambda x: f"{x:.2f}%")
-
-        # Créer une copie profonde de province_data
-        province_data1 = province_data.copy(deep=True)
-
-        # Définir les nouveaux noms de colonnes
-        new_columns = [
-            'Province',
-            'Région',
-            'Enquêtes Ménage',
-            'Recensements',
-            'Grappes Couvertes',
-            'Nombre Total de Grappes',
-            'Taux Enquêtes Ménage/Recensements',
-            'Taux de Couverture des Grappes'
-        ]
-
-        # Créer un dictionnaire de mapping entre anciens et nouveaux noms
-        column_mapping = {
-            'Province': 'Province',
-            'Région': 'Région',
-            'ENQUMENAGE': 'Enquêtes Ménage',
-            'Recensement': 'Recensements',
-            'Nb grappes enquêtées': 'Grappes Couvertes',
-            'Nb grappes total': 'Nombre Total de Grappes',
-            'Proportion ENQUMENAGE/Recensement': 'Taux Enquêtes Ménage/Recensements',
-            'Proportion de grappes enquêtées': 'Taux de Couverture des Grappes'
-        }
-
-        # Renommer les colonnes
-        province_data1 = province_data1.rename(columns=column_mapping)
 
+    elif level == "Zoom Provincial":
+        regions = ['Toutes les Régions'] + list(cube['region']['region_label'].astype(str))
 
         if view == "Tableau":
             st.subheader("Matrice Comparative des Indicateurs Provinciaux")
-            st.dataframe(province_data1)
-
+            with section('table'):
+                show_indicator_table('province')
+            export_controls('province')
 
         elif view == "Datavisualisation":
             st.subheader("Aperçu Graphique des Indicateurs Provinciaux")
 
-            # Fonction pour nettoyer et convertir les valeurs en float
-            def clean_and_convert(column):
-                return column.str.replace(' ', '').str.replace('%', '').astype(float)
-
-            # Nettoyer et convertir les colonnes en float
-            province_data['ENQUMENAGE'] = clean_and_convert(province_data['ENQUMENAGE'])
-            province_data['Recensement'] = clean_and_convert(province_data['Recensement'])
-            province_data['Nb grappes enquêtées'] = clean_and_convert(province_data['Nb grappes enquêtées'])
-            province_data['Nb grappes total'] = clean_and_convert(province_data['Nb grappes total'])
-            province_data['Proportion ENQUMENAGE/Recensement'] = clean_and_convert(province_data['Proportion ENQUMENAGE/Recensement'])
-            province_data['Proportion de grappes enquêtées'] = clean_and_convert(province_data['Proportion de grappes enquêtées'])
-
-            # Utiliser les valeurs nettoyées et converties pour définir les limites de l'axe y
-            y_lim_multiplier = 1.1
-
-            # Filtre pour sélectionner la région
-            regions = ['Toutes les Régions'] + list(province_data['Région'].unique())
+            # Filtres : région, puis indicateur à afficher
             selected_region = st.selectbox("Choisir une Région", regions)
+            indicateur = st.selectbox("Sélectionner l'Indicateur de Suivi", CHART_INDICATORS, format_func=indicator_label)
 
-            # Filtre pour sélectionner l'indicateur à afficher
-            indicateur = st.selectbox(
-                "Sélectionner l'Indicateur de Suivi", 
-                
-                [
-                    "Enquêtes Ménage",
-                    "Recensements",
-                    "Grappes Couvertes",
-                    "Nombre Total de Grappes",
-                    "Taux Enquêtes Ménage/Recensements",
-                    "Taux de Couverture des Grappes"
-                ]
-            )
-
-            # Filtrer les données en fonction de la région sélectionnée
-            if selected_region != 'Toutes les Régions':
-                filtered_data = province_data[province_data['Région'] == selected_region]
-            else:
-                filtered_data = province_data
-
-            # Affichage du graphique en fonction de l'indicateur sélectionné
-            if indicateur == "Enquêtes Ménage":
-                fig = px.bar(filtered_data, x='Province', y='ENQUMENAGE', title="Enquêtes Ménage par Province", labels={'ENQUMENAGE': 'ENQUMENAGE'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['ENQUMENAGE'].max() * y_lim_multiplier]),
-                    title={'x':0.35},
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Recensements":
-                fig = px.bar(filtered_data, x='Province', y='Recensement', title="Recensements par Province", labels={'Recensement': 'Recensement'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['Recensement'].max() * y_lim_multiplier]),
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Grappes Couvertes":
-                fig = px.bar(filtered_data, x='Province', y='Nb grappes enquêtées', title="Grappes Couvertes par Province", labels={'Nb grappes enquêtées': 'Nb grappes enquêtées'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['Nb grappes enquêtées'].max() * y_lim_multiplier]),
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Nombre Total de Grappes":
-                fig = px.bar(filtered_data, x='Province', y='Nb grappes total', title="Nombre Total de Grappes par Province", labels={'Nb grappes total': 'Nb grappes total'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['Nb grappes total'].max() * y_lim_multiplier]),
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Taux Enquêtes Ménage/Recensements":
-                fig = px.bar(filtered_data, x='Province', y='Proportion ENQUMENAGE/Recensement', title="Taux Enquêtes Ménage/Recensements par Province", labels={'Proportion ENQUMENAGE/Recensement': 'Proportion ENQUMENAGE/Recensement (%)'})
-                fig.update_traces(texttemplate='%{y:.2f}%', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['Proportion ENQUMENAGE/Recensement'].max() * y_lim_multiplier]),
-                    separators=', '  # Ajouté ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Taux de Couverture des Grappes":
-                fig = px.bar(filtered_data, x='Province', y='Proportion de grappes enquêtées', title="Taux de Couverture des Grappes par Province", labels={'Proportion de grappes enquêtées': 'Proportion de grappes enquêtées (%)'})
-                fig.update_traces(texttemplate='%{y:.2f}%', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['Proportion de grappes enquêtées'].max() * y_lim_multiplier]),
-                    separators=', '  # Ajouté ici
-                )
-                st.plotly_chart(fig)
-
+            def build_figure():
+                data = indicators.frame('province', CHART_INDICATORS)
+                if selected_region != 'Toutes les Régions':
+                    data = data[data['region_label'] == selected_region]
+                return indicator_bar(data, 'province_label', indicateur, "par Province")
 
+            show_figure((level, view, indicateur, selected_region), build_figure)
 
         elif view == "Géo-intelligence":
             st.subheader("Cartographie des Indicateurs par Provinciaux")
 
-            # Filtre pour sélectionner la région
-            regions = ['Toutes les Régions'] + list(province_data['Région'].unique())
+            # Filtres : région, puis indicateur
             selected_region = st.selectbox("Sélectionnez une région", regions)
+            indicateur = st.selectbox("Sélectionnez un indicateur", list(MAP_INDICATORS), format_func=indicator_label)
 
-            # Filtre pour sélectionner l'indicateur
-            indicateur = st.selectbox(
-                "Sélectionnez un indicateur", 
-                ['Enquêtes Ménage', 
-                 'Recensements', 
-                 'Grappes Couvertes', 
-                 'Taux Enquêtes Ménage/Recensements', 
-                 'Taux de Couverture des Grappes']
-            )
-
-            # Filtrer les données en fonction de la région sélectionnée
-            if selected_region != 'Toutes les Régions':
-                filtered_data = province_data[province_data['Région'] == selected_region]
-            else:
-                filtered_data = province_data.copy()
-
-            # Convertir les colonnes en valeurs numériques si nécessaire et remplir les valeurs manquantes avec 0
-            filtered_data['Enquêtes Ménage'] = pd.to_numeric(filtered_data['ENQUMENAGE'].str.replace(' ', ''), errors='coerce').fillna(0)
-            filtered_data['Recensements'] = pd.to_numeric(filtered_data['Recensement'].str.replace(' ', ''), errors='coerce').fillna(0)
-            filtered_data['Grappes Couvertes'] = pd.to_numeric(filtered_data['Nb grappes enquêtées'].str.replace(' ', ''), errors='coerce').fillna(0)
-            filtered_data['Taux Enquêtes Ménage/Recensements'] = pd.to_numeric(filtered_data['Proportion ENQUMENAGE/Recensement'].str.replace('%', ''), errors='coerce').fillna(0)
-            filtered_data['Taux de Couverture des Grappes'] = pd.to_numeric(filtered_data['Proportion de grappes enquêtées'].str.replace('%', ''), errors='coerce').fillna(0)
+            layer = province_layer(None if selected_region == 'Toutes les Régions' else selected_region)
 
-            # Générer la carte pour l'indicateur sélectionné
-            title_map = {
-                'Enquêtes Ménage': 'Répartition Provinciale des Enquêtes Ménage',
-                'Recensements': 'Répartition Provinciale des Recensements',
-                'Grappes Couvertes': 'Répartition Provinciale des Grappes Enquêtées',
-                'Taux Enquêtes Ménage/Recensements': 'Répartition Provinciale du Taux Enquêtes/Recensements',
-                'Taux de Couverture des Grappes': 'Répartition Provinciale du Taux de Couverture des Grappes'
-                }
+            def build_map():
+                return generate_province_map(layer, MAP_INDICATORS[indicateur], f"Répartition Provinciale : {MAP_INDICATORS[indicateur]}")
 
-            fig = generate_province_map(filtered_data, indicateur, title_map[indicateur])
-            st.plotly_chart(fig)
+            show_figure((level, view, indicateur, selected_region), build_map)
+            layer_note(layer)
 
 
     elif level == "Zoom Cercles":
-        # Analyse par cercles
-        combined_data['cldh_label'] = combined_data['cldh_label'].astype(str).str.strip()
-        circles_data['cldh_label'] = circles_data['cldh_label'].astype(str).str.strip()
-
-        # Agrégation des données par cercle
-        circle_data = combined_data.groupby('cldh_label').agg(
-            expra_1=('expra', lambda x: (x == 1).sum()),
-            expra_0=('expra', lambda x: (x == 0).sum()),
-            unique_grappe=('grappe', pd.Series.nunique)
-        ).reset_index()
-
-        # Fusion avec circles_data
-        circle_data = circle_data.merge(circles_data, left_on='cldh_label', right_on='cldh_label')
-
-        # Fusion avec combined_data pour obtenir la province
-        circle_data = circle_data.merge(combined_data[['cldh_label', 'province_label']].drop_duplicates(), on='cldh_label', how='left')
-
-        # Suppression des doublons de colonnes et renommage
-        if 'province_label_x' in circle_data.columns and 'province_label_y' in circle_data.columns:
-            circle_data['province_label'] = circle_data['province_label_x']
-            circle_data = circle_data.drop(columns=['province_label_x', 'province_label_y'])
-
-        # Calcul des ratios et pourcentages
-        circle_data['ratio_expra'] = (circle_data['expra_1'] / circle_data['expra_0']) * 100
-        circle_data['percent_unique_grappe'] = (circle_data['unique_grappe'] / circle_data['nb_grappe']) * 100
-        circle_data = circle_data.replace([np.inf, -np.inf], np.nan).fillna(0)
-
-        # Sélectionner les colonnes à afficher
-        circle_data = circle_data[['cldh_label', 'province_label', 'expra_1', 'expra_0', 'unique_grappe', 'nb_grappe', 'ratio_expra', 'percent_unique_grappe']]
-        circle_data.columns = ['Cercle', 'Province', 'ENQUMENAGE', 'Recensement', 'Nb grappes enquêtées', 'Nb grappes total', 'Proportion ENQUMENAGE/Recensement', 'Proportion de grappes enquêtées']
-
-        # Formatage des colonnes
-        circle_data['ENQUMENAGE'] = circle_data['ENQUMENAGE'].apply(lambda x: f"{x:,}".replace(",", " "))
-        circle_data['Recensement'] = circle_data['Recensement'].apply(lambda x: f"{x:,}".replace(",", " "))
-        circle_data['Nb grappes enquêtées'] = circle_data['Nb grappes enquêtées'].apply(lambda x: f"{x:,}".replace(",", " "))
-        circle_data['Nb grappes total'] = circle_data['Nb grappes total'].apply(lambda x: f"{x:,}".replace(",", " "))
-        circle_data['Proportion ENQUMENAGE/Recensement'] = circle_data['Proportion ENQUMENAGE/Recensement'].apply(lambda x: f"{x:.2f}%")
-        circle_data['Proportion de grappes enquêtées'] = circle_data['Proportion de grappes enquêtées'].apply(lambda x: f"{x:.2f}%")
-
-
-        # Créer une copie profonde de circle_data
-        circle_data1 = circle_data.copy(deep=True)
-
-        # Définir les nouveaux noms de colonnes
-        new_columns = [
-            'Cercle',
-            'Province',
-            'Enquêtes Ménage',
-            'Recensements',
-            'Grappes Couvertes',
-            'Nombre Total de Grappes',
-            'Taux Enquêtes Ménage/Recensements',
-            'Taux de Couverture des Grappes'
-        ]
-
-        # Créer un dictionnaire de mapping entre anciens et nouveaux noms
-        column_mapping = {
-            'Cercle': 'Cercle',
-            'Province': 'Province',
-            'ENQUMENAGE': 'Enquêtes Ménage',
-            'Recensement': 'Recensements',
-            'Nb grappes enquêtées': 'Grappes Couvertes',
-            'Nb grappes total': 'Nombre Total de Grappes',
-            'Proportion ENQUMENAGE/Recensement': 'Taux Enquêtes Ménage/Recensements',
-            'Proportion de grappes enquêtées': 'Taux de Couverture des Grappes'
-        }
-
-        # Renommer les colonnes
-        circle_data1 = circle_data1.rename(columns=column_mapping)
-
-
         if view == "Tableau":
             st.subheader("Matrice Comparative des Indicateurs des Cercles")
-            st.dataframe(circle_data1)
+            detail = st.radio("Niveau de détail", ["Cercles", "Grappes", "Soumissions"], horizontal=True)
+            if detail == "Soumissions":
+                # Détail des soumissions d'une région, ou d'une province
+                region_col, province_col = st.columns(2)
+                regions = ['Choisir une Région'] + list(cube['region']['region_label'].astype(str))
+                selected_region = region_col.selectbox("Région", regions, key='soumissions_region')
+                provinces = list(cube['province'].loc[cube['province']['region_label'] == selected_region, 'province_label'].astype(str))
+                selected_province = province_col.selectbox("Province", ['Toutes les Provinces'] + provinces, key='soumissions_province')
+                if selected_region == 'Choisir une Région':
+                    st.info("Choisir une région pour afficher ses soumissions")
+                else:
+                    province = None if selected_province == 'Toutes les Provinces' else selected_province
+                    with section('submissions_read'):
+                        data = selection_submissions(selected_region, province)
+                    with section('table'):
+                        paginated_table(
+                            data, SUBMISSION_LABELS, 'table_soumissions',
+                            search_columns=['cldh_label', 'grappe'],
+                            filter_columns=['cldh_label'],
+                        )
+                    export_controls('cercle', selected_region, province)
+            else:
+                # Tableau paginé sur le niveau du cube : seule la page affichée est envoyée au navigateur
+                with section('table'):
+                    table_level = 'cercle' if detail == "Cercles" else 'grappe'
+                    if detail == "Cercles":
+                        _, _, filters = paginated_table(
+                            level_table('cercle'), LEVEL_COLUMNS['cercle'], 'table_cercles',
+                            search_columns=['cldh_label', 'province_label'],
+                            filter_columns=['region_label', 'province_label'],
+                            sort_order=table_sort_order('cercle'),
+                        )
+                    else:
+                        _, _, filters = paginated_table(
+                            level_table('grappe'), LEVEL_COLUMNS['grappe'], 'table_grappes',
+                            search_columns=['cldh_label', 'grappe'],
+                            filter_columns=['region_label', 'province_label', 'cldh_label'],
+                            sort_order=table_sort_order('grappe'),
+                        )
+                # Export du niveau affiché, avec les filtres région / province du tableau
+                export_controls(table_level, filters.get('region_label'), filters.get('province_label'))
         
         elif view == "Datavisualisation":
             st.subheader("Aperçu Graphique des Indicateurs des Cercles")
 
-            # Fonction pour nettoyer et convertir les valeurs en float
-            def clean_and_convert(column):
-                return column.str.replace(' ', '').str.replace('%', '').astype(float)
-
-            # Nettoyer et convertir les colonnes en float
-            circle_data['ENQUMENAGE'] = clean_and_convert(circle_data['ENQUMENAGE'])
-            circle_data['Recensement'] = clean_and_convert(circle_data['Recensement'])
-            circle_data['Nb grappes enquêtées'] = clean_and_convert(circle_data['Nb grappes enquêtées'])
-            circle_data['Nb grappes total'] = clean_and_convert(circle_data['Nb grappes total'])
-            circle_data['Proportion ENQUMENAGE/Recensement'] = clean_and_convert(circle_data['Proportion ENQUMENAGE/Recensement'])
-            circle_data['Proportion de grappes enquêtées'] = clean_and_convert(circle_data['Proportion de grappes enquêtées'])
+            # Filtres : province, puis indicateur à afficher
+            provinces = ['Toutes les Provinces'] + list(cube['province']['province_label'].astype(str))
+            selected_province = st.selectbox("Choisir une Province", provinces)
+            indicateur = st.selectbox("Sélectionner l'Indicateur de Suivi", CHART_INDICATORS, format_func=indicator_label)
 
-            # Utiliser les valeurs nettoyées et converties pour définir les limites de l'axe y
-            y_lim_multiplier = 1.1
+            def build_figure():
+                data = indicators.frame('cercle', CHART_INDICATORS)
+                if selected_province != 'Toutes les Provinces':
+                    data = data[data['province_label'] == selected_province]
+                return indicator_bar(data, 'cldh_label', indicateur, "par Cercle")
 
-            # Filtre pour sélectionner la province
-            provinces = ['Toutes les Provinces'] + list(circle_data['Province'].unique())
-            selected_province = st.selectbox("Choisir une Province", provinces)
+            show_figure((level, view, indicateur, selected_province), build_figure)
 
-            # Filtre pour sélectionner l'indicateur à afficher
-            indicateur = st.selectbox(
-                "Sélectionner l'Indicateur de Suivi", 
-                [
-                    "Enquêtes Ménage",
-                    "Recensements",
-                    "Grappes Couvertes",
-                    "Nombre Total de Grappes",
-                    "Taux Enquêtes Ménage/Recensements",
-                    "Taux de Couverture des Grappes"
-                ]
-            )
-
-            # Filtrer les données en fonction de la province sélectionnée
-            if selected_province != 'Toutes les Provinces':
-                filtered_data = circle_data[circle_data['Province'] == selected_province]
+        elif view == "Géo-intelligence":
+            detail = st.radio("Carte", ["Cercles", "Grappes"], horizontal=True)
+            regions = ['Toutes les Régions'] + list(cube['region']['region_label'].astype(str))
+            layers = dataset.aggregates['map_layers']
+
+            if detail == "Cercles":
+                st.subheader("Cartographie des Indicateurs par Cercles")
+                region_col, indicator_col = st.columns(2)
+                selected_region = region_col.selectbox("Sélectionnez une région", regions, key='cercles_region')
+                indicateur = indicator_col.selectbox("Sélectionnez un indicateur", list(MAP_INDICATORS), format_func=indicator_label, key='cercles_indicateur')
+                layer_key = ('cercle', 'national' if selected_region == 'Toutes les Régions' else selected_region)
+
+                if layer_key not in layers:
+                    st.info("Couche des cercles non construite : lancer python -m utils.geo")
+                else:
+                    def build_map():
+                        # Couche préparée hors ligne (provinces découpées en cercles) : même rendu que les provinces
+                        return generate_province_map(layers[layer_key], MAP_INDICATORS[indicateur], f"{MAP_INDICATORS[indicateur]} par Cercle")
+
+                    show_figure((level, view, detail, indicateur, selected_region), build_map)
+                    st.caption("Limites schématiques : chaque province est découpée en autant de zones que de cercles.")
+                    layer_note(layers[layer_key])
             else:
-                filtered_data = circle_data
-
-            # Affichage du graphique en fonction de l'indicateur sélectionné
-            if indicateur == "Enquêtes Ménage":
-                fig = px.bar(filtered_data, x='Cercle', y='ENQUMENAGE', title="Enquêtes Ménage par Cercle", labels={'ENQUMENAGE': 'ENQUMENAGE'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['ENQUMENAGE'].max() * y_lim_multiplier]),
-                    title={'x':0.35},
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Recensements":
-                fig = px.bar(filtered_data, x='Cercle', y='Recensement', title="Recensements par Cercle", labels={'Recensement': 'Recensement'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['Recensement'].max() * y_lim_multiplier]),
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Grappes Couvertes":
-                fig = px.bar(filtered_data, x='Cercle', y='Nb grappes enquêtées', title="Grappes Couvertes par Cercle", labels={'Nb grappes enquêtées': 'Nb grappes enquêtées'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['Nb grappes enquêtées'].max() * y_lim_multiplier]),
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Nombre Total de Grappes":
-                fig = px.bar(filtered_data, x='Cercle', y='Nb grappes total', title="Nombre Total de Grappes par Cercle", labels={'Nb grappes total': 'Nb grappes total'})
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['Nb grappes total'].max() * y_lim_multiplier]),
-                    separators=', '  # Corrigé ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Taux Enquêtes Ménage/Recensements":
-                fig = px.bar(filtered_data, x='Cercle', y='Proportion ENQUMENAGE/Recensement', title="Taux Enquêtes Ménage/Recensements par Cercle", labels={'Proportion ENQUMENAGE/Recensement': 'Proportion ENQUMENAGE/Recensement (%)'})
-                fig.update_traces(texttemplate='%{y:.2f}%', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['Proportion ENQUMENAGE/Recensement'].max() * y_lim_multiplier]),
-                    separators=', '  # Ajouté ici
-                )
-                st.plotly_chart(fig)
-
-            elif indicateur == "Taux de Couverture des Grappes":
-                fig = px.bar(filtered_data, x='Cercle', y='Proportion de grappes enquêtées', title="Taux de Couverture des Grappes par Cercle", labels={'Proportion de grappes enquêtées': 'Proportion de grappes enquêtées (%)'})
-                fig.update_traces(texttemplate='%{y:.2f}%', textposition='outside')
-                fig.update_layout(
-                    uniformtext_minsize=8, 
-                    uniformtext_mode='hide', 
-                    yaxis=dict(range=[0, filtered_data['Proportion de grappes enquêtées'].max() * y_lim_multiplier]),
-                    separators=', '  # Ajouté ici
-                )
-                st.plotly_chart(fig)
+                st.subheader("Couverture des Grappes")
 
-        elif view == "Géo-intelligence":
-            st.subheader("Disponible en Zoom Régional et Provincial")
+                # Niveau de zoom choisi par la sélection : cellules regroupées, puis grappes d'une province
+                region_col, province_col = st.columns(2)
+                selected_region = region_col.selectbox("Sélectionnez une région", regions, key='grappes_region')
+                region = None if selected_region == 'Toutes les Régions' else selected_region
+                provinces = [] if region is None else list(cube['province'].loc[cube['province']['region_label'] == region, 'province_label'].astype(str))
+                selected_province = province_col.selectbox("Sélectionnez une province", ['Toutes les Provinces'] + provinces, key='grappes_province')
+                province = None if selected_province == 'Toutes les Provinces' else selected_province
+
+                def build_map():
+                    outline = layers[('region', 'national')] if region is None else layers[('province', region)]
+                    title = f"Grappes de la province {province}" if province else f"Grappes regroupées : {region or 'ensemble du pays'}"
+                    return generate_grappe_map(dataset.aggregates['grappe_points'], outline, title, region, province)
+
+                show_figure((level, view, detail, region, province), build_map)
+                st.caption("Positions représentatives : les grappes sont disposées autour du point de leur cercle "
+                           "ou de leur province. Choisir une province pour afficher les grappes une à une.")
 
 # Fonction principale
 
@@ -948,7 +654,21 @@ def main():
     #     logout()
     #     st.experimental_rerun()
 
-    display_indicators(niveau, vue)
+    # Profilage des sections (administrateurs seulement) ; sans effet s'il est désactivé
+    profiling, capture = profiling_controls() if is_admin() else (False, None)
+
+    # Lectures de fichiers pendant l'affichage : aucune attendue, tout est préparé par version ;
+    # chargements ponctuels (premier accès d'une version) comptés à part
+    with profile_run(profiling, capture, level=niveau, view=vue, version=dataset.version) as run:
+        with track_reads() as log:
+            display_indicators(niveau, vue)
+    st.session_state['file_reads'] = len(log.reads)
+    st.session_state['file_loads'] = len(log.loads)
+    if log.reads:
+        logger.warning("Lecture de fichiers pendant l'affichage (%s / %s) : %s", niveau, vue, sorted(set(log.reads)))
+
+    if run is not None:
+        profiling_panel(run)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+# tests/conftest.py
+# Tests de justesse (python -m pytest tests) : noyaux vectorisés comparés à un groupby pandas
+# sur un petit jeu synthétique, ingestion incrémentale dans un dossier temporaire.
+# Les benchmarks (benchmarks/bench_*.py) ne sont pas collectés par `python -m pytest tests`.
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+from utils.store import DATA_FILES
+
+ROWS = 5_000
+TOPARQUET_PATH = os.path.join('data', 'data_excel_to_parquet', 'toparquet.py')
+
+
+@pytest.fixture(scope='session')
+def reference_tables():
+    return {
+        'provinces_data': pd.read_parquet(DATA_FILES['provinces_data']),
+        'grappes_regions': pd.read_parquet(DATA_FILES['grappes_regions']),
+        'circles_data': pd.read_parquet(DATA_FILES['circles_data']).assign(
+            cldh_label=lambda d: d['cldh_label'].astype(str).str.strip()
+        ),
+    }
+
+
+@pytest.fixture(scope='session')
+def submissions(reference_tables):
+    from utils.synthetic import generate_submissions
+
+    # Campagne courte sur peu de grappes : plusieurs visites d'une même grappe dans la fenêtre de 7 jours
+    return generate_submissions(ROWS, seed=0, days=20, coverage=0.05, circles_data=reference_tables['circles_data'])
+
+
+@pytest.fixture(scope='session')
+def hierarchy(submissions, reference_tables):
+    from utils.hierarchy import build_hierarchy
+
+    tables = reference_tables
+    return build_hierarchy(submissions, tables['circles_data'], tables['provinces_data'], tables['grappes_regions'])
+
+
+@pytest.fixture
+def toparquet(tmp_path, monkeypatch):
+    # Module d'ingestion (hors paquet) redirigé vers un dossier temporaire
+    spec = importlib.util.spec_from_file_location('toparquet', TOPARQUET_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'COMBINED_DATA', str(tmp_path / 'combined_data.parquet'))
+    monkeypatch.setattr(module, 'SUBMISSIONS_DIR', str(tmp_path / 'submissions'))
+    monkeypatch.setattr(module, 'GRAPPE_AGGREGATES', str(tmp_path / 'aggregates' / 'grappes.parquet'))
+    return module
@@ -0,0 +1,80 @@
+# tests/test_aggregation.py
+# Cube d'indicateurs comparé à l'agrégation d'origine (groupby par niveau sur les soumissions).
+import pandas as pd
+import pytest
+
+from utils.aggregation import LEVEL_KEYS, aggregate_indicators, build_cube
+
+COUNTS = ['expra_1', 'expra_0', 'unique_grappe']
+
+
+def baseline(data, keys):
+    # Agrégation de display_indicators avant le cube (lambdas par groupe)
+    return data.groupby(keys).agg(
+        expra_1=('expra', lambda x: (x == 1).sum()),
+        expra_0=('expra', lambda x: (x == 0).sum()),
+        unique_grappe=('grappe', pd.Series.nunique),
+    )
+
+
+def as_labels(frame, keys):
+    # Libellés catégoriels du cube ramenés en chaînes, index trié comme groupby
+    frame = frame.astype({key: str for key in keys if key != 'grappe'})
+    return frame.set_index(keys).sort_index()
+
+
+@pytest.fixture(scope='module')
+def cube(submissions, reference_tables, hierarchy):
+    tables = reference_tables
+    return build_cube(submissions, tables['grappes_regions'], tables['provinces_data'], tables['circles_data'],
+                      hierarchy=hierarchy)
+
+
+@pytest.mark.parametrize('level', ['cercle', 'province', 'region'])
+def test_cube_matches_groupby(cube, submissions, level):
+    keys = LEVEL_KEYS[level]
+    expected = baseline(submissions, keys)
+    result = as_labels(cube[level], keys)[COUNTS]
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_names=False)
+
+
+def test_cube_grappe_level(cube, submissions):
+    keys = LEVEL_KEYS['grappe']
+    expected = baseline(submissions, keys)[['expra_1', 'expra_0']]
+    result = as_labels(cube['grappe'], keys)[['expra_1', 'expra_0']]
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_names=False)
+
+
+def test_cube_national(cube, submissions):
+    national = cube['national'].iloc[0]
+    assert national['expra_1'] == (submissions['expra'] == 1).sum()
+    assert national['expra_0'] == (submissions['expra'] == 0).sum()
+    assert national['unique_grappe'] == submissions['grappe'].nunique()
+
+
+def test_cube_targets(cube, reference_tables):
+    # Objectifs de référence joints à chaque niveau
+    circles = reference_tables['circles_data'].set_index('cldh_label')['nb_grappe']
+    cercles = cube['cercle'].astype({'cldh_label': str}).set_index('cldh_label')['nb_grappe']
+    pd.testing.assert_series_equal(cercles, circles.loc[cercles.index], check_dtype=False, check_names=False)
+    assert cube['national']['nb_grappe'].iloc[0] == reference_tables['grappes_regions']['nb_grappes'].sum()
+
+
+def test_cube_from_grappe_aggregates(cube, submissions, reference_tables, hierarchy):
+    # Compteurs par grappe tenus par l'ingestion : même cube que depuis les soumissions
+    tables = reference_tables
+    grappe_level = submissions.assign(
+        expra_1=(submissions['expra'] == 1).astype('int64'),
+        expra_0=(submissions['expra'] == 0).astype('int64'),
+    ).groupby(LEVEL_KEYS['grappe'], as_index=False)[['expra_1', 'expra_0']].sum()
+    incremental = build_cube(submissions, tables['grappes_regions'], tables['provinces_data'], tables['circles_data'],
+                             grappe_level=grappe_level, hierarchy=hierarchy)
+    for level in ['cercle', 'province', 'region', 'national']:
+        pd.testing.assert_frame_equal(incremental[level][COUNTS], cube[level][COUNTS], check_dtype=False)
+
+
+@pytest.mark.parametrize('level', ['cercle', 'province', 'grappe'])
+def test_aggregate_indicators_matches_groupby(submissions, level):
+    keys = LEVEL_KEYS[level]
+    result = aggregate_indicators(submissions, keys).set_index(keys)
+    pd.testing.assert_frame_equal(result, baseline(submissions, keys), check_dtype=False, check_names=False)
@@ -0,0 +1,32 @@
+# tests/test_hierarchy.py
+import numpy as np
+import pandas as pd
+
+from utils.hierarchy import _parent_links, build_hierarchy
+
+
+def test_parent_links_first_parent_wins():
+    # Enfant 0 : parents 2 puis 1 ; enfant 1 : valeur manquante puis 0 ; enfant 2 : jamais observé
+    child_codes = np.array([0, 1, 0, 1, 0, -1])
+    parent_codes = np.array([2, -1, 1, 0, 2, 3])
+    links = _parent_links(child_codes, parent_codes, n_children=3, n_parents=4)
+    np.testing.assert_array_equal(links, [2, 0, -1])
+
+
+def test_build_hierarchy_links(submissions, reference_tables, hierarchy):
+    # Chaque cercle rattaché à la province de la table de référence, chaque province à sa région
+    circles = reference_tables['circles_data']
+    cercles = pd.DataFrame({'cldh_label': hierarchy.cercles})
+    parents = hierarchy.attach_parents(cercles, 'cldh_label').set_index('cldh_label')
+    expected = circles.drop_duplicates('cldh_label').set_index('cldh_label')['province_label']
+    pd.testing.assert_series_equal(parents['province_label'].astype(str).loc[expected.index], expected,
+                                   check_names=False)
+
+    observed = submissions.drop_duplicates('province_label').set_index('province_label')['region_label']
+    provinces = hierarchy.attach_parents(pd.DataFrame({'province_label': observed.index}), 'province_label')
+    np.testing.assert_array_equal(provinces['region_label'].astype(str).to_numpy(), observed.to_numpy())
+
+
+def test_unknown_labels_are_missing(hierarchy):
+    encoded = hierarchy.encode(pd.Series(['inconnu', hierarchy.cercles[0]]), 'cldh_label')
+    assert encoded.isna().tolist() == [True, False]
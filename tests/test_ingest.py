@@ -0,0 +1,96 @@
+# tests/test_ingest.py
+# Ingestion incrémentale (data/data_excel_to_parquet/toparquet.py) dans un dossier temporaire :
+# reprise du fichier d'origine, dédoublonnage, agrégats par grappe tenus à jour.
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+
+from utils.synthetic import generate_submissions
+
+
+def dataset_rows(toparquet):
+    dataset = ds.dataset(toparquet.SUBMISSIONS_DIR, format='parquet', partitioning='hive')
+    data = dataset.to_table().to_pandas()
+    data['region_label'] = data['region_label'].astype(str)
+    return data
+
+
+def assert_aggregates_match(toparquet):
+    # Agrégats écrits par l'ingestion = recalcul complet sur le jeu partitionné ; tous les lots comptés
+    data = dataset_rows(toparquet)
+    expected = toparquet.grappe_counts(data).sort_index()
+    counts = pd.read_parquet(toparquet.GRAPPE_AGGREGATES).set_index(toparquet.GRAPPE_KEYS).sort_index()
+    pd.testing.assert_frame_equal(counts, expected, check_dtype=False, check_index_type=False)
+    assert toparquet.counted_lots() == toparquet.dataset_lots()
+    return data
+
+
+@pytest.fixture
+def seeded(toparquet, reference_tables):
+    # Fichier unique d'origine, repris à la première ingestion
+    initial = generate_submissions(2_000, seed=0, days=10, circles_data=reference_tables['circles_data'])
+    initial.to_parquet(toparquet.COMBINED_DATA)
+    return initial
+
+
+def batch_file(tmp_path, name, submissions):
+    path = str(tmp_path / f"{name}.parquet")
+    submissions.to_parquet(path)
+    return path
+
+
+def test_ingest_seeds_and_appends(toparquet, seeded, reference_tables, tmp_path):
+    new = generate_submissions(500, seed=1, days=10, circles_data=reference_tables['circles_data'])
+    # Doublons : soumissions déjà reprises et clé répétée dans le lot
+    batch = pd.concat([new, seeded.head(100), new.tail(10)], ignore_index=True)
+
+    assert toparquet.ingest(batch_file(tmp_path, 'lot1', batch)) == len(new)
+    data = assert_aggregates_match(toparquet)
+    assert len(data) == len(seeded) + len(new)
+    assert data['KEY'].is_unique
+    assert toparquet.INITIAL_LOT in toparquet.counted_lots()
+
+    # Lot déjà intégré : rien d'écrit
+    assert toparquet.ingest(batch_file(tmp_path, 'lot1_bis', new)) == 0
+    assert len(dataset_rows(toparquet)) == len(seeded) + len(new)
+
+
+def test_successive_lots_are_kept(toparquet, seeded, reference_tables, tmp_path):
+    # Deux lots dans la même seconde : noms distincts, aucun fichier écrasé
+    for seed in [1, 2]:
+        batch = generate_submissions(300, seed=seed, days=10, circles_data=reference_tables['circles_data'])
+        assert toparquet.ingest(batch_file(tmp_path, f"lot{seed}", batch)) == 300
+    assert len(assert_aggregates_match(toparquet)) == len(seeded) + 600
+    assert len(toparquet.counted_lots()) == 3
+
+
+def test_uncounted_files_trigger_rebuild(toparquet, seeded, reference_tables, tmp_path):
+    toparquet.seed_submissions()
+    # Fichier déposé sans passer par ingest : absent des lots comptés
+    extra = toparquet.prepare_submissions(
+        generate_submissions(200, seed=3, days=10, circles_data=reference_tables['circles_data'])
+    )
+    day, region = extra['submission_date'].iloc[0], extra['region_label'].iloc[0]
+    extra = extra[(extra['submission_date'] == day) & (extra['region_label'] == region)]
+    partition = os.path.join(toparquet.SUBMISSIONS_DIR, f"submission_date={day}", f"region_label={region}")
+    os.makedirs(partition, exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(extra.drop(columns=toparquet.PARTITION_COLUMNS), preserve_index=False),
+                   os.path.join(partition, 'depot-manuel.parquet'))
+    assert toparquet.dataset_lots() != toparquet.counted_lots()
+
+    batch = generate_submissions(100, seed=4, days=10, circles_data=reference_tables['circles_data'])
+    assert toparquet.ingest(batch_file(tmp_path, 'lot4', batch)) == 100
+    data = assert_aggregates_match(toparquet)
+    assert len(data) == len(seeded) + len(extra) + 100
+
+
+def test_missing_aggregates_are_rebuilt(toparquet, seeded, reference_tables, tmp_path):
+    toparquet.seed_submissions()
+    os.remove(toparquet.GRAPPE_AGGREGATES)
+    batch = generate_submissions(100, seed=5, days=10, circles_data=reference_tables['circles_data'])
+    assert toparquet.ingest(batch_file(tmp_path, 'lot5', batch)) == 100
+    assert len(assert_aggregates_match(toparquet)) == len(seeded) + 100
@@ -0,0 +1,77 @@
+# tests/test_series.py
+# Séries journalières (comptes, cumuls, fenêtres de 7 jours) comparées à un groupby par jour.
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.series import SERIES_LEVELS, WINDOW, build_series
+
+
+@pytest.fixture(scope='module')
+def store(submissions, hierarchy):
+    return build_series(submissions, hierarchy)
+
+
+@pytest.fixture(scope='module')
+def daily(submissions):
+    return submissions.assign(day=submissions['submission_date'].dt.normalize(), national='')
+
+
+def unit_column(level):
+    return SERIES_LEVELS[level] or 'national'
+
+
+def as_matrix(store, level, series):
+    # Série indexée par (unité, jour) -> tableau (unités × jours) dans l'ordre de la SeriesStore
+    units = [unit if unit is not None else '' for unit in store.keys(level)]
+    frame = series.unstack(fill_value=0).reindex(index=units, columns=store.dates, fill_value=0)
+    return frame.to_numpy()
+
+
+def window_distinct(daily, column, dates):
+    # Grappes distinctes visitées sur les WINDOW derniers jours, jour par jour
+    counts = {}
+    for day in dates:
+        window = daily[(daily['day'] > day - pd.Timedelta(days=WINDOW)) & (daily['day'] <= day)]
+        counts[day] = window.groupby(column)['grappe'].nunique()
+    return pd.concat(counts, names=['day', column]).swaplevel()
+
+
+@pytest.mark.parametrize('level', list(SERIES_LEVELS))
+def test_daily_counts(store, daily, level):
+    column = unit_column(level)
+    grouped = daily.groupby([column, 'day'])
+    for indicator, expected in {
+        'expra_1': grouped['expra'].apply(lambda x: (x == 1).sum()),
+        'expra_0': grouped['expra'].apply(lambda x: (x == 0).sum()),
+        'unique_grappe': grouped['grappe'].nunique(),
+    }.items():
+        expected = as_matrix(store, level, expected)
+        np.testing.assert_array_equal(store.matrices[level][indicator], expected)
+        if indicator != 'unique_grappe':
+            np.testing.assert_array_equal(store.matrices[level][f"{indicator}_cumul"], expected.cumsum(axis=1))
+            rolling = pd.DataFrame(expected).T.rolling(WINDOW, min_periods=1).sum().T.to_numpy()
+            np.testing.assert_array_equal(store.matrices[level][f"{indicator}_7j"], rolling)
+
+
+@pytest.mark.parametrize('level', list(SERIES_LEVELS))
+def test_distinct_grappes(store, daily, level):
+    column = unit_column(level)
+    # Cumul : grappes couvertes à date (jour de première visite)
+    first_visit = daily.groupby([column, 'grappe'])['day'].min().reset_index()
+    covered = as_matrix(store, level, first_visit.groupby([column, 'day']).size()).cumsum(axis=1)
+    np.testing.assert_array_equal(store.matrices[level]['unique_grappe_cumul'], covered)
+    # Fenêtre : grappes distinctes sur les 7 derniers jours
+    expected = as_matrix(store, level, window_distinct(daily, column, store.dates))
+    np.testing.assert_array_equal(store.matrices[level]['unique_grappe_7j'], expected)
+
+
+def test_calendar_and_frames(store, daily):
+    # Calendrier complet du premier au dernier jour, jours sans soumission à 0
+    assert store.dates[0] == daily['day'].min() and store.dates[-1] == daily['day'].max()
+    assert len(store.dates) == (daily['day'].max() - daily['day'].min()).days + 1
+    national = store.series()
+    assert national['expra_1_cumul'].iloc[-1] + national['expra_0_cumul'].iloc[-1] == len(daily)
+    region = store.keys('region')[0]
+    np.testing.assert_array_equal(store.series('region', region)['expra_1'].to_numpy(),
+                                  store.matrices['region']['expra_1'][0])
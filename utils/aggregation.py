@@ -0,0 +1,153 @@
+# utils/aggregation.py
+import numpy as np
+import pandas as pd
+
+from utils.hierarchy import build_hierarchy
+
+# Hiérarchie géographique, du niveau le plus fin au plus agrégé ; les niveaux
+# parents sont rattachés par les liens de codes de la hiérarchie
+LEVEL_KEYS = {
+    'grappe': ['cldh_label', 'grappe'],
+    'cercle': ['cldh_label'],
+    'province': ['province_label'],
+    'region': ['region_label'],
+    'national': [],
+}
+
+
+def _group_codes(df, keys):
+    # Codes entiers denses par groupe (ordre trié des clés, comme groupby)
+    combined = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    uniques = []
+    for key in keys:
+        key_codes, key_uniques = pd.factorize(df[key], sort=True)
+        valid &= key_codes >= 0
+        combined = combined * max(len(key_uniques), 1) + key_codes
+        uniques.append(key_uniques)
+    n_combinations = int(np.prod([max(len(u), 1) for u in uniques], dtype=np.float64))
+    if n_combinations <= max(len(df), 1_000_000):
+        # Espace des combinaisons réduit : table de présence au lieu d'un hachage
+        present = np.bincount(combined[valid], minlength=n_combinations) > 0
+        remap = np.cumsum(present) - 1
+        codes = np.where(valid, remap[np.where(valid, combined, 0)], -1)
+        group_values = np.flatnonzero(present)
+    else:
+        combined = np.where(valid, combined, -1)
+        codes, group_values = pd.factorize(combined, sort=True)
+        if len(group_values) and group_values[0] == -1:
+            # Lignes avec une clé manquante : exclues comme dans groupby
+            codes = codes - 1
+            group_values = group_values[1:]
+
+    # Décodage des clés de chaque groupe
+    groups = {}
+    rest = np.asarray(group_values, dtype=np.int64)
+    for key, key_uniques in reversed(list(zip(keys, uniques))):
+        size = max(len(key_uniques), 1)
+        groups[key] = key_uniques.take(rest % size)
+        rest = rest // size
+    groups = pd.DataFrame({key: groups[key] for key in keys})
+    return codes, groups
+
+
+def _sum_by(codes, n_groups, values):
+    valid = codes >= 0
+    return np.bincount(codes[valid], weights=values[valid], minlength=n_groups).astype(np.int64)
+
+
+def _nunique_by(codes, n_groups, values):
+    # Comptage distinct via des paires (groupe, code de valeur) factorisées
+    value_codes, value_uniques = pd.factorize(values)
+    valid = (codes >= 0) & (value_codes >= 0)
+    pairs = pd.unique(codes[valid].astype(np.int64) * max(len(value_uniques), 1) + value_codes[valid])
+    return np.bincount(pairs // max(len(value_uniques), 1), minlength=n_groups).astype(np.int64)
+
+
+def aggregate_indicators(df, keys):
+    """Retourne le tableau standard d'indicateurs (expra_1, expra_0, unique_grappe) par clés.
+
+    Agrégation vectorisée : indicatrices booléennes sommées par bincount et
+    comptage distinct des grappes par codes entiers factorisés.
+    """
+    expra = df['expra'].to_numpy()
+    if not keys:
+        codes = np.zeros(len(df), dtype=np.int64)
+        groups = pd.DataFrame(index=range(1))
+    else:
+        codes, groups = _group_codes(df, keys)
+    n_groups = len(groups)
+    groups['expra_1'] = _sum_by(codes, n_groups, (expra == 1).astype(np.float64))
+    groups['expra_0'] = _sum_by(codes, n_groups, (expra == 0).astype(np.float64))
+    groups['unique_grappe'] = _nunique_by(codes, n_groups, df['grappe'].to_numpy())
+    return groups
+
+
+def _rollup(grappe_level, keys):
+    # Agrégation d'un niveau supérieur à partir du niveau grappe (quelques milliers de lignes)
+    if not keys:
+        codes = np.zeros(len(grappe_level), dtype=np.int64)
+        groups = pd.DataFrame(index=range(1))
+    else:
+        codes, groups = _group_codes(grappe_level, keys)
+    n_groups = len(groups)
+    groups['expra_1'] = _sum_by(codes, n_groups, grappe_level['expra_1'].to_numpy(dtype=np.float64))
+    groups['expra_0'] = _sum_by(codes, n_groups, grappe_level['expra_0'].to_numpy(dtype=np.float64))
+    groups['unique_grappe'] = _nunique_by(codes, n_groups, grappe_level['grappe'].to_numpy())
+    return groups
+
+
+def build_cube(combined_data, grappes_regions, provinces_data, circles_data, grappe_level=None, hierarchy=None):
+    """Construit le cube d'indicateurs grappe -> cercle -> province -> région -> national.
+
+    Un seul passage sur la table des soumissions (libellés déjà normalisés au
+    chargement) ; les niveaux supérieurs sont déduits du niveau grappe et les
+    objectifs de référence y sont joints. Si les compteurs par grappe sont
+    déjà tenus à jour par l'ingestion incrémentale, ils sont utilisés tels quels.
+    Tous les libellés sont codés dans le dictionnaire partagé de la hiérarchie.
+    Le cube ne porte que les comptages et les objectifs : les taux sont des
+    indicateurs dérivés, évalués à la demande (utils/indicators.py).
+    """
+    if hierarchy is None:
+        hierarchy = build_hierarchy(combined_data, circles_data, provinces_data, grappes_regions)
+
+    if grappe_level is None:
+        cercles = hierarchy.encode(combined_data['cldh_label'], 'cldh_label')
+        grappe_level = aggregate_indicators(
+            pd.DataFrame({'cldh_label': cercles, 'grappe': combined_data['grappe'], 'expra': combined_data['expra']}),
+            LEVEL_KEYS['grappe']
+        ).drop(columns='unique_grappe')
+    else:
+        grappe_level = grappe_level[LEVEL_KEYS['grappe'] + ['expra_1', 'expra_0']].copy()
+        grappe_level['cldh_label'] = hierarchy.encode(grappe_level['cldh_label'], 'cldh_label')
+    grappe_level = hierarchy.attach_parents(grappe_level, 'cldh_label')
+
+    cube = {'grappe': grappe_level}
+
+    # Objectifs de référence (nombre total de grappes) par niveau, joints sur les codes partagés
+    targets = {
+        'cercle': pd.DataFrame({
+            'cldh_label': hierarchy.encode(circles_data['cldh_label'], 'cldh_label'),
+            'nb_grappe': circles_data['nb_grappe'],
+        }),
+        'province': pd.DataFrame({
+            'province_label': hierarchy.encode(provinces_data['province'], 'province_label'),
+            'nb_grappe': provinces_data['nb_grappe'],
+        }),
+        'region': pd.DataFrame({
+            'region_label': hierarchy.encode(grappes_regions['region'], 'region_label'),
+            'nb_grappe': grappes_regions['nb_grappes'],
+        }),
+    }
+
+    for level in ['cercle', 'province', 'region']:
+        key = LEVEL_KEYS[level][0]
+        level_data = _rollup(grappe_level, LEVEL_KEYS[level])
+        level_data = level_data.merge(targets[level], on=key)
+        cube[level] = hierarchy.attach_parents(level_data, key)
+
+    national = _rollup(grappe_level, LEVEL_KEYS['national'])
+    national['nb_grappe'] = targets['region']['nb_grappe'].sum()
+    cube['national'] = national
+
+    return cube
@@ -0,0 +1,47 @@
+# utils/cache.py
+import os
+import threading
+from collections import OrderedDict
+
+# Nombre maximal de figures gardées en mémoire (toutes sessions confondues)
+FIGURE_CACHE_SIZE = int(os.environ.get('EDH_FIGURE_CACHE_SIZE', 128))
+
+
+class LRUCache:
+    """Cache LRU borné, partagé entre les sessions (figures, permutations de tri, soumissions).
+
+    Les entrées sont indexées par (version des données, clé) : pendant un
+    changement de version, les sessions encore sur l'ancienne version gardent
+    leurs entrées, les plus anciennes sont évincées à mesure que le cache se
+    remplit. Les valeurs renvoyées sont partagées : elles ne doivent pas être modifiées.
+    """
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, build):
+        entry = (version, key)
+        with self._lock:
+            if entry in self._entries:
+                self._entries.move_to_end(entry)
+                self.hits += 1
+                return self._entries[entry]
+            self.misses += 1
+
+        # Construction hors du verrou : les autres sessions ne sont pas bloquées
+        value = build()
+        with self._lock:
+            self._entries[entry] = value
+            self._entries.move_to_end(entry)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            versions = {version for version, _ in self._entries}
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'versions': len(versions)}
@@ -0,0 +1,280 @@
+# utils/export.py
+# Export des tableaux d'indicateurs et des soumissions brutes en Parquet, CSV ou XLSX, écrit par blocs.
+# Usage : python -m utils.export <region|province|cercle|grappe|soumissions> <parquet|csv|xlsx> [sortie]
+#                                [--region REGION] [--province PROVINCE]
+import hashlib
+import os
+import secrets
+import sys
+import threading
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.indicators import KEY_LABELS, IndicatorStore, labels
+from utils.store import load_dataset, submission_batches
+
+# Fichiers exportés, réutilisés tant que la version des données ne change pas. Servis par
+# Streamlit depuis le dossier static/ de l'application (server.enableStaticServing) :
+# le navigateur les télécharge directement depuis le disque
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXPORT_DIR = os.path.join(APP_DIR, 'static', 'exports')
+EXPORT_URL = 'app/static/exports'
+# Taille maximale d'un fichier statique servi par Streamlit
+STATIC_MAX_BYTES = 200 * 1024 * 1024
+# Versions des données dont les exports sont conservés : la courante et la précédente,
+# dont les téléchargements peuvent être encore en cours
+KEEP_VERSIONS = 2
+# Le dossier statique n'est pas authentifié : noms de fichiers non devinables, propres au processus
+_SECRET = secrets.token_hex(16)
+# Exports construits en même temps (toutes sessions confondues)
+EXPORT_WORKERS = int(os.environ.get('EDH_EXPORT_WORKERS', 2))
+BATCH_ROWS = 65_536
+# Limite d'une feuille Excel, en-tête compris
+XLSX_MAX_ROWS = 1_048_575
+
+FORMATS = {
+    'parquet': 'application/vnd.apache.parquet',
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Colonnes exportées (et affichées) par niveau du cube : colonne -> libellé (registre des indicateurs)
+TABLE_INDICATORS = ['expra_1', 'expra_0', 'unique_grappe', 'nb_grappe', 'ratio_expra', 'percent_unique_grappe', 'date_fin', 'jours_restants']
+LEVEL_COLUMNS = {
+    'national': labels(TABLE_INDICATORS),
+    'region': labels(['region_label'] + TABLE_INDICATORS),
+    'province': labels(['province_label', 'region_label'] + TABLE_INDICATORS),
+    'cercle': labels(['cldh_label', 'province_label', 'region_label'] + TABLE_INDICATORS),
+    'grappe': labels(['grappe', 'cldh_label', 'province_label', 'region_label', 'expra_1', 'expra_0']),
+}
+RAW_TABLE = 'soumissions'
+TABLES = list(LEVEL_COLUMNS) + [RAW_TABLE]
+
+_workers = threading.BoundedSemaphore(EXPORT_WORKERS)
+_locks_lock = threading.Lock()
+_locks = {}
+_versions = []
+
+
+def available_formats():
+    # XLSX seulement si openpyxl est installé
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return [fmt for fmt in FORMATS if fmt != 'xlsx']
+    return list(FORMATS)
+
+
+def _plain(batch):
+    # Catégories (dictionnaires Arrow) décodées en texte : lisibles par les écrivains CSV et XLSX
+    columns = [
+        pc.cast(column, column.type.value_type) if pa.types.is_dictionary(column.type) else column
+        for column in batch.columns
+    ]
+    return pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+
+def _indicators(dataset):
+    if 'indicators' in dataset.aggregates:
+        return dataset.aggregates['indicators']
+    # Hors de l'application (CLI) : cube et projections construits directement
+    from utils.aggregation import build_cube
+    from utils.hierarchy import build_hierarchy
+    from utils.projection import add_projections
+    from utils.series import build_series
+
+    hierarchy = build_hierarchy(dataset.combined_data, dataset.circles_data, dataset.provinces_data, dataset.grappes_regions)
+    cube = build_cube(dataset.combined_data, dataset.grappes_regions, dataset.provinces_data,
+                      dataset.circles_data, dataset.grappe_aggregates, hierarchy)
+    return IndicatorStore(add_projections(cube, build_series(dataset.combined_data, hierarchy)))
+
+
+def indicator_batches(dataset, level, region=None, province=None):
+    # Niveau du cube (quelques milliers de lignes au plus), filtré puis découpé en blocs
+    columns = LEVEL_COLUMNS[level]
+    data = _indicators(dataset).frame(level, [column for column in columns if column not in KEY_LABELS])
+    if region is not None and 'region_label' in data.columns:
+        data = data[data['region_label'] == region]
+    if province is not None and 'province_label' in data.columns:
+        data = data[data['province_label'] == province]
+    table = pa.Table.from_pandas(data[list(columns)].rename(columns=columns), preserve_index=False)
+    for batch in table.to_batches(BATCH_ROWS):
+        yield _plain(batch)
+
+
+def raw_batches(region=None, province=None, path=None):
+    # Lecture en flux du magasin Parquet (partitions et row groups écartés par les filtres)
+    for batch in submission_batches(region=region, province=province, path=path, batch_size=BATCH_ROWS):
+        if batch.num_rows:
+            yield _plain(batch)
+
+
+def _write_parquet(path, batches):
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    for batch in batches:
+        if writer is None:
+            writer = pq.ParquetWriter(path, batch.schema)
+        writer.write_batch(batch)
+        rows += batch.num_rows
+    if writer is None:
+        # Aucune ligne : fichier vide mais valide
+        pq.write_table(pa.table({}), path)
+    else:
+        writer.close()
+    return rows
+
+
+def _write_csv(path, batches):
+    import pyarrow.csv as csv
+
+    writer = None
+    rows = 0
+    with open(path, 'wb') as f:
+        for batch in batches:
+            if writer is None:
+                writer = csv.CSVWriter(f, batch.schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _write_xlsx(path, batches):
+    from openpyxl import Workbook
+
+    # Mode écriture seule : les lignes sont écrites au fil de l'eau, sans garder la feuille en mémoire
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('export')
+    rows = 0
+    for batch in batches:
+        if rows == 0:
+            sheet.append(batch.schema.names)
+        if rows + batch.num_rows > XLSX_MAX_ROWS:
+            rows = None
+            break
+        for row in zip(*(column.to_pylist() for column in batch.columns)):
+            sheet.append(row)
+        rows += batch.num_rows
+    workbook.save(path)
+    if rows is None:
+        # Pas de troncature silencieuse : l'export est refusé
+        os.remove(path)
+        raise ValueError(f"Plus de {XLSX_MAX_ROWS} lignes : trop pour une feuille Excel, exporter en CSV ou Parquet")
+    return rows
+
+
+WRITERS = {'parquet': _write_parquet, 'csv': _write_csv, 'xlsx': _write_xlsx}
+
+
+def write_export(path, table, fmt, dataset=None, region=None, province=None):
+    """Écrit l'export d'une table (niveau du cube ou soumissions brutes) ; renvoie le nombre de lignes.
+
+    Les lignes passent par blocs du magasin colonne au fichier : aucune copie
+    complète ni mise en forme de la table n'est construite en mémoire.
+    """
+    if table == RAW_TABLE:
+        batches = raw_batches(region, province)
+    else:
+        batches = indicator_batches(dataset or load_dataset(), table, region, province)
+    return WRITERS[fmt](path, batches)
+
+
+def export_name(table, fmt, region=None, province=None):
+    parts = [table] + [part for part in (region, province) if part]
+    return "_".join(part.lower().replace(' ', '-') for part in parts) + f".{fmt}"
+
+
+def _key_lock(key):
+    with _locks_lock:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def export_rows(dataset, table, region=None, province=None):
+    # Nombre de lignes de l'export, d'après le cube (aucune lecture des soumissions)
+    if table != RAW_TABLE:
+        data = _indicators(dataset).frame(table, [])
+    else:
+        level = 'province' if province is not None else 'region' if region is not None else 'national'
+        data = _indicators(dataset).frame(level, ['expra_1', 'expra_0'])
+    if region is not None and 'region_label' in data.columns:
+        data = data[data['region_label'] == region]
+    if province is not None and 'province_label' in data.columns:
+        data = data[data['province_label'] == province]
+    if table != RAW_TABLE:
+        return len(data)
+    return int(data['expra_1'].sum() + data['expra_0'].sum())
+
+
+def export_url(path):
+    # Adresse du fichier servi par la route statique de l'application
+    return f"{EXPORT_URL}/{os.path.basename(path)}"
+
+
+def _prune(version):
+    # Exports des versions antérieures à la précédente : supprimés
+    if version not in _versions:
+        _versions.append(version)
+        del _versions[:-KEEP_VERSIONS]
+    for file in os.listdir(EXPORT_DIR):
+        if file.split('-', 1)[0] not in _versions and not file.endswith('.tmp') and not file.startswith('.'):
+            try:
+                os.remove(os.path.join(EXPORT_DIR, file))
+            except OSError:
+                pass
+
+
+def export_file(dataset, table, fmt, region=None, province=None):
+    """Chemin de l'export en cache pour la version courante, construit au premier appel.
+
+    Un même export demandé par plusieurs sessions n'est écrit qu'une fois ;
+    le nombre d'exports construits simultanément est borné (EXPORT_WORKERS).
+    ValueError si l'export dépasse la limite du format ou de la route statique.
+    """
+    digest = hashlib.sha1(repr((table, region, province, _SECRET)).encode()).hexdigest()[:20]
+    path = os.path.join(EXPORT_DIR, f"{dataset.version}-{table}-{digest}.{fmt}")
+    with _key_lock(path):
+        if os.path.exists(path):
+            return path
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        with _workers:
+            _prune(dataset.version)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                write_export(tmp_path, table, fmt, dataset, region, province)
+                # Remplacement atomique : un fichier présent est toujours complet
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    if os.path.getsize(path) > STATIC_MAX_BYTES:
+        raise ValueError(f"Export de plus de {STATIC_MAX_BYTES >> 20} Mo : filtrer par région ou province, "
+                         "ou utiliser python -m utils.export")
+    return path
+
+
+def _option(name):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return None
+
+
+if __name__ == "__main__":
+    region, province = _option('--region'), _option('--province')
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--') and arg not in (region, province)]
+    if len(args) < 2 or args[0] not in TABLES or args[1] not in FORMATS:
+        print(f"Usage : python -m utils.export <{'|'.join(TABLES)}> <{'|'.join(FORMATS)}> [sortie] "
+              "[--region REGION] [--province PROVINCE]")
+        sys.exit(2)
+    table, fmt = args[0], args[1]
+    path = args[2] if len(args) > 2 else export_name(table, fmt, region, province)
+    try:
+        rows = write_export(path, table, fmt, region=region, province=province)
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+    print(f"{rows} lignes exportées dans {path}")
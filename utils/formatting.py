@@ -0,0 +1,53 @@
+# utils/formatting.py
+import pandas as pd
+import streamlit as st
+
+HORS_ENQUETE = "Hors enquête"
+TERMINE = "Terminé"
+SANS_CADENCE = "Sans cadence"
+
+# Formats d'affichage appliqués au rendu ; les données restent numériques. Formats explicites :
+# même affichage quelle que soit la langue du navigateur. Comptages : séparateur de milliers
+# espace, comme les étiquettes des cartes ("%' ,d" : caractère de remplissage ' ' repris
+# comme séparateur par sprintf-js, ex. 12 345)
+COUNT_FORMAT = "%' ,d"
+PERCENT_FORMAT = "%.2f%%"
+DATE_FORMAT = "DD/MM/YYYY"
+
+
+def is_percent(column):
+    return 'Taux' in column or 'Proportion' in column
+
+
+def is_days(column):
+    return 'Jours' in column
+
+
+def indicator_column_config(data, formats=None):
+    # Formatage des colonnes numériques d'un tableau par st.column_config ;
+    # formats (libellé -> format) : formats déclarés dans le registre des indicateurs
+    formats = formats or {}
+    config = {}
+    for column in data.columns:
+        if pd.api.types.is_datetime64_any_dtype(data[column]):
+            config[column] = st.column_config.DateColumn(column, format=formats.get(column, DATE_FORMAT))
+        elif pd.api.types.is_numeric_dtype(data[column]):
+            config[column] = st.column_config.NumberColumn(
+                column, format=formats.get(column, PERCENT_FORMAT if is_percent(column) else COUNT_FORMAT)
+            )
+    return config
+
+
+def map_labels(values, percent):
+    # Étiquettes des cartes, construites au rendu sur quelques dizaines d'unités
+    if percent:
+        labels = values.map(lambda x: f"{x:.2f}%", na_action='ignore')
+    else:
+        labels = values.map(lambda x: f"{x:,.0f}".replace(",", " "), na_action='ignore')
+    return labels.where(values.notna() & (values != 0), HORS_ENQUETE)
+
+
+def day_labels(values):
+    # Jours restants projetés : 0 si l'objectif est atteint, NaN sans activité récente
+    labels = values.map(lambda x: f"{x:.0f} j", na_action='ignore')
+    return labels.where(values != 0, TERMINE).fillna(SANS_CADENCE)
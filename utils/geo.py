@@ -0,0 +1,295 @@
+# utils/geo.py
+# Préparation hors ligne des couches géographiques.
+# Usage : python -m utils.geo
+# GeoPandas et Shapely ne sont importés que par les fonctions qui lisent ou
+# transforment des géométries : l'application ne les charge pas au démarrage.
+import json
+import os
+
+import numpy as np
+
+from utils.io_audit import record_read
+
+PROVINCES_PATH = 'data/updated_provinces.json'
+REGIONS_PATH = 'data/updated_maroc.geojson'
+# Couche des cercles, construite hors ligne à partir des provinces (build_cercle_layer)
+CERCLES_PATH = 'data/cercles.geojson'
+CERCLES_TABLE = 'data/cercles.parquet'
+
+# Colonne portant le nom de l'unité dans chaque couche
+NAME_COLUMNS = {
+    PROVINCES_PATH: 'name',
+    REGIONS_PATH: 'region',
+    CERCLES_PATH: 'cldh_label',
+}
+
+# Projection métrique utilisée pour placer les étiquettes (Web Mercator)
+PROJECTED_CRS = 'EPSG:3857'
+
+# Couches simplifiées par niveau de détail : carte nationale ou zoom sur une région
+SIMPLIFIED_DIR = 'data/simplified'
+LOD_TOLERANCES = {
+    'national': 0.02,
+    'regional': 0.005,
+}
+# Pas de la grille de quantification des coordonnées, en degrés (~100 m)
+GRID_SIZE = 0.001
+COORDINATE_PRECISION = 3
+# Découpage des provinces en cercles : points d'échantillonnage par cercle, itérations des k-moyennes
+PARTITION_SAMPLES = 400
+PARTITION_ITERATIONS = 50
+
+
+def label_points_path(layer_path):
+    # Fichier compagnon : data/updated_provinces.labels.json, ...
+    return os.path.splitext(layer_path)[0] + '.labels.json'
+
+
+def compute_label_points(gdf, name_column):
+    # Point représentatif calculé en projection métrique : toujours à l'intérieur du polygone
+    if gdf.crs is None:
+        gdf = gdf.set_crs('EPSG:4326')
+    gdf = gdf[gdf[name_column].notnull()]
+    points = gdf.to_crs(PROJECTED_CRS).representative_point().to_crs('EPSG:4326')
+    return {name: [round(point.x, 5), round(point.y, 5)] for name, point in zip(gdf[name_column], points)}
+
+
+def load_label_points(layer_path, gdf=None):
+    # Lecture du fichier compagnon, ou calcul à la volée s'il n'a pas encore été construit
+    path = label_points_path(layer_path)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    if gdf is None and not os.path.exists(layer_path):
+        # Couche facultative (cercles) pas encore construite
+        return {}
+    if gdf is None:
+        import geopandas as gpd
+        record_read(layer_path)
+        gdf = gpd.read_file(layer_path)
+    return compute_label_points(gdf, NAME_COLUMNS[layer_path])
+
+
+def select_lod(selection=None):
+    # Vue nationale : géométrie grossière ; une seule région sélectionnée : géométrie plus fine
+    return 'national' if selection is None else 'regional'
+
+
+def simplified_layer_path(layer_path, lod):
+    # data/simplified/updated_provinces.national.geojson, ...
+    name = os.path.splitext(os.path.basename(layer_path))[0]
+    return os.path.join(SIMPLIFIED_DIR, f"{name}.{lod}.geojson")
+
+
+def load_layer(layer_path, lod):
+    # Couche simplifiée si elle a été construite, sinon la couche d'origine
+    import geopandas as gpd
+    path = simplified_layer_path(layer_path, lod)
+    path = path if os.path.exists(path) else layer_path
+    record_read(path)
+    gdf = gpd.read_file(path)
+    if gdf.crs is None:
+        gdf = gdf.set_crs('EPSG:4326')
+    return gdf
+
+
+def load_layer_geojson(layer_path, lod):
+    # GeoJSON (dict) prêt pour px.choropleth, lu tel quel pour conserver la quantification
+    path = simplified_layer_path(layer_path, lod)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return json.loads(load_layer(layer_path, lod).to_json(drop_id=True))
+
+
+def layer_features(geojson, name_column, names):
+    # Sous-ensemble des entités d'une couche GeoJSON (dict), sans repasser par GeoPandas
+    names = set(names)
+    features = [f for f in geojson['features'] if f['properties'].get(name_column) in names]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _decode_arcs(topology):
+    # Arcs TopoJSON en coordonnées absolues (dé-quantification des deltas)
+    transform = topology.get('transform')
+    arcs = []
+    for arc in topology['arcs']:
+        points = np.asarray(arc, dtype=float)
+        if transform:
+            points = np.cumsum(points, axis=0) * transform['scale'] + transform['translate']
+        arcs.append(points)
+    return arcs
+
+
+def _simplify_arcs(arcs, tolerance):
+    # Douglas-Peucker arc par arc : les extrémités sont conservées, donc les frontières
+    # partagées entre unités voisines restent identiques (topologie préservée)
+    from shapely.geometry import LineString
+    simplified = []
+    for points in arcs:
+        result = np.asarray(LineString(points).simplify(tolerance, preserve_topology=False).coords)
+        if len(result) < 4 and np.allclose(points[0], points[-1]):
+            # Anneau fermé (île, enclave) : ne pas le réduire à un segment
+            result = points
+        simplified.append(result)
+    return simplified
+
+
+def _ring(arc_indexes, arcs):
+    coords = []
+    for index in arc_indexes:
+        points = arcs[index] if index >= 0 else arcs[~index][::-1]
+        coords.extend(points.tolist() if not coords else points[1:].tolist())
+    return coords
+
+
+def simplify_topology(layer_path, tolerance):
+    import geopandas as gpd
+    import shapely
+    from shapely.geometry import MultiPolygon, Polygon
+
+    with open(layer_path, encoding='utf-8') as f:
+        topology = json.load(f)
+    arcs = _simplify_arcs(_decode_arcs(topology), tolerance)
+
+    records, geometries = [], []
+    for layer in topology['objects'].values():
+        for geometry in layer['geometries']:
+            polygons = [geometry['arcs']] if geometry['type'] == 'Polygon' else geometry['arcs']
+            shape = MultiPolygon([Polygon(_ring(p[0], arcs), [_ring(h, arcs) for h in p[1:]]) for p in polygons])
+            records.append(geometry.get('properties', {}))
+            geometries.append(shapely.make_valid(shape, method='structure', keep_collapsed=False))
+    return gpd.GeoDataFrame(records, geometry=geometries, crs='EPSG:4326')
+
+
+def simplify_geojson(layer_path, tolerance):
+    import geopandas as gpd
+    import shapely
+
+    gdf = gpd.read_file(layer_path)
+    try:
+        return gdf.set_geometry(gdf.geometry.simplify_coverage(tolerance))
+    except shapely.errors.GEOSException:
+        return gdf.set_geometry(gdf.geometry.simplify(tolerance, preserve_topology=True))
+
+
+def _kmeans(points, k):
+    # k-moyennes déterministes, initialisées par les points les plus éloignés les uns des autres
+    centers = [points[0]]
+    distances = np.linalg.norm(points - centers[0], axis=1)
+    for _ in range(1, k):
+        centers.append(points[distances.argmax()])
+        distances = np.minimum(distances, np.linalg.norm(points - centers[-1], axis=1))
+    centers = np.array(centers)
+    for _ in range(PARTITION_ITERATIONS):
+        nearest = np.linalg.norm(points[:, None] - centers[None], axis=2).argmin(axis=1)
+        updated = np.array([points[nearest == i].mean(axis=0) if (nearest == i).any() else centers[i] for i in range(k)])
+        if np.allclose(updated, centers):
+            break
+        centers = updated
+    return centers
+
+
+def partition_polygon(polygon, k):
+    """Découpe un polygone (coordonnées métriques) en k parties de surfaces voisines.
+
+    Cellules de Voronoï des centres des k-moyennes d'une grille de points
+    intérieurs, découpées au contour : les parties couvrent exactement le
+    polygone, sans recouvrement. Les cellules sont renvoyées du nord au sud.
+    """
+    import shapely
+    from shapely.geometry import MultiPoint
+
+    if k <= 1:
+        return [polygon]
+    minx, miny, maxx, maxy = polygon.bounds
+    step = np.sqrt(polygon.area / (PARTITION_SAMPLES * k))
+    points = np.empty((0, 2))
+    while len(points) < k * 10:
+        # Polygone très découpé : grille resserrée jusqu'à avoir assez de points intérieurs
+        xs, ys = np.meshgrid(np.arange(minx, maxx, step), np.arange(miny, maxy, step))
+        xs, ys = xs.ravel(), ys.ravel()
+        inside = shapely.contains_xy(polygon, xs, ys)
+        points = np.column_stack([xs[inside], ys[inside]])
+        step /= 2
+    centers = _kmeans(points, k)
+    centers = centers[np.lexsort((centers[:, 0], -centers[:, 1]))]
+    cells = shapely.voronoi_polygons(MultiPoint(centers), extend_to=polygon, ordered=True).geoms
+    return [_polygonal(cell.intersection(polygon)) for cell in cells]
+
+
+def _polygonal(geometry):
+    # Parties surfaciques d'une intersection (les segments et points de contact sont écartés)
+    import shapely
+    from shapely.geometry import MultiPolygon
+
+    parts = [part for part in shapely.get_parts(geometry) if part.geom_type == 'Polygon']
+    return MultiPolygon(parts)
+
+
+def build_cercle_layer():
+    """Couche des cercles : chaque province (géométrie fusionnée) découpée en autant de parties que de cercles.
+
+    Les limites administratives des cercles ne sont pas disponibles : le
+    découpage est schématique (surfaces voisines), chaque cercle reste dans sa
+    province. Les cercles d'une province absente de la couche sont ignorés (signalés
+    sous la carte : MapLayer.missing).
+    """
+    import geopandas as gpd
+    import pandas as pd
+
+    cercles = pd.read_parquet(CERCLES_TABLE)
+    cercles['cldh_label'] = cercles['cldh_label'].astype(str).str.strip()
+    provinces = simplify_topology(PROVINCES_PATH, 0).dissolve(by='name').to_crs(PROJECTED_CRS)
+
+    records, geometries, missing = [], [], []
+    for province, group in cercles.sort_values('code_cercle').groupby('province_label', sort=True):
+        if province not in provinces.index:
+            missing.append(province)
+            continue
+        parts = partition_polygon(provinces.geometry[province], len(group))
+        for (_, cercle), part in zip(group.iterrows(), parts):
+            records.append({'cldh_label': cercle['cldh_label'], 'province_label': province})
+            geometries.append(part)
+    gdf = gpd.GeoDataFrame(records, geometry=geometries, crs=PROJECTED_CRS).to_crs('EPSG:4326')
+    if os.path.exists(CERCLES_PATH):
+        os.remove(CERCLES_PATH)
+    gdf.to_file(CERCLES_PATH, driver='GeoJSON', COORDINATE_PRECISION=5)
+    print(f"Couche des cercles écrite : {CERCLES_PATH} ({len(gdf)} cercles)")
+    if missing:
+        print(f"Provinces absentes de la couche, cercles ignorés : {', '.join(missing)}")
+
+
+def build_simplified_layers():
+    import shapely
+
+    os.makedirs(SIMPLIFIED_DIR, exist_ok=True)
+    for layer_path in NAME_COLUMNS:
+        for lod, tolerance in LOD_TOLERANCES.items():
+            if layer_path.endswith('.geojson'):
+                gdf = simplify_geojson(layer_path, tolerance)
+            else:
+                gdf = simplify_topology(layer_path, tolerance)
+            # Quantification des coordonnées sur une grille régulière
+            gdf = gdf.set_geometry(shapely.set_precision(gdf.geometry.values, GRID_SIZE))
+            path = simplified_layer_path(layer_path, lod)
+            if os.path.exists(path):
+                os.remove(path)
+            gdf.to_file(path, driver='GeoJSON', COORDINATE_PRECISION=COORDINATE_PRECISION)
+            print(f"Couche simplifiée écrite : {path} ({os.path.getsize(path) / 1024:.0f} Ko)")
+
+
+def build_label_points():
+    import geopandas as gpd
+
+    for layer_path, name_column in NAME_COLUMNS.items():
+        points = compute_label_points(gpd.read_file(layer_path), name_column)
+        with open(label_points_path(layer_path), 'w', encoding='utf-8') as f:
+            json.dump(points, f, ensure_ascii=False, indent=1)
+        print(f"Points d'étiquettes écrits : {label_points_path(layer_path)} ({len(points)} unités)")
+
+
+if __name__ == "__main__":
+    build_cercle_layer()
+    build_label_points()
+    build_simplified_layers()
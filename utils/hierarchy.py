@@ -0,0 +1,88 @@
+# utils/hierarchy.py
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Hierarchy:
+    """Dictionnaire partagé des libellés cercle -> province -> région.
+
+    Chaque niveau est codé par un entier (position dans son dictionnaire) ;
+    les liens vers le parent sont des tableaux de codes, utilisés à la place
+    des fusions sur des paires de libellés dédoublonnées.
+    """
+    regions: pd.Index
+    provinces: pd.Index
+    cercles: pd.Index
+    province_region: np.ndarray
+    cercle_province: np.ndarray
+
+    def dtype(self, column):
+        categories = {
+            'region_label': self.regions,
+            'province_label': self.provinces,
+            'cldh_label': self.cercles,
+        }[column]
+        return pd.CategoricalDtype(categories)
+
+    def encode(self, labels, column):
+        # Recodage dans le dictionnaire partagé (libellés inconnus -> valeur manquante)
+        return pd.Series(labels, copy=False).astype(self.dtype(column))
+
+    def attach_parents(self, data, column):
+        # Ajoute les niveaux parents d'après les codes, sans fusion
+        codes = self.encode(data[column], column).cat.codes.to_numpy()
+        if column == 'cldh_label':
+            codes = np.where(codes >= 0, self.cercle_province[codes], -1)
+            data['province_label'] = pd.Categorical.from_codes(codes, dtype=self.dtype('province_label'))
+            column = 'province_label'
+        if column == 'province_label':
+            codes = np.where(codes >= 0, self.province_region[codes], -1)
+            data['region_label'] = pd.Categorical.from_codes(codes, dtype=self.dtype('region_label'))
+        return data
+
+
+def _codes(values, categories):
+    return pd.Categorical(values, categories=categories).codes
+
+
+def _parent_links(child_codes, parent_codes, n_children, n_parents):
+    # Premier parent observé pour chaque enfant (-1 si aucun), sur des paires de codes entiers
+    links = np.full(n_children, -1, dtype=np.int32)
+    valid = (child_codes >= 0) & (parent_codes >= 0)
+    pairs = pd.unique(child_codes[valid].astype(np.int64) * n_parents + parent_codes[valid])
+    children, parents = np.divmod(pairs, n_parents)
+    # Paires dans l'ordre d'observation : première occurrence de chaque enfant, une affectation par enfant
+    children, first = np.unique(children, return_index=True)
+    links[children] = parents[first]
+    return links
+
+
+def _union(*labels):
+    values = pd.concat([pd.Series(np.asarray(v, dtype=object)) for v in labels], ignore_index=True)
+    return pd.Index(values.dropna().astype(str).str.strip().unique()).sort_values()
+
+
+def _observed(series):
+    # Valeurs distinctes, sans parcourir les lignes si la colonne est déjà catégorielle
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.categories
+    return series.unique()
+
+
+def build_hierarchy(combined_data, circles_data, provinces_data, grappes_regions):
+    regions = _union(grappes_regions['region'], _observed(combined_data['region_label']))
+    provinces = _union(provinces_data['province'], circles_data['province_label'], _observed(combined_data['province_label']))
+    cercles = _union(circles_data['cldh_label'], _observed(combined_data['cldh_label']))
+
+    # Cercle -> province : table de référence, complétée par les soumissions
+    reference = _parent_links(_codes(circles_data['cldh_label'], cercles), _codes(circles_data['province_label'], provinces), len(cercles), len(provinces))
+    observed = _parent_links(_codes(combined_data['cldh_label'], cercles), _codes(combined_data['province_label'], provinces), len(cercles), len(provinces))
+    cercle_province = np.where(reference >= 0, reference, observed)
+
+    # Province -> région : seules les soumissions portent ce lien
+    province_region = _parent_links(_codes(combined_data['province_label'], provinces), _codes(combined_data['region_label'], regions), len(provinces), len(regions))
+
+    return Hierarchy(regions, provinces, cercles, province_region, cercle_province)
@@ -0,0 +1,149 @@
+# utils/indicators.py
+# Registre déclaratif des indicateurs : chaque indicateur est défini une seule fois
+# (libellé, unité, dépendances, formule) et évalué à la demande sur les niveaux du cube.
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregation import LEVEL_KEYS
+from utils.formatting import COUNT_FORMAT, DATE_FORMAT, PERCENT_FORMAT
+
+# Libellés des colonnes d'identification des niveaux
+KEY_LABELS = {
+    'region_label': 'Région',
+    'province_label': 'Province',
+    'cldh_label': 'Cercle',
+    'grappe': 'Grappe',
+}
+# Parents rattachés à chaque niveau du cube (hiérarchy.attach_parents)
+PARENT_KEYS = {
+    'grappe': ['province_label', 'region_label'],
+    'cercle': ['province_label', 'region_label'],
+    'province': ['region_label'],
+    'region': [],
+    'national': [],
+}
+
+
+@dataclass(frozen=True)
+class Indicator:
+    """Définition d'un indicateur : colonne du cube (formula None) ou formule sur ses dépendances.
+
+    formula reçoit les colonnes des dépendances (tableaux NumPy, dans l'ordre de
+    depends) et renvoie la colonne de l'indicateur pour toutes les unités du niveau.
+    """
+    label: str
+    unit: str = 'count'
+    depends: tuple = ()
+    formula: object = None
+
+    @property
+    def format(self):
+        return {'count': COUNT_FORMAT, 'percent': PERCENT_FORMAT, 'days': COUNT_FORMAT, 'date': DATE_FORMAT}[self.unit]
+
+
+def _rate(numerator, denominator):
+    # Pourcentage ; 0 quand le dénominateur est nul
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = numerator / denominator * 100
+    return np.where(np.isfinite(rate), rate, 0.0)
+
+
+# Ordre d'affichage par défaut ; les colonnes de base sont calculées par le cube
+# (build_cube) et la projection (add_projections)
+INDICATORS = {
+    'expra_1': Indicator('Enquêtes Ménage'),
+    'expra_0': Indicator('Recensements'),
+    'unique_grappe': Indicator('Grappes Couvertes'),
+    'nb_grappe': Indicator('Nombre Total de Grappes'),
+    'ratio_expra': Indicator('Taux Enquêtes Ménage/Recensements', 'percent', ('expra_1', 'expra_0'), _rate),
+    'percent_unique_grappe': Indicator('Taux de Couverture des Grappes', 'percent', ('unique_grappe', 'nb_grappe'), _rate),
+    'objectif_expra': Indicator('Objectif Enquêtes Ménage'),
+    'taux_realisation': Indicator('Taux de Réalisation des Enquêtes Ménage', 'percent', ('expra_1', 'objectif_expra'), _rate),
+    'date_fin': Indicator('Date de Fin Projetée', 'date'),
+    'jours_restants': Indicator('Jours Restants Projetés', 'days'),
+}
+
+
+def labels(names):
+    return {name: INDICATORS[name].label if name in INDICATORS else KEY_LABELS[name] for name in names}
+
+
+def column_formats(names):
+    # Formats d'affichage des indicateurs, par libellé (indicator_column_config)
+    return {INDICATORS[name].label: INDICATORS[name].format for name in names if name in INDICATORS}
+
+
+def resolve(names):
+    """Indicateurs à évaluer pour obtenir names, dépendances comprises, dans l'ordre de calcul."""
+    order, visiting = [], set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name not in INDICATORS:
+            raise KeyError(f"Indicateur inconnu : {name}")
+        if name in visiting:
+            raise ValueError(f"Dépendance circulaire sur l'indicateur {name}")
+        visiting.add(name)
+        for dependency in INDICATORS[name].depends:
+            visit(dependency)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+class IndicatorStore:
+    """Évaluation des indicateurs sur les niveaux du cube, mémorisée pour une version des données.
+
+    Chaque colonne (niveau, indicateur) n'est calculée qu'une fois, au premier
+    affichage qui la demande ; les vues et les sessions partagent ensuite le
+    même tableau. Les tableaux renvoyés sont partagés : lecture seule.
+    """
+
+    def __init__(self, cube):
+        self.cube = cube
+        self._columns = {}
+        self._frames = {}
+        self._lock = threading.RLock()
+
+    def column(self, level, name):
+        key = (level, name)
+        if key not in self._columns:
+            with self._lock:
+                for item in resolve([name]):
+                    if (level, item) in self._columns:
+                        continue
+                    indicator = INDICATORS[item]
+                    if indicator.formula is None:
+                        values = self.cube[level][item].to_numpy()
+                    else:
+                        values = indicator.formula(*(self._columns[(level, dependency)] for dependency in indicator.depends))
+                    self._columns[(level, item)] = values
+        return self._columns[key]
+
+    def available(self, level):
+        # Indicateurs évaluables sur un niveau (colonnes de base présentes dans le cube)
+        columns = set(self.cube[level].columns)
+        return [name for name in INDICATORS if all(
+            item in columns for item in resolve([name]) if INDICATORS[item].formula is None
+        )]
+
+    def frame(self, level, names=None):
+        """Niveau du cube réduit à ses clés, ses parents et aux indicateurs demandés (colonnes du cube)."""
+        names = tuple(self.available(level) if names is None else names)
+        key = (level, names)
+        if key not in self._frames:
+            data = self.cube[level]
+            keys = [column for column in LEVEL_KEYS[level] + PARENT_KEYS[level] if column in data.columns]
+            frame = pd.DataFrame({column: data[column] for column in keys}, index=data.index)
+            for name in names:
+                frame[name] = self.column(level, name)
+            with self._lock:
+                self._frames.setdefault(key, frame)
+        return self._frames[key]
@@ -0,0 +1,80 @@
+# utils/io_audit.py
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# Dossier des données : seules les lectures sous ce dossier sont comptées
+DATA_DIR = os.path.abspath('data')
+
+_state = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+
+
+@dataclass
+class ReadLog:
+    """Fichiers de data/ lus pendant un affichage, par catégorie.
+
+    reads : lectures de l'affichage lui-même (aucune attendue, tout est préparé
+    par version). loads : chargements ponctuels, une fois par version des
+    données (tables et agrégats au premier accès, sélection de soumissions,
+    export écrit), qui ne doivent pas se répéter d'un affichage à l'autre.
+    """
+    reads: list = field(default_factory=list)
+    loads: list = field(default_factory=list)
+
+
+def _target():
+    # Liste recevant les lectures du thread courant (None hors suivi)
+    return getattr(_state, 'target', None)
+
+
+def _audit(event, args):
+    # Ouvertures de fichiers faites en Python (json, open, ...) pendant un suivi actif
+    target = _target()
+    if target is None or event not in ('open', 'os.listdir', 'os.scandir'):
+        return
+    path = args[0] if args else None
+    if isinstance(path, (str, bytes, os.PathLike)):
+        path = os.path.abspath(os.fsdecode(path))
+        if path.startswith(DATA_DIR):
+            target.append(path)
+
+
+def record_read(path):
+    # Lectures faites hors de Python (GDAL, Arrow) : signalées explicitement par les lecteurs
+    target = _target()
+    if target is not None:
+        target.append(os.path.abspath(path))
+
+
+@contextmanager
+def track_reads():
+    """ReadLog des fichiers de data/ lus par le thread courant dans le bloc."""
+    global _installed
+    with _install_lock:
+        if not _installed:
+            # Un hook d'audit ne peut pas être retiré : installé une seule fois par processus
+            sys.addaudithook(_audit)
+            _installed = True
+    previous = getattr(_state, 'log', None), _target()
+    log = ReadLog()
+    _state.log, _state.target = log, log.reads
+    try:
+        yield log
+    finally:
+        _state.log, _state.target = previous
+
+
+@contextmanager
+def one_time_load():
+    # Chargements ponctuels (une fois par version des données) : comptés à part (ReadLog.loads)
+    log = getattr(_state, 'log', None)
+    previous = _target()
+    _state.target = None if log is None else log.loads
+    try:
+        yield
+    finally:
+        _state.target = previous
@@ -0,0 +1,95 @@
+# utils/layers.py
+import os
+from dataclasses import dataclass
+
+import pandas as pd
+
+from utils.formatting import day_labels, is_days, is_percent, map_labels
+from utils.indicators import labels
+from utils.geo import CERCLES_PATH, LOD_TOLERANCES, NAME_COLUMNS, PROVINCES_PATH, REGIONS_PATH, layer_features, load_layer_geojson
+
+# Indicateurs affichés sur les cartes, sous leur libellé (registre des indicateurs)
+MAP_INDICATORS = labels(['expra_1', 'expra_0', 'unique_grappe', 'ratio_expra', 'percent_unique_grappe', 'jours_restants'])
+# Indicateurs de réalisation, nuls (et non manquants) pour une unité sans soumission
+COUNT_INDICATORS = [label for column, label in MAP_INDICATORS.items() if column != 'jours_restants']
+
+
+@dataclass(frozen=True)
+class MapLayer:
+    """Couche prête pour px.choropleth : géométrie, indicateurs et étiquettes déjà joints."""
+    geojson: dict
+    name_column: str
+    # Une ligne par entité, dans l'ordre des entités du GeoJSON
+    data: pd.DataFrame
+    labels: dict
+    label_points: dict
+    # Unités du niveau sans géométrie dans la couche : absentes de la carte, signalées dans la vue
+    missing: tuple = ()
+
+
+def _feature_names(geojson, name_column):
+    return [f['properties'].get(name_column) for f in geojson['features']]
+
+
+def _prepare_layer(geojson, name_column, level_data, key, label_points, fill=None):
+    indicators = level_data[[key] + list(MAP_INDICATORS)].rename(columns={key: name_column, **MAP_INDICATORS})
+    indicators[name_column] = indicators[name_column].astype(str)
+    data = pd.DataFrame({name_column: _feature_names(geojson, name_column)})
+    data = data.merge(indicators, on=name_column, how='left')
+    missing = tuple(sorted(set(indicators[name_column]) - set(data[name_column])))
+    if fill is not None:
+        data[COUNT_INDICATORS] = data[COUNT_INDICATORS].fillna(fill)
+    labels = {
+        column: (day_labels(data[column]) if is_days(column) else map_labels(data[column], is_percent(column))).tolist()
+        for column in MAP_INDICATORS.values()
+    }
+    return MapLayer(geojson, name_column, data, labels, label_points, missing)
+
+
+def build_map_layers(indicators, label_points, geojsons=None):
+    """Registre des couches cartographiques préparées pour une version des données.
+
+    indicators : évaluation des indicateurs (IndicatorStore) de la version courante.
+    Clés : ('region', 'national'), ('province', 'national') et ('province', région)
+    pour le zoom sur une région ; ('cercle', 'national') et ('cercle', région) si la
+    couche des cercles a été construite. Les fichiers ne sont lus qu'ici, jamais au rendu.
+    """
+    if geojsons is None:
+        layer_paths = [PROVINCES_PATH, REGIONS_PATH] + ([CERCLES_PATH] if os.path.exists(CERCLES_PATH) else [])
+        geojsons = {
+            (layer_path, lod): load_layer_geojson(layer_path, lod)
+            for layer_path in layer_paths
+            for lod in LOD_TOLERANCES
+        }
+    province_points, region_points, cercle_points = label_points
+    province_name, region_name = NAME_COLUMNS[PROVINCES_PATH], NAME_COLUMNS[REGIONS_PATH]
+
+    levels = {level: indicators.frame(level, list(MAP_INDICATORS)) for level in ['region', 'province', 'cercle']}
+    layers = {
+        # Régions absentes des soumissions : indicateurs à 0
+        ('region', 'national'): _prepare_layer(
+            geojsons[(REGIONS_PATH, 'national')], region_name, levels['region'], 'region_label', region_points, fill=0
+        ),
+        ('province', 'national'): _prepare_layer(
+            geojsons[(PROVINCES_PATH, 'national')], province_name, levels['province'], 'province_label', province_points
+        ),
+    }
+    # Zoom régional : provinces de la région seulement, géométrie plus fine
+    provinces = levels['province']
+    for region in provinces['region_label'].dropna().unique():
+        region_provinces = provinces[provinces['region_label'] == region]
+        geojson = layer_features(geojsons[(PROVINCES_PATH, 'regional')], province_name, region_provinces['province_label'].astype(str))
+        layers[('province', str(region))] = _prepare_layer(geojson, province_name, region_provinces, 'province_label', province_points)
+
+    if (CERCLES_PATH, 'national') in geojsons:
+        cercle_name = NAME_COLUMNS[CERCLES_PATH]
+        cercles = levels['cercle']
+        # Vue nationale : près de 200 cercles, sans étiquettes (valeurs au survol)
+        layers[('cercle', 'national')] = _prepare_layer(
+            geojsons[(CERCLES_PATH, 'national')], cercle_name, cercles, 'cldh_label', {}
+        )
+        for region in cercles['region_label'].dropna().unique():
+            region_cercles = cercles[cercles['region_label'] == region]
+            geojson = layer_features(geojsons[(CERCLES_PATH, 'regional')], cercle_name, region_cercles['cldh_label'].astype(str))
+            layers[('cercle', str(region))] = _prepare_layer(geojson, cercle_name, region_cercles, 'cldh_label', cercle_points)
+    return layers
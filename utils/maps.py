@@ -0,0 +1,198 @@
+# utils/maps.py
+import numpy as np
+import pandas as pd
+
+from utils.formatting import is_days, is_percent
+from utils.geo import layer_features
+from utils.profiling import section, timed
+
+
+def add_map_labels(fig, layer, column):
+    import plotly.graph_objects as go
+
+    # Toutes les étiquettes en une seule trace de texte positionnée en longitude/latitude
+    names = layer.data[layer.name_column]
+    anchors = [(layer.label_points[name], f"<b>{name}<br>{label}</b>") for name, label in zip(names, layer.labels[column]) if name in layer.label_points]
+    fig.add_trace(go.Scattergeo(
+        lon=[point[0] for point, _ in anchors],
+        lat=[point[1] for point, _ in anchors],
+        text=[text for _, text in anchors],
+        mode='text',
+        textfont=dict(size=10, color="black"),
+        hoverinfo='skip',
+        showlegend=False
+    ))
+
+
+@timed()
+def generate_province_map(layer, column, title):
+    # Plotly n'est importé qu'à la première vue graphique ou cartographique
+    import plotly.express as px
+
+    # Couche déjà filtrée et jointe aux indicateurs : aucune lecture ni fusion au rendu
+    data = layer.data.assign(label=layer.labels[column])
+    
+    with section('choropleth'):
+        fig = px.choropleth(
+            data,
+            geojson=layer.geojson,
+            locations=layer.name_column,
+            featureidkey=f"properties.{layer.name_column}",
+            color=column,
+            hover_name=layer.name_column,
+            hover_data={'label': True, column: False},  # Afficher 'label' au lieu de la valeur numérique
+            color_continuous_scale=px.colors.sequential.Blues,
+            title=title
+        )
+
+        fig.update_traces(
+            hovertemplate="<b>%{hovertext}</b><br>%{customdata[0]}<extra></extra>"
+        )
+
+        fig.update_geos(fitbounds="locations", visible=False)
+        fig.update_layout(
+            coloraxis_colorbar=dict(title="Pourcentage (%)" if is_percent(column) else "Jours" if is_days(column) else "Total"),
+            title={
+                'y': 0.9,
+                'x': 0.5,
+                'xanchor': 'center',
+                'yanchor': 'top'
+            },
+            margin={"r": 0, "t": 40, "l": 0, "b": 0}
+        )
+
+    # Ajouter les noms des provinces et les valeurs des indicateurs sur la carte
+    with section('labels'):
+        add_map_labels(fig, layer, column)
+
+    return fig
+
+
+@timed()
+def generate_fixed_map(layer, column, title):
+    import plotly.express as px
+
+    # Toutes les régions du GeoJSON sont présentes dans la couche (valeurs manquantes à 0)
+    data = layer.data.assign(label=layer.labels[column])
+    
+    with section('choropleth'):
+        fig = px.choropleth(
+            data,
+            geojson=layer.geojson,
+            locations=layer.name_column,
+            featureidkey=f"properties.{layer.name_column}",
+            color=column,
+            hover_name=layer.name_column,
+            hover_data={'label': True, column: False},  # Afficher 'label' au lieu de la valeur numérique
+            color_continuous_scale=px.colors.sequential.Blues,
+            title=title
+        )
+
+        fig.update_traces(
+            hovertemplate="<b>%{hovertext}</b><br>%{customdata[0]}<extra></extra>"
+        )
+
+        fig.update_geos(fitbounds="locations", visible=False)
+    
+        # Définir le titre de la légende en fonction de l'indicateur
+        if is_percent(column):
+            colorbar_title = "Pourcentage (%)"
+        elif is_days(column):
+            colorbar_title = "Jours"
+        else:
+            colorbar_title = "Total"
+    
+        fig.update_layout(
+            coloraxis_colorbar=dict(title=colorbar_title),
+            title={
+                'y': 0.9,
+                'x': 0.5,
+                'xanchor': 'center',
+                'yanchor': 'top'
+            },
+            width=1200,  # Augmenter la taille du plot
+            height=900,  # Augmenter la taille du plot
+            margin={"r": 0, "t": 40, "l": 0, "b": 0}
+        )
+
+    # Ajouter les noms des régions et les valeurs des indicateurs sur la carte
+    with section('labels'):
+        add_map_labels(fig, layer, column)
+
+    return fig
+
+
+@timed()
+def generate_grappe_map(grappe_points, outline, title, region=None, province=None):
+    """Carte des grappes : cellules regroupées (pays, région) ou grappes individuelles (province).
+
+    Le regroupement est précalculé (utils/points.py) : la figure ne porte que
+    les marqueurs du niveau affiché, quelques centaines au plus. outline est
+    la couche de fond (MapLayer) dont seuls les contours sont dessinés.
+    """
+    import plotly.graph_objects as go
+
+    from utils.points import STATUS_COLORS, STATUSES
+
+    kind, data = grappe_points.view(region, province)
+    names = outline.data[outline.name_column]
+    geojson = outline.geojson
+    if province is not None:
+        # Contour de la seule province affichée
+        names = names[names == province]
+        geojson = layer_features(geojson, outline.name_column, names)
+    fig = go.Figure()
+    fig.add_trace(go.Choropleth(
+        geojson=geojson,
+        locations=names,
+        featureidkey=f"properties.{outline.name_column}",
+        z=[0] * len(names),
+        colorscale=[[0, '#f7f7f7'], [1, '#f7f7f7']],
+        marker_line=dict(color='#969696', width=0.5),
+        showscale=False,
+        hoverinfo='skip'
+    ))
+
+    with section('markers'):
+        if kind == 'province':
+            # Quelques centaines de grappes : un marqueur par grappe, une trace par statut
+            for status in STATUSES:
+                points = data[data['statut'] == status]
+                names = [f"Grappe {g}" if pd.notna(g) else "Grappe non visitée" for g in points['grappe']]
+                fig.add_trace(go.Scattergeo(
+                    lon=points['lon'], lat=points['lat'],
+                    mode='markers',
+                    marker=dict(size=7, color=STATUS_COLORS[status], line=dict(width=0.5, color='white')),
+                    name=status,
+                    text=[f"<b>{name}</b><br>{cercle}<br>{status}" for name, cercle in zip(names, points['cldh_label'])],
+                    hoverinfo='text'
+                ))
+        else:
+            # Cellules : taille selon le nombre de grappes, couleur selon la couverture
+            sizes = 10 + 30 * np.sqrt(data['grappes'] / max(data['grappes'].max(), 1))
+            fig.add_trace(go.Scattergeo(
+                lon=data['lon'], lat=data['lat'],
+                mode='markers+text',
+                marker=dict(
+                    size=sizes, color=data['couverture'], cmin=0, cmax=100, colorscale='RdYlGn',
+                    colorbar=dict(title="Couverture (%)"), line=dict(width=0.5, color='white')
+                ),
+                text=data['grappes'].astype(str),
+                textfont=dict(size=9),
+                customdata=data[STATUSES].to_numpy(),
+                hovertemplate=(
+                    "<b>%{text} grappes</b><br>Couverture : %{marker.color:.1f}%<br>"
+                    + "<br>".join(f"{status} : %{{customdata[{i}]}}" for i, status in enumerate(STATUSES))
+                    + "<extra></extra>"
+                ),
+                showlegend=False
+            ))
+
+    fig.update_geos(fitbounds="locations", visible=False)
+    fig.update_layout(
+        title={'text': title, 'y': 0.95, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top'},
+        legend=dict(orientation='h', yanchor='bottom', y=0),
+        height=700,
+        margin={"r": 0, "t": 40, "l": 0, "b": 0}
+    )
+    return fig
@@ -0,0 +1,125 @@
+# utils/points.py
+# Carte des grappes : position représentative de chaque grappe et regroupement côté serveur
+# par niveau de zoom, pour n'envoyer au navigateur que quelques centaines de marqueurs.
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+ENQUETEE = "Enquêtée"
+RECENSEE = "Recensement seul"
+NON_VISITEE = "Non visitée"
+STATUSES = [ENQUETEE, RECENSEE, NON_VISITEE]
+STATUS_COLORS = {ENQUETEE: '#1a9850', RECENSEE: '#fdae61', NON_VISITEE: '#bdbdbd'}
+
+# Pas de la grille de regroupement (degrés) par niveau de zoom ; au niveau province, grappes individuelles
+CLUSTER_GRIDS = {'national': 0.5, 'region': 0.1}
+# Écartement des positions autour d'un point d'ancrage (degrés) : cercles autour de la province,
+# grappes autour de leur cercle
+CERCLE_SPREAD = 0.08
+GRAPPE_SPREAD = 0.006
+GOLDEN_ANGLE = np.pi * (3 - np.sqrt(5))
+
+
+@dataclass(frozen=True)
+class GrappePoints:
+    """Grappes positionnées et regroupements précalculés, pour une version des données.
+
+    points : une ligne par grappe de l'échantillon (grappes non visitées
+    comprises, sans identifiant), avec région, province, cercle, statut et
+    position. clusters[niveau] : cellules de la grille du niveau, avec le nombre
+    de grappes par statut et leur barycentre.
+    """
+    points: pd.DataFrame
+    clusters: dict
+
+    def view(self, region=None, province=None):
+        # (niveau, données) à afficher pour une sélection : cellules, ou grappes d'une province
+        if province is not None:
+            return 'province', self.points[self.points['province_label'] == province]
+        if region is not None:
+            clusters = self.clusters['region']
+            return 'region', clusters[clusters['region_label'] == region]
+        return 'national', self.clusters['national']
+
+
+def _spiral(anchors, ranks, spread):
+    # Disposition en tournesol autour du point d'ancrage : positions distinctes et stables
+    radius = spread * np.sqrt(ranks)
+    angle = ranks * GOLDEN_ANGLE
+    return anchors[:, 0] + radius * np.cos(angle), anchors[:, 1] + radius * np.sin(angle)
+
+
+def _cercle_anchors(cercles, province_points, region_points, cercle_points):
+    # Point du cercle s'il est connu, sinon position autour du point représentatif de la province
+    # (de la région pour une province absente de la couche)
+    province_anchor = np.array([
+        province_points.get(str(p), region_points.get(str(r), (np.nan, np.nan)))
+        for p, r in zip(cercles['province_label'], cercles['region_label'])
+    ], dtype=float)
+    ranks = cercles.groupby('province_label', observed=True).cumcount().to_numpy()
+    lon, lat = _spiral(province_anchor, ranks, CERCLE_SPREAD)
+    own = np.array([cercle_points.get(str(c), (np.nan, np.nan)) for c in cercles['cldh_label']], dtype=float)
+    known = ~np.isnan(own[:, 0])
+    return np.column_stack([np.where(known, own[:, 0], lon), np.where(known, own[:, 1], lat)])
+
+
+def _status(grappes):
+    return np.where(grappes['expra_1'] > 0, ENQUETEE, np.where(grappes['expra_0'] > 0, RECENSEE, NON_VISITEE))
+
+
+def _cluster(points, grid, by=()):
+    cells = pd.DataFrame({
+        'cell_x': np.floor(points['lon'].to_numpy() / grid),
+        'cell_y': np.floor(points['lat'].to_numpy() / grid),
+    })
+    for column in by:
+        cells[column] = points[column].astype(str).to_numpy()
+    for status in STATUSES:
+        cells[status] = (points['statut'] == status).to_numpy().astype(np.int64)
+    cells['lon'] = points['lon'].to_numpy()
+    cells['lat'] = points['lat'].to_numpy()
+    keys = list(by) + ['cell_x', 'cell_y']
+    clusters = cells.groupby(keys, sort=False).agg(
+        lon=('lon', 'mean'), lat=('lat', 'mean'), **{status: (status, 'sum') for status in STATUSES}
+    ).reset_index().drop(columns=['cell_x', 'cell_y'])
+    clusters['grappes'] = clusters[STATUSES].sum(axis=1)
+    clusters['couverture'] = 100 * (clusters[ENQUETEE] + clusters[RECENSEE]) / clusters['grappes']
+    return clusters
+
+
+def build_grappe_points(cube, label_points):
+    """Positionne les grappes de l'échantillon et précalcule les regroupements de chaque niveau de zoom.
+
+    Les soumissions ne portent pas de coordonnées : une grappe est placée
+    autour du point représentatif de son cercle, ou à défaut de sa province
+    (label_points : points des provinces, des régions et des cercles, comme pour les cartes).
+    Les grappes encore non visitées d'un cercle (nb_grappe moins les grappes
+    observées) sont placées de la même façon, sans identifiant.
+    """
+    cercles = cube['cercle'][['cldh_label', 'province_label', 'region_label', 'nb_grappe']].reset_index(drop=True)
+    province_points, region_points, cercle_points = label_points
+    anchors = _cercle_anchors(cercles, province_points, region_points, cercle_points)
+
+    visited = cube['grappe'][['grappe', 'cldh_label', 'province_label', 'region_label', 'expra_1', 'expra_0']]
+    visited = visited.assign(statut=_status(visited))
+    counts = visited.groupby('cldh_label', observed=True).size()
+    missing = np.maximum(cercles['nb_grappe'].fillna(0).to_numpy() - counts.reindex(cercles['cldh_label'].astype(object)).fillna(0).to_numpy(), 0).astype(np.int64)
+    pending = cercles.loc[np.repeat(cercles.index.to_numpy(), missing), ['cldh_label', 'province_label', 'region_label']]
+    pending = pending.assign(grappe=pd.NA, expra_1=0, expra_0=0, statut=NON_VISITEE)
+
+    points = pd.concat([visited, pending[visited.columns]], ignore_index=True)
+    for column in ['cldh_label', 'province_label', 'region_label']:
+        points[column] = points[column].astype(str)
+    # Rang de la grappe dans son cercle : grappes visitées d'abord, par identifiant
+    ranks = points.groupby('cldh_label', sort=False).cumcount().to_numpy()
+    cercle_index = pd.Index(cercles['cldh_label'].astype(str)).get_indexer(points['cldh_label'])
+    cercle_anchor = np.where(cercle_index[:, None] >= 0, anchors[cercle_index], np.nan)
+    points['lon'], points['lat'] = _spiral(cercle_anchor, ranks, GRAPPE_SPREAD)
+    points = points[points['lon'].notna()].reset_index(drop=True)
+
+    clusters = {
+        'national': _cluster(points, CLUSTER_GRIDS['national']),
+        'region': _cluster(points, CLUSTER_GRIDS['region'], by=['region_label']),
+    }
+    return GrappePoints(points=points, clusters=clusters)
@@ -0,0 +1,169 @@
+# utils/profiling.py
+import csv
+import functools
+import io
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Journal des mesures (lignes JSON) pour l'analyse hors ligne, facultatif
+PROFILE_LOG = os.environ.get('EDH_PROFILE_LOG')
+# Modes de capture d'une exécution complète
+CAPTURE_MODES = ['cProfile', 'pyinstrument']
+
+_state = threading.local()
+# tracemalloc est global au processus : actif tant qu'au moins une exécution est profilée
+# (les pics mémoire restent approximatifs si plusieurs sessions sont profilées en même temps)
+_tracing_lock = threading.Lock()
+_tracing_runs = 0
+
+
+class _NullSection:
+    # Profilage désactivé : un seul objet partagé, aucune mesure
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+class ProfileRun:
+    """Mesures d'une exécution du script : une ligne par section chronométrée."""
+
+    def __init__(self, **context):
+        self.context = context
+        self.records = []
+        self.report = None
+        self._stack = []
+
+    @contextmanager
+    def section(self, name):
+        tracing = tracemalloc.is_tracing()
+        memory_start = 0
+        if tracing:
+            memory_start, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Le pic de la section parente jusqu'ici est conservé avant la remise à zéro
+                self._stack[-1][2] = max(self._stack[-1][2], peak)
+            tracemalloc.reset_peak()
+        entry = [name, memory_start, memory_start]
+        self._stack.append(entry)
+        path = "/".join(e[0] for e in self._stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = dict(self.context, section=path, ms=round((time.perf_counter() - start) * 1000, 3))
+            self._stack.pop()
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, entry[2])
+                if self._stack:
+                    self._stack[-1][2] = max(self._stack[-1][2], peak)
+                # Mémoire Python conservée et pic pendant la section
+                record['alloc_kb'] = round((current - memory_start) / 1024, 1)
+                record['peak_kb'] = round((peak - memory_start) / 1024, 1)
+            self.records.append(record)
+
+
+def current_run():
+    return getattr(_state, 'run', None)
+
+
+def section(name):
+    run = current_run()
+    return _NULL_SECTION if run is None else run.section(name)
+
+
+def timed(name=None):
+    # Décorateur : la fonction entière est une section
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = current_run()
+            if run is None:
+                return func(*args, **kwargs)
+            with run.section(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _capture(mode):
+    if mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            # Dépendance facultative : repli sur cProfile
+            pass
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return lambda: (profiler.stop(), profiler.output_text(unicode=True))[1]
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def stop():
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(40)
+        return out.getvalue()
+    return stop
+
+
+@contextmanager
+def profile_run(enabled, capture=None, memory=True, **context):
+    """Active la mesure des sections pour le bloc (thread courant) ; None si désactivé."""
+    if not enabled:
+        yield None
+        return
+    global _tracing_runs
+    run = ProfileRun(run_at=time.strftime('%Y-%m-%dT%H:%M:%S'), **context)
+    if memory:
+        with _tracing_lock:
+            _tracing_runs += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+    stop_capture = _capture(capture) if capture else None
+    _state.run = run
+    try:
+        with run.section('total'):
+            yield run
+    finally:
+        _state.run = None
+        if stop_capture is not None:
+            run.report = stop_capture()
+        if memory:
+            with _tracing_lock:
+                _tracing_runs -= 1
+                if _tracing_runs == 0:
+                    tracemalloc.stop()
+        if PROFILE_LOG:
+            with open(PROFILE_LOG, 'a', encoding='utf-8') as f:
+                f.write(to_json_lines(run.records))
+
+
+def to_json_lines(records):
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+
+def to_csv(records):
+    columns = []
+    for record in records:
+        columns += [column for column in record if column not in columns]
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=columns)
+    writer.writeheader()
+    writer.writerows(records)
+    return out.getvalue()
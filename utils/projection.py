@@ -0,0 +1,86 @@
+# utils/projection.py
+import numpy as np
+import pandas as pd
+
+from utils.aggregation import LEVEL_KEYS
+from utils.series import WINDOW
+
+# Objectif national d'enquêtes ménage, réparti entre les unités au prorata de leurs grappes
+SURVEY_TARGET = 35_000
+PROJECTION_LEVELS = ['national', 'region', 'province', 'cercle']
+PROJECTION_COLUMNS = ['objectif_expra', 'cadence_expra', 'cadence_grappe', 'reste_expra', 'reste_grappe', 'date_fin', 'jours_restants']
+
+
+def _remaining_days(cumulative, rate, target):
+    # Jours restants pour atteindre l'objectif à la cadence actuelle (0 si atteint, NaN sans cadence)
+    remaining = np.maximum(target - cumulative[:, -1], 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days = np.where(rate > 0, np.ceil(remaining / rate), np.nan)
+    return np.where(remaining == 0, 0.0, days), remaining
+
+
+def _reached_day(cumulative, target):
+    # Indice du premier jour où l'objectif est atteint (-1 sinon)
+    reached = cumulative >= target[:, None]
+    return np.where(reached.any(axis=1), reached.argmax(axis=1), -1)
+
+
+def project_level(series, level, grappe_targets, survey_targets):
+    """Projection de la date de fin de toutes les unités d'un niveau, en un seul passage vectorisé.
+
+    Cadence : moyenne des 7 derniers jours (enquêtes ménage et nouvelles
+    grappes couvertes). La date de fin est celle du dernier des deux objectifs ;
+    une unité sans activité récente n'a pas de date projetée.
+    """
+    units = series.keys(level)
+    n_days = len(series.dates)
+    if n_days == 0:
+        return pd.DataFrame(index=pd.Index(units), columns=PROJECTION_COLUMNS, dtype=float)
+    matrices = series.matrices[level]
+    window = min(WINDOW, n_days)
+    surveys, grappes = matrices['expra_1_cumul'], matrices['unique_grappe_cumul']
+    survey_rate = matrices['expra_1_7j'][:, -1] / window
+    grappe_rate = (grappes[:, -1] - (grappes[:, -window - 1] if n_days > window else 0)) / window
+
+    survey_days, survey_rest = _remaining_days(surveys, survey_rate, survey_targets)
+    grappe_days, grappe_rest = _remaining_days(grappes, grappe_rate, grappe_targets)
+    days = np.maximum(survey_days, grappe_days)
+
+    # Objectifs déjà atteints : date du dernier des deux franchissements
+    dates = series.dates.to_numpy()
+    reached = np.maximum(_reached_day(surveys, survey_targets), _reached_day(grappes, grappe_targets))
+    projected = dates[-1] + pd.to_timedelta(days, unit='D').to_numpy()
+    end = np.where(days == 0, dates[np.maximum(reached, 0)], projected)
+
+    return pd.DataFrame({
+        'objectif_expra': survey_targets,
+        'cadence_expra': survey_rate,
+        'cadence_grappe': grappe_rate,
+        'reste_expra': survey_rest,
+        'reste_grappe': grappe_rest,
+        'date_fin': end,
+        'jours_restants': days,
+    }, index=pd.Index(units))
+
+
+def add_projections(cube, series, survey_target=SURVEY_TARGET):
+    """Cube complété des colonnes de projection (PROJECTION_COLUMNS) pour chaque niveau."""
+    total_grappes = cube['national']['nb_grappe'].iloc[0]
+    cube = dict(cube)
+    for level in PROJECTION_LEVELS:
+        data = cube[level].copy()
+        keys = LEVEL_KEYS[level]
+        units = series.keys(level)
+        # Objectifs alignés sur l'ordre des unités de la série
+        if keys:
+            grappe_targets = data.set_index(keys[0])['nb_grappe'].reindex(pd.Index(units)).fillna(0).to_numpy(dtype=np.float64)
+        else:
+            grappe_targets = data['nb_grappe'].to_numpy(dtype=np.float64)
+        survey_targets = np.round(survey_target * grappe_targets / total_grappes)
+        projection = project_level(series, level, grappe_targets, survey_targets)
+        if keys:
+            projection = projection.reindex(data[keys[0]].astype(object).to_numpy())
+        for column in PROJECTION_COLUMNS:
+            data[column] = projection[column].to_numpy()
+        cube[level] = data
+    return cube
@@ -0,0 +1,146 @@
+# utils/series.py
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Granularités des séries : colonne des libellés (None : ensemble du pays)
+SERIES_LEVELS = {'national': None, 'region': 'region_label', 'province': 'province_label', 'cercle': 'cldh_label'}
+INDICATORS = ['expra_1', 'expra_0', 'unique_grappe']
+# Fenêtre glissante, en jours
+WINDOW = 7
+
+
+@dataclass(frozen=True)
+class SeriesStore:
+    """Séries journalières par date, calculées une fois par version des données.
+
+    Pour chaque niveau (national, région, province, cercle) et chaque unité : comptes
+    quotidiens, cumulés et sur 7 jours glissants des enquêtes ménage (expra_1),
+    des recensements (expra_0) et des grappes distinctes (unique_grappe : le
+    cumul compte les grappes couvertes à date, la fenêtre les grappes visitées
+    sur les 7 derniers jours). Le calendrier est complet, les jours sans
+    soumission valent 0. Les tableaux renvoyés sont partagés.
+
+    matrices[niveau][colonne] : tableau (unités × jours) de tout un niveau,
+    pour les calculs vectorisés ; units[niveau] : libellés des lignes.
+    """
+    dates: pd.DatetimeIndex
+    frames: dict
+    units: dict
+    matrices: dict
+
+    def series(self, level='national', key=None):
+        return self.frames[(level, key)]
+
+    def keys(self, level):
+        return self.units[level]
+
+    def cadence(self, level='national', key=None, indicator='expra_1'):
+        # Moyenne et écart-type des comptes quotidiens, sur les jours avec au moins une soumission
+        frame = self.series(level, key)
+        active = frame['expra_1'] + frame['expra_0'] > 0
+        values = frame.loc[active, indicator]
+        return values.mean(), values.std()
+
+
+def _day_codes(dates, start):
+    days = dates.to_numpy().astype('datetime64[D]')
+    valid = ~np.isnat(days)
+    codes = np.where(valid, days - np.datetime64(start, 'D'), 0).astype(np.int64)
+    return codes, valid
+
+
+def _counts(codes, n_keys, days, n_days, weights=None):
+    # Comptes (unité, jour) par bincount sur un code combiné
+    valid = codes >= 0
+    counts = np.bincount(codes[valid] * n_days + days[valid], weights=None if weights is None else weights[valid],
+                         minlength=n_keys * n_days)
+    return counts.reshape(n_keys, n_days).astype(np.int64)
+
+
+def _rolling(cumulative, window=WINDOW):
+    shifted = np.zeros_like(cumulative)
+    shifted[:, window:] = cumulative[:, :-window]
+    return cumulative - shifted
+
+
+def _window_distinct(codes, grappes, days, n_keys, n_days, window=WINDOW):
+    # Grappes distinctes visitées sur la fenêtre : chaque visite couvre [jour, jour + window[,
+    # moins la partie déjà couverte par la visite précédente de la même grappe
+    order = np.lexsort((days, grappes))
+    grappes, days, codes = grappes[order], days[order], codes[order]
+    same = np.r_[False, grappes[1:] == grappes[:-1]]
+    previous_end = np.r_[0, days[:-1] + window]
+    start = np.where(same, np.maximum(days, previous_end), days)
+    end = days + window
+    keep = (start < end) & (codes >= 0)
+    width = n_days + window
+    delta = (np.bincount(codes[keep] * width + start[keep], minlength=n_keys * width)
+             - np.bincount(codes[keep] * width + end[keep], minlength=n_keys * width))
+    return delta.reshape(n_keys, width).cumsum(axis=1)[:, :n_days]
+
+
+def build_series(combined_data, hierarchy):
+    """Construit les séries de tous les niveaux en un seul passage sur les soumissions."""
+    submission_dates = combined_data['submission_date']
+    if submission_dates.notna().any():
+        dates = pd.date_range(submission_dates.min().normalize(), submission_dates.max().normalize(), freq='D')
+    else:
+        dates = pd.DatetimeIndex([])
+    n_days = max(len(dates), 1)
+    days, valid = _day_codes(submission_dates, dates[0] if len(dates) else '1970-01-01')
+    expra = combined_data['expra'].to_numpy()
+    grappes, _ = pd.factorize(combined_data['grappe'])
+    valid &= grappes >= 0
+
+    # Première ligne de chaque couple (grappe, jour) : grappes distinctes par jour
+    pairs = np.flatnonzero(valid)
+    pairs = pairs[~pd.Series(grappes[pairs] * n_days + days[pairs]).duplicated().to_numpy()]
+    # Jour de première visite de chaque grappe : grappes nouvellement couvertes
+    first_day = np.full(grappes.max() + 1 if len(grappes) else 0, n_days, dtype=np.int64)
+    np.minimum.at(first_day, grappes[pairs], days[pairs])
+
+    frames, units, matrices = {}, {}, {}
+    for level, column in SERIES_LEVELS.items():
+        if column is None:
+            codes, keys = np.zeros(len(combined_data), dtype=np.int64), [None]
+        else:
+            labels = hierarchy.encode(combined_data[column], column)
+            codes, keys = labels.cat.codes.to_numpy().astype(np.int64), list(labels.cat.categories)
+        codes = np.where(valid, codes, -1)
+        n_keys = len(keys)
+
+        daily = {
+            'expra_1': _counts(codes, n_keys, days, n_days, (expra == 1).astype(np.float64)),
+            'expra_0': _counts(codes, n_keys, days, n_days, (expra == 0).astype(np.float64)),
+            'unique_grappe': _counts(codes[pairs], n_keys, days[pairs], n_days),
+        }
+        # Unité de chaque grappe (celle de sa première ligne observée)
+        grappe_codes = np.full(len(first_day), -1, dtype=np.int64)
+        observed, first = np.unique(grappes[pairs], return_index=True)
+        grappe_codes[observed] = codes[pairs][first]
+        covered = first_day < n_days
+        new_grappes = _counts(grappe_codes[covered], n_keys, first_day[covered], n_days)
+        cumulative = {
+            'expra_1': daily['expra_1'].cumsum(axis=1),
+            'expra_0': daily['expra_0'].cumsum(axis=1),
+            'unique_grappe': new_grappes.cumsum(axis=1),
+        }
+        rolling = {
+            'expra_1': _rolling(cumulative['expra_1']),
+            'expra_0': _rolling(cumulative['expra_0']),
+            'unique_grappe': _window_distinct(codes[pairs], grappes[pairs], days[pairs], n_keys, n_days),
+        }
+
+        units[level] = keys
+        matrices[level] = {}
+        for indicator in INDICATORS:
+            matrices[level][indicator] = daily[indicator][:, :len(dates)]
+            matrices[level][f"{indicator}_cumul"] = cumulative[indicator][:, :len(dates)]
+            matrices[level][f"{indicator}_7j"] = rolling[indicator][:, :len(dates)]
+        for index, key in enumerate(keys):
+            data = {column: values[index] for column, values in matrices[level].items()}
+            frames[(level, key)] = pd.DataFrame(data, index=pd.Index(dates, name='submission_date'))
+
+    return SeriesStore(dates=dates, frames=frames, units=units, matrices=matrices)
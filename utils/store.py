@@ -0,0 +1,335 @@
+# utils/store.py
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+import pandas as pd
+
+from utils.geo import CERCLES_PATH, PROVINCES_PATH, REGIONS_PATH, SIMPLIFIED_DIR, label_points_path
+from utils.io_audit import one_time_load, record_read
+
+# Copy-on-Write : une vue d'une session ne modifie jamais les tableaux partagés
+# (toujours actif à partir de pandas 3)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+DATA_FILES = {
+    'combined_data': 'data/combined_data.parquet',
+    'provinces_data': 'data/provinces.parquet',
+    'geojson_provinces': PROVINCES_PATH,
+    'geojson_regions': REGIONS_PATH,
+    # Couche des cercles construite par python -m utils.geo (facultative)
+    'geojson_cercles': CERCLES_PATH,
+    'grappes_regions': 'data/grappes_regions.parquet',
+    'circles_data': 'data/cercles.parquet',
+    # Compteurs par grappe tenus à jour par l'ingestion incrémentale (facultatif)
+    'grappe_aggregates': 'data/aggregates/grappes.parquet',
+}
+
+# Fichiers préparés par python -m utils.geo (étiquettes, géométries simplifiées) : surveillés comme
+# les sources, pour reconstruire les agrégats qui en dépendent, mais jamais chargés comme tables
+DERIVED_FILES = {
+    'labels_provinces': label_points_path(PROVINCES_PATH),
+    'labels_regions': label_points_path(REGIONS_PATH),
+    'labels_cercles': label_points_path(CERCLES_PATH),
+    'simplified_layers': SIMPLIFIED_DIR,
+}
+WATCHED_FILES = {**DATA_FILES, **DERIVED_FILES}
+
+# Jeu de soumissions partitionné (Hive), prioritaire sur combined_data.parquet s'il existe
+SUBMISSIONS_DIR = 'data/submissions'
+
+
+class LazyMapping(Mapping):
+    """Valeurs chargées au premier accès, une seule fois, partagées entre les threads."""
+
+    def __init__(self, loaders):
+        self._loaders = dict(loaders)
+        self._values = {}
+        # Réentrant : un agrégat peut lire un autre agrégat pendant sa construction
+        self._lock = threading.RLock()
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            loader = self._loaders[name]
+            with self._lock:
+                if name not in self._values:
+                    with one_time_load():
+                        self._values[name] = loader()
+        return self._values[name]
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+    def loaded(self, name):
+        return name in self._values
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Jeu de données partagé entre toutes les sessions, en lecture seule.
+
+    Les tables (dataset.combined_data, ...) et les agrégats dérivés (cube
+    d'indicateurs, ...) ne sont chargés qu'au premier accès : une vue tableau
+    ne charge ni les couches géographiques ni GeoPandas.
+    """
+    version: str
+    tables: LazyMapping
+    aggregates: LazyMapping
+
+    def __getattr__(self, name):
+        if name in DATA_FILES:
+            return self.tables[name]
+        raise AttributeError(name)
+
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de vérification des fichiers de données, en secondes
+CHECK_INTERVAL = int(os.environ.get('EDH_DATA_CHECK_INTERVAL', 30))
+
+
+def data_path(name):
+    partitioned = os.path.isdir(SUBMISSIONS_DIR)
+    if name == 'combined_data' and partitioned:
+        return SUBMISSIONS_DIR
+    if name == 'grappe_aggregates' and not partitioned:
+        # Compteurs incrémentaux ignorés tant que les soumissions ne sont pas partitionnées
+        return ''
+    return WATCHED_FILES[name]
+
+
+def _dataset_files(path):
+    for root, _, files in os.walk(path):
+        for file in sorted(files):
+            yield os.path.join(root, file)
+
+
+def file_fingerprint(path):
+    # Empreinte rapide (taille, date de modification) d'un fichier ou d'un dossier partitionné
+    if not os.path.exists(path):
+        return None
+    if os.path.isdir(path):
+        return ";".join(f"{file}:{file_fingerprint(file)}" for file in sorted(_dataset_files(path)))
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def file_hash(path):
+    if not os.path.exists(path):
+        return None
+    if os.path.isdir(path):
+        # Dossier en ajout seul : la liste des fichiers et leurs tailles suffit
+        return hashlib.sha1(file_fingerprint(path).encode()).hexdigest()
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def data_version(hashes):
+    # Version du jeu de données : empreinte combinée du contenu de tous les fichiers
+    digest = hashlib.sha1()
+    for name in sorted(hashes):
+        digest.update(f"{name}:{hashes[name]}".encode())
+    return digest.hexdigest()[:12]
+
+
+# Colonnes de la table des soumissions utilisées par chaque vue : seules celles-ci sont lues
+VIEW_COLUMNS = {
+    'indicateurs': ['region_label', 'province_label', 'cldh_label', 'grappe', 'expra'],
+    'tendances': ['submission_date', 'grappe', 'expra'],
+    # Détail des soumissions d'une région ou d'une province (Zoom Cercles), lu à la demande
+    'soumissions': ['submission_date', 'region_label', 'province_label', 'cldh_label', 'grappe', 'expra'],
+}
+LABEL_COLUMNS = ['region_label', 'province_label', 'cldh_label']
+
+
+def view_columns(*views):
+    columns = []
+    for view in views or VIEW_COLUMNS:
+        columns += [column for column in VIEW_COLUMNS[view] if column not in columns]
+    return columns
+
+
+def _normalize_submissions(combined_data):
+    # Types normalisés une seule fois au chargement
+    if 'submission_date' in combined_data.columns:
+        dates = combined_data['submission_date']
+        if isinstance(dates.dtype, pd.CategoricalDtype):
+            # Colonne de partition Hive : conversion des seules catégories
+            dates = dates.cat.rename_categories(pd.to_datetime(dates.cat.categories))
+            dates = dates.astype(dates.cat.categories.dtype)
+        combined_data['submission_date'] = pd.to_datetime(dates)
+    # Libellés hiérarchiques en catégories : codes entiers au lieu de chaînes Python
+    for column in LABEL_COLUMNS:
+        if column in combined_data.columns:
+            combined_data[column] = combined_data[column].astype(str).str.strip().astype('category')
+    if 'expra' in combined_data.columns:
+        combined_data['expra'] = combined_data['expra'].astype('int8')
+    return combined_data
+
+
+def _filters(region=None, province=None):
+    filters = []
+    if region is not None:
+        filters.append(('region_label', '==', region))
+    if province is not None:
+        filters.append(('province_label', '==', province))
+    return filters or None
+
+
+def read_submissions(columns=None, region=None, province=None, path=None):
+    """Lit les soumissions en ne chargeant que les colonnes demandées.
+
+    Les filtres région / province sont transmis au lecteur Parquet : partitions
+    Hive écartées sans lecture, row groups écartés d'après leurs statistiques.
+    """
+    path = path or data_path('combined_data')
+    record_read(path)
+    data = pd.read_parquet(path, columns=columns, filters=_filters(region, province))
+    return _normalize_submissions(data)
+
+
+def submission_batches(columns=None, region=None, province=None, path=None, batch_size=65_536):
+    # Mêmes colonnes et filtres que read_submissions, lus bloc par bloc (exports en flux)
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    path = path or data_path('combined_data')
+    record_read(path)
+    partitioning = ds.HivePartitioning.discover(infer_dictionary=True) if os.path.isdir(path) else None
+    dataset = ds.dataset(path, format='parquet', partitioning=partitioning)
+    filters = _filters(region, province)
+    condition = pq.filters_to_expression(filters) if filters else None
+    return dataset.to_batches(columns=columns, filter=condition, batch_size=batch_size, use_threads=False)
+
+
+def _load_table(name):
+    path = data_path(name)
+    if not os.path.exists(path):
+        return None
+    if name == 'combined_data':
+        # Relu en entier à chaque changement (séries et hiérarchie en dépendent) ; seul le cube
+        # profite des compteurs incrémentaux par grappe (grappe_aggregates)
+        return read_submissions(view_columns('indicateurs', 'tendances'))
+    record_read(path)
+    if name == 'circles_data':
+        circles_data = pd.read_parquet(path)
+        circles_data['cldh_label'] = circles_data['cldh_label'].astype(str).str.strip()
+        return circles_data
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    # GeoPandas chargé seulement quand une vue cartographique en a besoin
+    import geopandas as gpd
+    return gpd.read_file(path)
+
+
+class DatasetStore:
+    """Version courante du jeu de données, rechargée en arrière-plan quand les fichiers changent.
+
+    Les sessions lisent toujours un Dataset complet ; le suivant est construit à
+    côté (seuls les fichiers modifiés sont relus, seuls les agrégats qui en
+    dépendent sont recalculés) puis substitué en une seule affectation. Au
+    premier démarrage, tables et agrégats sont chargés au premier accès.
+    """
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._builders = {}
+        self._fingerprints = {}
+        self._hashes = {}
+        self._lock = threading.RLock()
+        self._current = None
+        self._watcher = None
+
+    def register(self, name, builder, depends_on):
+        # Agrégat dérivé : builder(dataset) recalculé quand une de ses sources change
+        self._builders[name] = (builder, set(depends_on))
+
+    def current(self):
+        if self._current is None:
+            self.refresh()
+        return self._current
+
+    def start(self):
+        # Surveillance des fichiers dans un thread démon
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='edh-data-watcher', daemon=True)
+            self._watcher.start()
+        return self
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self.refresh()
+            except Exception:
+                # Fichier en cours d'écriture, etc. : on garde la version courante
+                logger.exception("Rechargement des données impossible, nouvelle tentative au prochain cycle")
+
+    def refresh(self):
+        # Reconstruit et substitue le jeu de données si le contenu d'un fichier a changé
+        with self._lock:
+            fingerprints, hashes = self._scan()
+            changed = {name for name in WATCHED_FILES if hashes[name] != self._hashes.get(name)}
+            if changed:
+                self._current = self._build(self._current, changed, hashes)
+                logger.info("Données chargées (%s) : version %s", ", ".join(sorted(changed)), self._current.version)
+            # Empreintes mémorisées seulement après une construction réussie
+            self._fingerprints, self._hashes = fingerprints, hashes
+            return bool(changed)
+
+    def _scan(self):
+        fingerprints, hashes = {}, {}
+        for name in WATCHED_FILES:
+            path = data_path(name)
+            fingerprints[name] = file_fingerprint(path)
+            if name in self._fingerprints and fingerprints[name] == self._fingerprints[name]:
+                hashes[name] = self._hashes[name]
+            else:
+                # Date modifiée : le contenu est comparé avant tout rechargement
+                hashes[name] = file_hash(path)
+        return fingerprints, hashes
+
+    def _build(self, previous, changed, hashes):
+        def table_loader(name):
+            if previous is not None and name not in changed and previous.tables.loaded(name):
+                return lambda: previous.tables[name]
+            return lambda: _load_table(name)
+
+        def aggregate_loader(name, builder, depends_on):
+            if previous is not None and previous.aggregates.loaded(name) and not (depends_on & changed):
+                return lambda: previous.aggregates[name]
+            return lambda: builder(dataset)
+
+        tables = LazyMapping({name: table_loader(name) for name in DATA_FILES})
+        # Agrégats construits à la demande : chacun peut lire les précédents
+        aggregates = LazyMapping({
+            name: aggregate_loader(name, builder, depends_on)
+            for name, (builder, depends_on) in self._builders.items()
+        })
+        dataset = Dataset(version=data_version(hashes), tables=tables, aggregates=aggregates)
+
+        if previous is not None:
+            # Rechargement : ce qui était déjà utilisé est reconstruit avant la substitution,
+            # les sessions ne paient jamais le chargement de la nouvelle version
+            for name in DATA_FILES:
+                if previous.tables.loaded(name):
+                    tables[name]
+            for name in self._builders:
+                if previous.aggregates.loaded(name):
+                    aggregates[name]
+        return dataset
+
+
+def load_dataset():
+    return DatasetStore().current()
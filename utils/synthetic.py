@@ -0,0 +1,161 @@
+# utils/synthetic.py
+# Jeu de soumissions synthétique, cohérent avec les tables de référence, pour les tests de charge.
+# Usage : python -m utils.synthetic [nb_lignes] [sortie.parquet | dossier_partitionné] [graine]
+#   ex. : python -m utils.synthetic 10000000 data/synthetic/submissions   (même découpage que l'ingestion)
+# Par défaut : data/synthetic/combined_data.parquet, jamais les données réelles de data/
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from utils.store import DATA_FILES
+
+# Région d'un cercle d'après son code : 1er chiffre (6 chiffres), 2 premiers (7 chiffres ou code composé)
+REGION_CODES = {
+    1: 'TANGER TETOUAN HOCEIMA',
+    2: 'L ORIENTAL',
+    3: 'FES MEKNES',
+    4: 'RABAT SALE KENITRA',
+    5: 'BENI MELLAL KHENIFRA',
+    6: 'CASABLANCA SETTAT',
+    8: 'DRAA TAFILALET',
+    9: 'SOUSS MASSA',
+    10: 'GUELMIM OUED NOUN',
+}
+
+# Objectif de la campagne : 35 000 enquêtes ménage sur 10 225 grappes
+SURVEY_TARGET = 35_000
+# Part des enquêtes ménage parmi les soumissions (le reste : recensements)
+SURVEY_SHARE = 0.5
+DEFAULT_ROWS = int(SURVEY_TARGET / SURVEY_SHARE)
+CAMPAIGN_START = '2024-09-02'
+CAMPAIGN_DAYS = 90
+# Part des grappes visitées et durée de passage d'une équipe dans une grappe
+COVERAGE = 0.95
+VISIT_DAYS = 3
+CHUNK_ROWS = 1_000_000
+# Sortie par défaut, à l'écart des données de la campagne
+SYNTHETIC_PATH = 'data/synthetic/combined_data.parquet'
+# Même découpage que l'ingestion incrémentale (data_excel_to_parquet/toparquet.py)
+PARTITION_COLUMNS = ['submission_date', 'region_label']
+
+
+def cercle_region(code):
+    code = str(code).strip()
+    if '_' in code or len(code) == 7:
+        return REGION_CODES[int(code[:2])]
+    return REGION_CODES[int(code[0])]
+
+
+def grappe_frame(circles_data):
+    # Une ligne par grappe de l'échantillon (nb_grappe par cercle), identifiants séquentiels
+    circles = circles_data.assign(
+        cldh_label=circles_data['cldh_label'].astype(str).str.strip(),
+        region_label=circles_data['code_cercle'].map(cercle_region),
+    )
+    grappes = circles.loc[circles.index.repeat(circles['nb_grappe'])].reset_index(drop=True)
+    grappes['grappe'] = np.arange(1, len(grappes) + 1, dtype=np.int64)
+    return grappes[['grappe', 'cldh_label', 'province_label', 'region_label']]
+
+
+def day_weights(days):
+    # Montée en charge sur les dix premiers jours, activité réduite le dimanche
+    dates = pd.date_range(CAMPAIGN_START, periods=days, freq='D')
+    weights = np.minimum(np.arange(1, days + 1) / 10, 1.0)
+    weights = np.where(dates.dayofweek == 6, weights * 0.3, weights)
+    return dates, weights / weights.sum()
+
+
+def visit_plan(n_grappes, rng, days=CAMPAIGN_DAYS, coverage=COVERAGE):
+    # Grappes visitées et jour d'arrivée de l'équipe dans chacune
+    dates, weights = day_weights(days)
+    visited = np.sort(rng.choice(n_grappes, size=max(int(n_grappes * coverage), 1), replace=False))
+    start_days = rng.choice(days, size=len(visited), p=weights)
+    return visited, start_days, dates
+
+
+def _chunk(grappes, plan, rows, first_row, rng, seed, days, survey_share):
+    visited, start_days, dates = plan
+    picks = rng.integers(0, len(visited), rows)
+    day = np.minimum(start_days[picks] + rng.integers(0, VISIT_DAYS, rows), days - 1)
+    grappe_rows = visited[picks]
+    keys = np.char.add(f"syn-{seed}-", np.arange(first_row, first_row + rows).astype(str))
+    return pd.DataFrame({
+        'KEY': keys.astype(object),
+        'submission_date': dates.to_numpy()[day],
+        'region_label': grappes['region_label'].to_numpy()[grappe_rows],
+        'province_label': grappes['province_label'].to_numpy()[grappe_rows],
+        'cldh_label': grappes['cldh_label'].to_numpy()[grappe_rows],
+        'grappe': grappes['grappe'].to_numpy()[grappe_rows],
+        # 1 : enquête ménage, 0 : recensement
+        'expra': (rng.random(rows) < survey_share).astype(np.int8),
+    })
+
+
+def iter_submissions(n_rows=DEFAULT_ROWS, seed=0, days=CAMPAIGN_DAYS, coverage=COVERAGE,
+                     survey_share=SURVEY_SHARE, chunk_rows=CHUNK_ROWS, circles_data=None):
+    """Soumissions synthétiques par blocs de chunk_rows lignes, déterministes pour une graine donnée.
+
+    Chaque ligne est rattachée à une grappe réelle (cercle, province, région
+    cohérents avec les tables de référence) ; les dates suivent la cadence
+    journalière de la campagne, chaque grappe étant couverte en quelques jours.
+    """
+    if circles_data is None:
+        circles_data = pd.read_parquet(DATA_FILES['circles_data'])
+    grappes = grappe_frame(circles_data)
+    plan = visit_plan(len(grappes), np.random.default_rng(seed), days, coverage)
+    for index, first_row in enumerate(range(0, n_rows, chunk_rows)):
+        # Générateur propre à chaque bloc : mémoire bornée quelle que soit la taille totale
+        rng = np.random.default_rng([seed, index])
+        yield _chunk(grappes, plan, min(chunk_rows, n_rows - first_row), first_row, rng, seed, days, survey_share)
+
+
+def generate_submissions(n_rows=DEFAULT_ROWS, seed=0, **options):
+    return pd.concat(iter_submissions(n_rows, seed, **options), ignore_index=True)
+
+
+def write_submissions(path, n_rows=DEFAULT_ROWS, seed=0, **options):
+    # Fichier Parquet unique, ou dossier partitionné comme data/submissions si le chemin n'est pas un .parquet
+    partitioned = not path.endswith('.parquet')
+    if partitioned and os.path.exists(path):
+        print(f"Le dossier {path} existe déjà : choisir un dossier vide")
+        return 0
+    if os.path.exists(path):
+        print(f"Le fichier {path} existe déjà : choisir un autre chemin")
+        return 0
+    if not partitioned:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    writer = None
+    for index, chunk in enumerate(iter_submissions(n_rows, seed, **options)):
+        if partitioned:
+            chunk['submission_date'] = chunk['submission_date'].dt.strftime('%Y-%m-%d')
+            ds.write_dataset(
+                pa.Table.from_pandas(chunk, preserve_index=False),
+                path,
+                format='parquet',
+                partitioning=PARTITION_COLUMNS,
+                partitioning_flavor='hive',
+                # Nommage des lots de l'ingestion (lot-<nom>-<i>.parquet) : un lot par bloc
+                basename_template=f"lot-synthetique-{seed}-{index}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore',
+            )
+            continue
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+    print(f"{n_rows} soumissions synthétiques écrites dans {path}")
+    return n_rows
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    path = sys.argv[2] if len(sys.argv) > 2 else SYNTHETIC_PATH
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    write_submissions(path, n_rows, seed)
@@ -0,0 +1,132 @@
+# utils/table.py
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.formatting import indicator_column_config
+from utils.indicators import column_formats
+
+PAGE_SIZES = [25, 50, 100, 200]
+ALL = "Tous"
+
+
+def sort_positions(values, descending=False):
+    # Positions des lignes triées (tri stable, valeurs manquantes en dernier)
+    values = pd.Series(values, copy=False).reset_index(drop=True)
+    return values.sort_values(ascending=not descending, na_position='last', kind='stable').index.to_numpy()
+
+
+def _equals(values, value):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Comparaison sur les codes entiers, sans matérialiser les libellés
+        if value not in values.cat.categories:
+            return np.zeros(len(values), dtype=bool)
+        return values.cat.codes.to_numpy() == values.cat.categories.get_loc(value)
+    return values.to_numpy() == value
+
+
+def _contains(values, search):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Recherche sur les quelques centaines de libellés distincts, puis sur les codes
+        matches = np.flatnonzero(values.cat.categories.astype(str).str.contains(search, case=False, regex=False))
+        return np.isin(values.cat.codes.to_numpy(), matches)
+    if pd.api.types.is_numeric_dtype(values):
+        # Colonne numérique (identifiant de grappe) : égalité
+        try:
+            return values.to_numpy() == float(search)
+        except ValueError:
+            return np.zeros(len(values), dtype=bool)
+    return values.astype(str).str.contains(search, case=False, regex=False).to_numpy()
+
+
+def filter_mask(data, search='', search_columns=(), filters=None):
+    mask = np.ones(len(data), dtype=bool)
+    for column, value in (filters or {}).items():
+        if value is not None:
+            mask &= _equals(data[column], value)
+    search = search.strip()
+    if search and search_columns:
+        found = np.zeros(len(data), dtype=bool)
+        for column in search_columns:
+            found |= _contains(data[column], search)
+        mask &= found
+    return mask
+
+
+def query_table(data, columns, search='', search_columns=(), filters=None, order=None, page=0, page_size=PAGE_SIZES[1]):
+    """Fenêtre d'un tableau après filtres, recherche et tri, et nombre total de lignes retenues.
+
+    data est un niveau du cube, partagé et en lecture seule : seules les lignes
+    de la page sont copiées et renommées (columns : colonne du cube -> libellé).
+    order est une permutation de tri précalculée (sort_positions).
+    """
+    mask = filter_mask(data, search, search_columns, filters)
+    return page_window(data, columns, mask, order, page, page_size), int(mask.sum())
+
+
+def page_window(data, columns, mask, order=None, page=0, page_size=PAGE_SIZES[1]):
+    positions = np.flatnonzero(mask) if order is None else order[mask[order]]
+    window = positions[page * page_size:(page + 1) * page_size]
+    return data.iloc[window][list(columns)].rename(columns=columns).reset_index(drop=True)
+
+
+def _options(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = np.unique(values.cat.codes.to_numpy())
+        return list(values.cat.categories[codes[codes >= 0]])
+    return sorted(values.dropna().unique())
+
+
+def _keep_valid(key, options, default):
+    # Valeur mémorisée qui n'existe plus (filtre parent modifié) : retour à la valeur par défaut
+    if key in st.session_state and st.session_state[key] not in options:
+        st.session_state[key] = default
+
+
+def paginated_table(data, columns, key, search_columns=(), filter_columns=(), sort_order=None):
+    """Tableau paginé côté serveur : recherche, filtres et tri exécutés ici, seule la page est envoyée.
+
+    sort_order(column, descending) renvoie la permutation de tri d'une colonne
+    (mise en cache par l'appelant) ; à défaut elle est recalculée.
+    """
+    if sort_order is None:
+        sort_order = lambda column, descending: sort_positions(data[column], descending)
+
+    search_col, *filter_cols, sort_col, order_col = st.columns([3] + [2] * len(filter_columns) + [2, 1])
+    search = search_col.text_input("Rechercher", key=f"{key}_search")
+
+    # Filtres en cascade : les options d'un filtre tiennent compte des précédents
+    filters = {}
+    for column, container in zip(filter_columns, filter_cols):
+        options = [ALL] + _options(data[column][filter_mask(data, filters=filters)])
+        _keep_valid(f"{key}_{column}", options, ALL)
+        value = container.selectbox(columns[column], options, key=f"{key}_{column}")
+        filters[column] = None if value == ALL else value
+
+    labels = {label: column for column, label in columns.items()}
+    sort_label = sort_col.selectbox("Trier par", ["Aucun tri"] + list(labels), key=f"{key}_sort")
+    descending = order_col.toggle("Décroissant", key=f"{key}_desc")
+    order = None if sort_label == "Aucun tri" else sort_order(labels[sort_label], descending)
+
+    # Retour à la première page quand la requête change
+    query = (search, tuple(filters.items()), sort_label, descending)
+    if st.session_state.get(f"{key}_query") != query:
+        st.session_state[f"{key}_query"] = query
+        st.session_state[f"{key}_page"] = 1
+
+    size_col, page_col, count_col = st.columns([1, 1, 4])
+    page_size = size_col.selectbox("Lignes par page", PAGE_SIZES, index=1, key=f"{key}_size")
+    mask = filter_mask(data, search, search_columns, filters)
+    total = int(mask.sum())
+    pages = max(math.ceil(total / page_size), 1)
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = page_col.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page") - 1
+
+    page_data = page_window(data, columns, mask, order, page, page_size)
+    st.dataframe(page_data, hide_index=True, column_config=indicator_column_config(page_data, column_formats(columns)))
+    first = page * page_size + 1 if total else 0
+    count_col.caption(f"Lignes {first} à {page * page_size + len(page_data)} sur {total}")
+    return page_data, total, filters
@@ -0,0 +1,166 @@
+# utils/warmup.py
+# Préchauffage des caches avant d'accepter du trafic.
+# Usage :
+#   python -m utils.warmup                     préchauffe dans ce processus et affiche les temps
+#   python -m utils.warmup serve [options]     préchauffe puis démarre streamlit run main.py dans le même processus
+#   python -m utils.warmup ready               code retour 0 si le processus serve est prêt et vivant (sonde)
+import json
+import logging
+import os
+import ssl
+import sys
+import threading
+import time
+import urllib.request
+
+APP_PATH = 'main.py'
+# Fichier de disponibilité : écrit par serve une fois les caches chauds et le serveur à l'écoute,
+# avec le PID et la date de démarrage du processus serveur ; supprimé au démarrage de serve
+READY_FILE = os.environ.get('EDH_READY_FILE', '.streamlit/ready.json')
+# Attente maximale de la première réponse de /_stcore/health après le préchauffage (secondes)
+LISTEN_TIMEOUT = 120
+LISTEN_POLL = 0.5
+
+# Échelles et vues de display_indicators, dans l'ordre de la barre latérale
+LEVELS = ["Vision Macroscopique", "Zoom Régional", "Zoom Provincial", "Zoom Cercles"]
+VIEWS = ["Tableau", "Datavisualisation", "Géo-intelligence"]
+
+logger = logging.getLogger(__name__)
+
+
+def _process_start(pid):
+    # Date de démarrage du processus (tops d'horloge depuis le boot, Linux) : distingue un PID réutilisé
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return int(f.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Processus d'un autre utilisateur : il existe
+        pass
+    return True
+
+
+def is_ready():
+    # Prêt : fichier écrit par un processus serve toujours en cours (pas un reste d'arrêt brutal)
+    try:
+        with open(READY_FILE, encoding='utf-8') as f:
+            status = json.load(f)
+        pid = int(status['pid'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+    return _is_alive(pid) and _process_start(pid) == status.get('process_start')
+
+
+def _clear_ready():
+    try:
+        os.remove(READY_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def _write_ready(status):
+    status = {'pid': os.getpid(), 'process_start': _process_start(os.getpid()), 'started_at': time.time(), **status}
+    os.makedirs(os.path.dirname(READY_FILE) or '.', exist_ok=True)
+    tmp_path = f"{READY_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, READY_FILE)
+
+
+def _health_url():
+    # Adresse, port et préfixe effectifs, lus dans la configuration une fois les options de la ligne
+    # de commande appliquées par streamlit run
+    from streamlit import config
+
+    scheme = 'https' if config.get_option('server.sslCertFile') else 'http'
+    address = config.get_option('server.address') or 'localhost'
+    base = (config.get_option('server.baseUrlPath') or '').strip('/')
+    path = f"/{base}/_stcore/health" if base else '/_stcore/health'
+    return f"{scheme}://{address}:{config.get_option('server.port')}{path}"
+
+
+def _is_listening():
+    # Auto-requête sur le point de santé ; certificat non vérifié : requête locale vers soi-même
+    context = ssl._create_unverified_context()
+    try:
+        with urllib.request.urlopen(_health_url(), timeout=LISTEN_POLL * 4, context=context) as response:
+            return response.status == 200
+    except (OSError, ValueError):
+        return False
+
+
+def _write_ready_when_listening(status, timeout=LISTEN_TIMEOUT):
+    # Le fichier n'est écrit qu'une fois le port ouvert et le point de santé en réponse
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if _is_listening():
+            _write_ready(status)
+            logger.info("Serveur à l'écoute, disponibilité écrite dans %s", READY_FILE)
+            return True
+        time.sleep(LISTEN_POLL)
+    logger.error("Serveur sans réponse sur %s après %s s : disponibilité non écrite", _health_url(), timeout)
+    return False
+
+
+def warm_up(app_path=APP_PATH):
+    """Exécute chaque échelle × vue une fois, avec les sélections par défaut.
+
+    Les caches st.cache_resource (jeu de données, agrégats, couches, figures)
+    sont propres au processus : exécutés ici, ils sont déjà chauds pour les
+    sessions servies ensuite par ce même processus.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    app = AppTest.from_file(os.path.abspath(app_path), default_timeout=600)
+    app.run()
+    timings, errors = {}, []
+    for level in LEVELS:
+        for view in VIEWS:
+            view_start = time.perf_counter()
+            app.sidebar.radio[0].set_value(level)
+            app.sidebar.radio[1].set_value(view)
+            app.run()
+            timings[f"{level} / {view}"] = round(time.perf_counter() - view_start, 3)
+            if app.exception:
+                errors.append(f"{level} / {view} : {app.exception[0].message}")
+                logger.error("Préchauffage en échec (%s / %s) : %s", level, view, app.exception[0].message)
+
+    return {'seconds': round(time.perf_counter() - start, 3), 'views': timings, 'errors': errors}
+
+
+def serve(args, app_path=APP_PATH):
+    # Le serveur n'écoute qu'après le préchauffage : /_stcore/health ne répond qu'une fois prêt
+    from streamlit.web import cli
+
+    _clear_ready()
+    status = warm_up(app_path)
+    if not status['errors']:
+        # Disponible seulement si toutes les vues se sont affichées sans erreur et que le serveur
+        # démarré ci-dessous répond ; la sonde vérifie que ce processus est toujours en cours
+        threading.Thread(target=_write_ready_when_listening, args=(status,), daemon=True).start()
+    sys.argv = ['streamlit', 'run', app_path, *args]
+    cli.main()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'serve':
+        serve(sys.argv[2:])
+    elif command == 'ready':
+        sys.exit(0 if is_ready() else 1)
+    else:
+        status = warm_up()
+        for view, seconds in status['views'].items():
+            print(f"{view:42} {seconds:6.2f} s")
+        print(f"Total : {status['seconds']:.2f} s, {'prêt' if not status['errors'] else 'en échec'}")
+        sys.exit(1 if status['errors'] else 0)